@@ -85,7 +85,7 @@ def module_functions(mod):
         allsymbols = [name for (name, obj) in inspect.getmembers(mod)]
     return [name for name in allsymbols if
             not name.startswith('_') and
-            inspect.isfunction(getattr(mod, name)) and
+            inspect.isroutine(getattr(mod, name)) and
             pydoc.getdoc(getattr(mod, name))]
 
 def module_classes(mod):
@@ -134,9 +134,239 @@ get_array(PyObject *self, PyObject *args)
 }
 
 
+/* Map a one-based integer index to zero-based. Returns 1 on success,
+   0 if obj is not an integer and -1 with an exception set for index 0. */
+static int
+map_int_index(PyObject *obj, Py_ssize_t *out)
+{
+  Py_ssize_t i;
+
+  if (!PyInt_Check(obj) && !PyArray_IsScalar(obj, Integer))
+    return 0;
+  i = PyNumber_AsSsize_t(obj, PyExc_IndexError);
+  if (i == -1 && PyErr_Occurred())
+    return -1;
+  if (i == 0) {
+    PyErr_SetString(PyExc_IndexError, "index 0 not permitted - FortranArrays are one-based");
+    return -1;
+  }
+  *out = i > 0 ? i-1 : i;
+  return 1;
+}
+
+/* Map a single integer or slice index. Returns a new reference, NULL
+   with an exception set on error, or NULL without an exception if obj
+   is not a simple index. */
+static PyObject *
+map_simple_index(PyObject *obj)
+{
+  Py_ssize_t i;
+  int status;
+  PyObject *start, *result;
+  PySliceObject *slice;
+
+  status = map_int_index(obj, &i);
+  if (status < 0) return NULL;
+  if (status > 0) return PyInt_FromSsize_t(i);
+
+  if (!PySlice_Check(obj)) return NULL;
+  slice = (PySliceObject *)obj;
+  if (slice->start == Py_None) {
+    Py_INCREF(Py_None);
+    start = Py_None;
+  } else {
+    status = map_int_index(slice->start, &i);
+    if (status <= 0) return NULL;
+    start = PyInt_FromSsize_t(i);
+    if (start == NULL) return NULL;
+  }
+  /* stop is inclusive in Fortran, so it is unchanged; so is the step */
+  result = PySlice_New(start, slice->stop, slice->step);
+  Py_DECREF(start);
+  return result;
+}
+
+/* Map a one-based index made of integers and slices to the equivalent
+   zero-based index, following the same rules as FortranArray.mapindices().
+   Returns a new reference, NULL with an exception set on error, or NULL
+   without an exception for any other kind of index. */
+static PyObject *
+map_index(PyObject *indx, int ndim)
+{
+  PyObject *item, *result;
+  Py_ssize_t i, n, offset;
+
+  if (!PyTuple_CheckExact(indx)) {
+    item = map_simple_index(indx);
+    if (item == NULL) return NULL;
+    /* a single index selects along the last dimension */
+    if (ndim <= 1) return item;
+    result = PyTuple_New(2);
+    if (result == NULL) {
+      Py_DECREF(item);
+      return NULL;
+    }
+    Py_INCREF(Py_Ellipsis);
+    PyTuple_SET_ITEM(result, 0, Py_Ellipsis);
+    PyTuple_SET_ITEM(result, 1, item);
+    return result;
+  }
+
+  n = PyTuple_GET_SIZE(indx);
+  offset = n < ndim ? 1 : 0;
+  result = PyTuple_New(n + offset);
+  if (result == NULL) return NULL;
+  if (offset) {
+    Py_INCREF(Py_Ellipsis);
+    PyTuple_SET_ITEM(result, 0, Py_Ellipsis);
+  }
+  for (i=0; i<n; i++) {
+    item = map_simple_index(PyTuple_GET_ITEM(indx, i));
+    if (item == NULL) {
+      Py_DECREF(result);
+      return NULL;
+    }
+    PyTuple_SET_ITEM(result, i + offset, item);
+  }
+  return result;
+}
+
+/* True if the mapped index cindx is an integer or tuple of integers */
+static int
+is_integer_index(PyObject *cindx)
+{
+  Py_ssize_t i;
+
+  if (PyInt_Check(cindx)) return 1;
+  if (!PyTuple_Check(cindx)) return 0;
+  for (i=0; i<PyTuple_GET_SIZE(cindx); i++)
+    if (!PyInt_Check(PyTuple_GET_ITEM(cindx, i))) return 0;
+  return 1;
+}
+
+static PyObject*
+fortran_index(PyObject *self, PyObject *args)
+{
+  PyObject *indx, *result;
+  int ndim;
+
+  if (!PyArg_ParseTuple(args, "Oi", &indx, &ndim))
+    return NULL;
+
+  result = map_index(indx, ndim);
+  if (result == NULL && !PyErr_Occurred())
+    Py_RETURN_NONE;
+  return result;
+}
+
+static PyObject *parent_str = NULL, *mapindices_str = NULL, *setitem_fancy_str = NULL;
+
+/* Raise RuntimeError if the array has a weak reference to a parent
+   object which no longer exists */
+static int
+check_parent(PyObject *self)
+{
+  PyObject *parent, *obj;
+  int status = 0;
+
+  parent = PyObject_GetAttr(self, parent_str);
+  if (parent == NULL) {
+    if (!PyErr_ExceptionMatches(PyExc_AttributeError)) return -1;
+    PyErr_Clear();
+    return 0;
+  }
+  if (parent != Py_None) {
+    obj = PyObject_CallObject(parent, NULL);
+    if (obj == NULL) {
+      status = -1;
+    } else {
+      if (obj == Py_None) {
+        PyErr_SetString(PyExc_RuntimeError, "array's parent has gone out of scope!");
+        status = -1;
+      }
+      Py_DECREF(obj);
+    }
+  }
+  Py_DECREF(parent);
+  return status;
+}
+
+/* FortranArray.__getitem__(indx). Integer and slice indices are mapped
+   here, anything else is passed to the Python mapindices() method. */
+static PyObject*
+fortran_getitem(PyObject *self, PyObject *indx)
+{
+  PyObject *cindx, *result, *view;
+
+  if (check_parent(self) < 0) return NULL;
+
+  cindx = map_index(indx, PyArray_NDIM((PyArrayObject *)self));
+  if (cindx == NULL) {
+    if (PyErr_Occurred()) return NULL;
+    cindx = PyObject_CallMethodObjArgs(self, mapindices_str, indx, NULL);
+    if (cindx == NULL) return NULL;
+  }
+  result = PyArray_Type.tp_as_mapping->mp_subscript(self, cindx);
+  Py_DECREF(cindx);
+
+  if (result != NULL && PyArray_Check(result) && Py_TYPE(result) != Py_TYPE(self)) {
+    view = PyArray_View((PyArrayObject *)result, NULL, Py_TYPE(self));
+    Py_DECREF(result);
+    result = view;
+  }
+  return result;
+}
+
+/* FortranArray.__setitem__(indx, value). Integer and slice indices are
+   mapped here and assigned through a plain ndarray view, so numpy
+   never calls back into __getitem__ with already mapped indices.
+   Anything else is passed to the Python _setitem_fancy() method. */
+static PyObject*
+fortran_setitem(PyObject *self, PyObject *args)
+{
+  PyObject *indx, *value, *cindx, *base;
+  int status;
+
+  if (!PyArg_ParseTuple(args, "OO", &indx, &value))
+    return NULL;
+  if (check_parent(self) < 0) return NULL;
+
+  cindx = map_index(indx, PyArray_NDIM((PyArrayObject *)self));
+  if (cindx == NULL) {
+    if (PyErr_Occurred()) return NULL;
+    return PyObject_CallMethodObjArgs(self, setitem_fancy_str, indx, value, NULL);
+  }
+  if (is_integer_index(cindx)) {
+    /* single elements are set directly without creating a view */
+    status = PyArray_Type.tp_as_mapping->mp_ass_subscript(self, cindx, value);
+  } else {
+    base = PyArray_View((PyArrayObject *)self, NULL, &PyArray_Type);
+    if (base == NULL) {
+      Py_DECREF(cindx);
+      return NULL;
+    }
+    status = PyObject_SetItem(base, cindx, value);
+    Py_DECREF(base);
+  }
+  Py_DECREF(cindx);
+  if (status < 0) return NULL;
+  Py_RETURN_NONE;
+}
+
+static PyMethodDef fortranarray_getitem_def =
+  {"__getitem__", (PyCFunction)fortran_getitem, METH_O,
+   "Overloaded __getitem__ which accepts one-based indices."};
+
+static PyMethodDef fortranarray_setitem_def =
+  {"__setitem__", (PyCFunction)fortran_setitem, METH_VARARGS,
+   "Overloaded __setitem__ which accepts one-based indices."};
+
+
 static PyMethodDef arraydata_methods[] = {
   {"get_array", get_array, METH_VARARGS, 
    "Make an array from integer(SIZEOF_FORTRAN_T) array containing reference to derived type object,\n and fortran array function.\n\get_array(fpointer,array_fobj[,key]) -> array"},
+  {"fortran_index", fortran_index, METH_VARARGS,
+   "Map a one-based index made of integers and slices to the equivalent zero-based index\nfor an array with ndim dimensions. Returns None for other kinds of index.\n\nfortran_index(indx, ndim) -> index or None"},
   {NULL, NULL}
 };
 
@@ -146,9 +376,21 @@ static char arraydata_doc[] =
 PyMODINIT_FUNC
 initarraydata(void)
 {
-  Py_InitModule3("arraydata", arraydata_methods, arraydata_doc);
+  PyObject *m;
+
+  m = Py_InitModule3("arraydata", arraydata_methods, arraydata_doc);
+  if (m == NULL) return;
   PyFortran_Type.ob_type = &PyType_Type;
   import_array();
+
+  parent_str = PyString_InternFromString("parent");
+  mapindices_str = PyString_InternFromString("mapindices");
+  setitem_fancy_str = PyString_InternFromString("_setitem_fancy");
+
+  /* method descriptors of ndarray, for use as FortranArray.__getitem__ and
+     FortranArray.__setitem__ without the overhead of a Python level call */
+  PyModule_AddObject(m, "fortran_getitem", PyDescr_NewMethod(&PyArray_Type, &fortranarray_getitem_def));
+  PyModule_AddObject(m, "fortran_setitem", PyDescr_NewMethod(&PyArray_Type, &fortranarray_setitem_def));
 }
 
 
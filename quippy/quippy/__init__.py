@@ -77,21 +77,69 @@ if 'modules' in cfg.sections():
         if not int(value):
             disabled_modules.append(name)
 
-# External dependencies
-available_modules = []
-unavailable_modules = []
+# External dependencies. A test import of each optional module is only
+# tried the first time the module is looked up in available_modules or
+# unavailable_modules, so that expensive packages which are not needed
+# are not imported at startup.
 
-for mod in ['netCDF4', 'scipy', 'ase', 'atomeye', 'enthought.mayavi', 'phonopy']:
-    if mod in disabled_modules: continue
-    try:
-        __import__(mod)
-        available_modules.append(mod)
-    except ImportError:
-        unavailable_modules.append(mod)
+optional_modules = ['netCDF4', 'scipy', 'ase', 'atomeye', 'enthought.mayavi', 'phonopy']
+
+class ModuleList(list):
+    """
+    List of module names which tries test imports of the
+    :data:`optional_modules` on demand. Membership tests for an
+    optional module only import that module, while other operations
+    such as iteration import all of them first.
+    """
+
+    def _probe(self, mod):
+        if mod not in optional_modules or mod in disabled_modules:
+            return
+        if list.__contains__(available_modules, mod) or list.__contains__(unavailable_modules, mod):
+            return
+        try:
+            __import__(mod)
+            list.append(available_modules, mod)
+        except ImportError:
+            list.append(unavailable_modules, mod)
+        logging.debug('optional module %s available=%r' % (mod, list.__contains__(available_modules, mod)))
+
+    def _probe_all(self):
+        for mod in optional_modules:
+            self._probe(mod)
+
+    def __contains__(self, mod):
+        self._probe(mod)
+        return list.__contains__(self, mod)
+
+    def __iter__(self):
+        self._probe_all()
+        return list.__iter__(self)
+
+    def __len__(self):
+        self._probe_all()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self._probe_all()
+        return list.__getitem__(self, index)
+
+    def __repr__(self):
+        self._probe_all()
+        return list.__repr__(self)
+
+    def index(self, mod, *args):
+        self._probe(mod)
+        return list.index(self, mod, *args)
+
+    def count(self, mod):
+        self._probe(mod)
+        return list.count(self, mod)
+
+available_modules = ModuleList()
+unavailable_modules = ModuleList()
 
 logging.debug('disabled_modules %r' % disabled_modules)
-logging.debug('available_modules %r' % available_modules)
-logging.debug('unavailable_modules %r' % unavailable_modules)
 
 if 'netCDF4' in available_modules:
     from netCDF4 import Dataset
@@ -278,6 +326,7 @@ import quippy.asap
 import quippy.povray
 import quippy.cube
 import quippy.netcdf
+import quippy.qtraj
 import quippy.imd
 import quippy.vasp
 import quippy.dan
@@ -59,9 +59,6 @@ if 'ase' in available_modules:
 else:
     import quippy.miniase as ase
 
-if 'phonopy' in available_modules:
-    from phonopy.structure.atoms import Atoms as PhonopyAtoms
-
 get_lattice_params_ = get_lattice_params
 
 def get_lattice_params(lattice):
@@ -140,10 +137,10 @@ class Connection(_atoms.Connection):
 
     def pairs(self):
         """Yield pairs of atoms (i,j) with i < j which are neighbours"""
-        for i, neighbour_list in zip(self.parent.indices, self.iterneighbours()):
-            for neighb in neighbour_list:
-                if i < neighb.j:
-                    yield (i,neighb.j)
+        i_index, j = self.neighbour_csr()[:2]
+        i = self._csr_centres(i_index)
+        for pair in zip(i[i < j], j[i < j]):
+            yield tuple(int(x) for x in pair)
 
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
@@ -194,14 +191,90 @@ class Connection(_atoms.Connection):
     def distances(self, Z1=None, Z2=None):
         """Distances between pairs of neighbours, optionally
            filtered by species (Z1,Z2)"""
-        for i in self.parent.indices:
-            for neighb in self[i]:
-                if neighb.j > i: continue
-                if Z1 is not None and Z2 is not None:
-                    if sorted((self.parent.z[i], self.parent.z[neighb.j])) == sorted((Z1, Z2)):
-                        yield neighb.distance
+        i_index, j, shift, distance = self.neighbour_csr()[:4]
+        i = self._csr_centres(i_index)
+        mask = j <= i
+        if Z1 is not None and Z2 is not None:
+            z = np.array(self.parent.z)
+            if get_fortran_indexing():
+                z = np.r_[0, z]
+            zi, zj = z[i], z[j]
+            mask &= (((zi == Z1) & (zj == Z2)) | ((zi == Z2) & (zj == Z1)))
+        for d in distance[mask]:
+            yield float(d)
+
+    def _csr_centres(self, i_index):
+        # Expand CSR row pointers to the index of the central atom of each neighbour
+        i = np.repeat(np.arange(len(i_index)-1), np.diff(i_index))
+        if get_fortran_indexing():
+            i += 1
+        return i
+
+    def neighbour_csr(self, cutoff=None, Z1=None, Z2=None):
+        """
+        Return the neighbour list of all atoms as a tuple of arrays
+        ``(i_index, j, shift, distance, diff)`` in compressed sparse
+        row form, filled in a single call to
+        :meth:`fill_neighbour_csr` rather than one call per neighbour.
+
+        The neighbours of the k-th atom (counting from zero) are
+        entries ``i_index[k]:i_index[k+1]`` of the other arrays, in the
+        same order as returned by indexing this :class:`Connection`.
+        `j` contains the neighbour indices, which start from 1 if
+        ``fortran_indexing`` is True. `shift` and `diff` have shape
+        ``(n_neighbours, 3)``, and `distance` has shape
+        ``(n_neighbours,)``. All are standard :class:`numpy.ndarray`
+        objects.
+
+        If `cutoff` is given, only neighbours closer than `cutoff` are
+        included. If `Z1` is given only atoms with atomic number `Z1`
+        have neighbours, and if `Z2` is also given only neighbours with
+        atomic number `Z2` are included.
+
+        The index of the central atom of each neighbour can be
+        recovered with ``np.repeat(at.indices, np.diff(i_index))``.
+        """
+        if not self.initialised:
+            if self is self.parent.hysteretic_connect:
+                self.calc_connect_hysteretic(self.parent)
+            else:
+                self.calc_connect(self.parent)
+
+        at = self.parent
+        n_total = self.n_neighbours_total()
+        i_index = fzeros(at.n+1, dtype=np.int32)
+        j = fzeros(n_total, dtype=np.int32)
+        shift = fzeros((3, n_total), dtype=np.int32)
+        distance = fzeros(n_total)
+        diff = fzeros((3, n_total))
+        self.fill_neighbour_csr(at, i_index, j, shift, distance, diff)
+
+        i_index = np.array(i_index) - 1
+        j = np.array(j)
+        if not get_fortran_indexing():
+            j -= 1
+        shift = np.array(shift).T.copy()
+        distance = np.array(distance)
+        diff = np.array(diff).T.copy()
+
+        if cutoff is None and Z1 is None:
+            return (i_index, j, shift, distance, diff)
+
+        i = np.repeat(np.arange(at.n), np.diff(i_index))
+        mask = np.ones(n_total, dtype=bool)
+        if cutoff is not None:
+            mask &= distance < cutoff
+        if Z1 is not None:
+            z = np.array(at.z)
+            mask &= z[i] == Z1
+            if Z2 is not None:
+                if get_fortran_indexing():
+                    mask &= z[j-1] == Z2
                 else:
-                    yield neighb.distance
+                    mask &= z[j] == Z2
+
+        i_index = np.r_[0, np.cumsum(np.bincount(i[mask], minlength=at.n))]
+        return (i_index, j[mask], shift[mask], distance[mask], diff[mask])
 
     def get_neighbours(self, i):
         """
@@ -350,9 +423,11 @@ class Atoms(_atoms.Atoms, ase.Atoms):
             self.copy_from(symbols)
             symbols = None
 
-        # Phonopy compatibility
-        if 'phonopy' in available_modules:
-            if symbols is not None and isinstance(symbols, PhonopyAtoms):
+        # Phonopy compatibility - only import phonopy if we might need it
+        if (symbols is not None and type(symbols).__module__.startswith('phonopy') and
+            'phonopy' in available_modules):
+            from phonopy.structure.atoms import Atoms as PhonopyAtoms
+            if isinstance(symbols, PhonopyAtoms):
                 atoms = symbols
                 symbols = atoms.get_chemical_symbols()
                 cell = atoms.get_cell()
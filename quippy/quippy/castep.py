@@ -23,7 +23,7 @@
 # HND X
 # HND XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
 
-import sys, string, os, operator, itertools, logging, glob, re, shutil
+import sys, string, os, operator, itertools, logging, glob, re, shutil, cStringIO
 import numpy as np
 
 from quippy.atoms import Atoms, make_lattice, get_lattice_params
@@ -532,38 +532,244 @@ class CastepParam(OrderedDict):
             value = castep_output_map.get(value, value)
             paramfile.write('%s = %s\n' % (key, value))
 
-@atoms_reader('geom')
-@atoms_reader('md')
-def CastepGeomMDReader(source, atoms_ref=None, format=None):
-    """Generator to read frames from CASTEP .geom and .md files"""
-
-    if type(source) == type(''):
-        source = open(source, 'r')
-    source = iter(source)
-
-    if atoms_ref is not None and not atoms_ref.has_property('frac_pos'):
-        atoms_ref.add_property('frac_pos', 0.0, n_cols=3)
-        atoms_ref.frac_pos[:] = np.dot(atoms_ref.g, atoms_ref.pos)
-
-    while True:
-        lines = []
-        line = source.next().strip() # raises StopIteration at end of file
-
-        # Skip header if present
-        if line.startswith('BEGIN header'):
-            while not line.startswith('END header'):
-                line = source.next().strip()
-            source.next() # skip blank line
+def _lines_file(lines):
+    # Join a sequence of lines, with or without newlines, into a seekable file
+    return cStringIO.StringIO(''.join([line.endswith('\n') and line or line+'\n' for line in lines]))
+
+def _read_frame_index(index_name):
+    """
+    Read a frame index written by :func:`_write_frame_index`. Returns
+    lists of offsets and flags, each with one entry per frame plus a
+    final entry for the end of the last frame.
+    """
+    index = open(index_name, 'r')
+    try:
+        n_frames = int(index.readline())
+        offsets, flags = [], []
+        for i in range(n_frames+1):
+            offset, flag = index.readline().split()
+            offsets.append(int(offset))
+            flags.append(int(flag))
+    finally:
+        index.close()
+    return offsets, flags
+
+def _write_frame_index(index_name, offsets, flags):
+    """
+    Write a frame index in the same layout as the ``.xyz.idx`` files
+    made by ``libAtoms/xyz.c``: the number of frames on the first line,
+    then the byte offset and an integer flag for each frame and for the
+    end of the last frame.
+    """
+    index = open(index_name, 'w')
+    try:
+        index.write('%d\n' % (len(offsets)-1))
+        for offset, flag in zip(offsets, flags):
+            index.write('%d %d\n' % (offset, flag))
+    finally:
+        index.close()
+
+class CastepIndexedReader(object):
+    """
+    Base class for readers of CASTEP output files with one frame per
+    iteration. On first use the file is scanned once, without parsing,
+    to find the byte offset at which each frame starts. Frames are then
+    read and parsed only when they are accessed, so the readers support
+    ``len()`` and random access by index, including through
+    :class:`~quippy.io.AtomsReader`.
+
+    When `source` is a filename and `index` is true (the default), the
+    offsets are saved in a file with ``.idx`` appended to the name. The
+    index is reused while it is newer than the output file, and is
+    extended from the last frame it contains if the file has grown, for
+    example because the calculation is still running. `source` can also
+    be an open file or a list of lines.
+
+    Subclasses implement :meth:`_scan` and :meth:`_parse`.
+    """
+
+    def __init__(self, source, frame=None, index=True):
+        if isinstance(source, basestring):
+            self.filename = source
+            self.file = open(source, 'r')
+            self.opened = True
+        elif hasattr(source, 'seek') and hasattr(source, 'tell'):
+            self.filename = None
+            self.file = source
+            self.opened = False
+        else:
+            self.filename = None
+            self.file = _lines_file(source)
+            self.opened = True
+
+        self.offsets, self.flags = self._build_index(index)
+        self.frame = frame
+
+    def _build_index(self, use_index):
+        index_name = None
+        offsets, flags = [], []
+        if self.filename is not None and use_index:
+            index_name = self.filename + '.idx'
+            if os.path.exists(index_name):
+                try:
+                    offsets, flags = _read_frame_index(index_name)
+                except (IOError, ValueError):
+                    logging.warning('Ignoring unreadable index file %s' % index_name)
+                    offsets, flags = [], []
+
+        self.file.seek(0, 2)
+        size = self.file.tell()
+        if offsets and os.path.getmtime(self.filename) <= os.path.getmtime(index_name) and offsets[-1] == size:
+            return offsets, flags
+
+        resume = 0
+        if len(offsets) >= 2 and offsets[-1] <= size:
+            # The file has grown, and the last frame may have been
+            # incomplete, so rescan from the start of the last frame
+            resume = offsets[-2]
+            offsets, flags = offsets[:-2], flags[:-2]
         else:
-            lines.append(line)
+            offsets, flags = [], []
+        self.file.seek(resume)
+        logging.debug('Scanning %s for frames from offset %d' % (self.filename, self.file.tell()))
+        end = self._scan(offsets, flags)
+        offsets.append(end)
+        flags.append(0)
+
+        if index_name is not None:
+            try:
+                _write_frame_index(index_name, offsets, flags)
+            except IOError:
+                logging.warning('Cannot write index file %s' % index_name)
+        return offsets, flags
+
+    def _scan(self, offsets, flags):
+        """
+        Read lines from the current position of :attr:`file` to the end,
+        appending the offset and flag of each complete frame found to
+        `offsets` and `flags`. Returns the offset of the end of the last
+        complete frame.
+        """
+        raise NotImplementedError
+
+    def _parse(self, frame, lines):
+        """
+        Return an :class:`~quippy.atoms.Atoms` object for `frame`, given
+        its lines with trailing whitespace removed
+        """
+        raise NotImplementedError
+
+    def frame_lines(self, frame):
+        """
+        Return the lines of `frame`, with trailing whitespace removed
+        """
+        if frame < 0: frame = frame + len(self)
+        if frame < 0 or frame >= len(self):
+            raise IndexError('frame %d out of range 0..%d' % (frame, len(self)-1))
+        self.file.seek(self.offsets[frame])
+        return [line.rstrip() for line in
+                self.file.read(self.offsets[frame+1] - self.offsets[frame]).splitlines()]
+
+    def __len__(self):
+        return len(self.offsets)-1
+
+    def __getitem__(self, frame):
+        if isinstance(frame, slice):
+            return [self[f] for f in range(*frame.indices(len(self)))]
+        if frame < 0: frame = frame + len(self)
+        return self._parse(frame, self.frame_lines(frame))
+
+    def __iter__(self):
+        if self.frame is not None:
+            yield self[self.frame]
+            return
+        for frame in range(len(self)):
+            yield self[frame]
 
-        # Read until next blank line
-        while line != '':
-            line = source.next().strip()
-            if line != '': lines.append(line)
+    def close(self):
+        if self.opened:
+            self.file.close()
 
-        if len(lines) <= 1:
-            raise StopIteration
+@atoms_reader('geom')
+@atoms_reader('md')
+class CastepGeomMDReader(CastepIndexedReader):
+    """
+    Read frames from CASTEP .geom and .md files.
+
+    Frames are separated by blank lines, and each line of a frame is
+    labelled by a tag at the end such as ``<-- R`` for positions. The
+    velocities, forces and stress are only parsed if they are listed in
+    `blocks`, which defaults to :attr:`BLOCKS`. See
+    :class:`CastepIndexedReader` for the remaining arguments.
+    """
+
+    BLOCKS = ('velocities', 'forces', 'stress')
+
+    def __init__(self, source, atoms_ref=None, format=None, frame=None, index=True, blocks=None):
+        CastepIndexedReader.__init__(self, source, frame, index)
+        if blocks is None:
+            blocks = self.BLOCKS
+        self.blocks = blocks
+        self.atoms_ref = atoms_ref
+        self.atoms_ref_given = atoms_ref is not None
+        if atoms_ref is not None and not atoms_ref.has_property('frac_pos'):
+            atoms_ref.add_property('frac_pos', 0.0, n_cols=3)
+            atoms_ref.frac_pos[:] = np.dot(atoms_ref.g, atoms_ref.pos)
+
+    def _scan(self, offsets, flags):
+        # States: between frames (possibly in a header), or in a frame
+        # which started at frame_start and has n_lines lines so far
+        f = self.file
+        in_header = False
+        frame_start = None
+        n_lines = 0
+        end = f.tell()
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            line = line.strip()
+            if in_header:
+                if line.startswith('END header'):
+                    in_header = False
+                    f.readline() # skip blank line
+                    end = f.tell()
+            elif frame_start is None:
+                if line.startswith('BEGIN header'):
+                    in_header = True
+                elif line == '':
+                    break
+                else:
+                    frame_start = offset
+                    n_lines = 1
+            elif line != '':
+                n_lines += 1
+            else:
+                if n_lines <= 1:
+                    break
+                offsets.append(frame_start)
+                flags.append(0)
+                frame_start = None
+                end = f.tell()
+        return end
+
+    def _reference(self, frame):
+        # Frames after the first inherit from the first, as when they are read in sequence
+        if frame == 0 and not self.atoms_ref_given:
+            return None
+        if self.atoms_ref is None:
+            self._parse(0, self.frame_lines(0))
+        return self.atoms_ref
+
+    def _parse(self, frame, lines):
+        atoms_ref = self._reference(frame)
+
+        # Sort lines by the tag at the end of each one in a single pass
+        tagged = {}
+        for line in lines[1:]:
+            if line[-5:-1] == '<-- ':
+                tagged.setdefault(line[-1], []).append(line)
 
         params = Dictionary()
 
@@ -571,7 +777,7 @@ def CastepGeomMDReader(source, atoms_ref=None, format=None):
         params['time'] = float(lines[0])*AU_FS
 
         # Then the energy, in Hartree - we convert to eV
-        energy_lines = filter(lambda s: s.endswith('<-- E'), lines)
+        energy_lines = tagged.get('E', [])
         if len(energy_lines) != 1:
             raise ValueError('Number of energy lines should be exactly one. Got %r' % energy_lines)
 
@@ -579,21 +785,21 @@ def CastepGeomMDReader(source, atoms_ref=None, format=None):
                                [float(x)*HARTREE for x in energy_lines[0].split()[0:2]]
 
         # Temperature, in atomic units - we convert to Kelvin
-        temperature_lines = filter(lambda s: s.endswith('<-- T'), lines)
+        temperature_lines = tagged.get('T', [])
         if temperature_lines:
             if len(temperature_lines) != 1:
                 raise ValueError('Number of temperature lines should be exactly one. Got %r' % temperature_lines)
             params['temperature'] = float(temperature_lines[0].split()[0])*HARTREE/BOLTZMANN_K
 
         # Pressure, in atomic units - we convert to ev/A**3
-        pressure_lines = filter(lambda s: s.endswith('<-- P'), lines)
+        pressure_lines = tagged.get('P', [])
         if pressure_lines:
             if len(pressure_lines) != 1:
                 raise ValueError('Number of pressure lines should be exactly one. Got %r' % pressure_lines)
             params['pressure'] = float(pressure_lines[0].split()[0])*HARTREE/BOHR**3
 
         # Lattice is next, in units of Bohr
-        lattice_lines = filter(lambda s: s.endswith('<-- h'), lines)
+        lattice_lines = tagged.get('h', [])
         if lattice_lines:
             lattice = farray([ [float(x)* BOHR for x in row[0:3]]
                                for row in map(string.split, lattice_lines) ]).T
@@ -605,15 +811,15 @@ def CastepGeomMDReader(source, atoms_ref=None, format=None):
 
         # Then optionally virial tensor - convert stress tensor to eV/A**3
         # then multiply by cell volume to get virial in eV
-        stress_lines  = filter(lambda s: s.endswith('<-- S'), lines)
+        stress_lines = 'stress' in self.blocks and tagged.get('S', [])
         if stress_lines:
             virial = farray([ [float(x)*(HARTREE/(BOHR**3)) for x in row[0:3]]
                               for row in map(string.split, stress_lines) ]).T
 
         # Find positions and forces
-        poslines   = filter(lambda s: s.endswith('<-- R'), lines)
-        velolines  = filter(lambda s: s.endswith('<-- V'), lines)
-        forcelines = filter(lambda s: s.endswith('<-- F'), lines)
+        poslines   = tagged.get('R', [])
+        velolines  = tagged.get('V', [])
+        forcelines = tagged.get('F', [])
 
         if poslines and forcelines and len(poslines) != len(forcelines):
             raise ValueError('Number of pos lines (%d) != force lines (%d)'
@@ -669,7 +875,7 @@ def CastepGeomMDReader(source, atoms_ref=None, format=None):
             at.pos[:] = np.dot(at.lattice, at.frac_pos)
 
         # Velocities, if this is an MD file, from atomic units to A/fs
-        if velolines:
+        if velolines and 'velocities' in self.blocks:
             at.add_property('velo', 0.0, n_cols=3)
             for i, line in fenumerate(velolines):
                 el, num, vx, vy, vz, arrow, label = line.split()
@@ -677,7 +883,7 @@ def CastepGeomMDReader(source, atoms_ref=None, format=None):
                 at.velo[:,lookup[(el,num)]] = [ float(f)*BOHR/AU_FS for f in (vx, vy, vz) ]
 
         # And finally the forces, which are in units of Hartree/Bohr
-        if forcelines:
+        if forcelines and 'forces' in self.blocks:
             at.add_property('force', 0.0, n_cols=3)
             for i, line in fenumerate(forcelines):
                 el, num, fx, fy, fz, arrow, label = line.split()
@@ -687,104 +893,212 @@ def CastepGeomMDReader(source, atoms_ref=None, format=None):
         if stress_lines:
             at.params['virial'] = -virial*at.cell_volume()
 
-        if atoms_ref is None:
-            atoms_ref = at.copy()
+        if self.atoms_ref is None:
+            self.atoms_ref = at.copy()
 
-        yield at
+        return at
 
 # Synonyms
 CastepGeomReader = CastepMDReader = CastepGeomMDReader
 
+# Lines which end an iteration in a .castep file
+castep_iteration_markers = (' Starting MD iteration',
+                            ' Starting BFGS iteration',
+                            ' BFGS: improving iteration')
+
+castep_user_parameters_line = ' ******************************* User Parameters *******************************'
+
+# Headers of the force and stress blocks, as '****** <label> ******'
+castep_force_stress_labels = ('Forces', 'Symmetrised Forces', 'Ewald forces', 'Local potential forces',
+                              'Non-local potential forces', 'External potential forces',
+                              'Stress Tensor', 'Symmetrised Stress Tensor')
+
+# Set in the flags of frames which contain the user parameters
+CASTEP_FRAME_HAS_PARAMS = 1
+
+def _find_castep_sections(castep_output):
+    """
+    Find the lines of interest in the lines of a single iteration of a
+    .castep file in one pass. Returns a dictionary mapping each section
+    name to a list of line numbers.
+    """
+    sections = {}
+    def found(name, i):
+        if name in sections:
+            sections[name].append(i)
+        else:
+            sections[name] = [i]
+
+    for i, s in enumerate(castep_output):
+        if not s:
+            continue
+        # force and stress headers may or may not be indented
+        if '******' in s:
+            for label in castep_force_stress_labels:
+                if s.find('****** %s ******' % label) != -1:
+                    found(label, i)
+            continue
+        if s[0] == ' ':
+            if s == '                                      Unit Cell':
+                found('unit_cell', i)
+            elif s == '                                     Cell Contents':
+                found('cell_contents', i)
+            elif s.startswith(' Total energy corrected for finite basis set'):
+                found('energy_corrected', i)
+            elif s.startswith(' BFGS: finished iteration ') or s.startswith(' BFGS: Final Enthalpy'):
+                found('enthalpy', i)
+            elif s == '     Atomic Populations' or s == '     Atomic Populations (Mulliken)':
+                found(s.strip(), i)
+            elif s == ' calculate electric dipole moment of system     : on':
+                found('dipole_on', i)
+            elif s.startswith('  +  Magnitude of Dipole'):
+                found('dipole_magnitude', i)
+            elif s.startswith('  +  Direction of Dipole'):
+                found('dipole_direction', i)
+            elif s == '                              k-Points For BZ Sampling':
+                found('kpoints', i)
+        elif s.startswith('Total time'):
+            found('total_time', i)
+        elif s.startswith('Total energy has converged'):
+            found('converged', i)
+        elif s.startswith('Final energy') and not s.endswith('<- EDFT'):
+            found('energy_final', i)
+        elif s.startswith('Final free energy (E-TS)'):
+            found('energy_free', i)
+
+    return sections
+
 @atoms_reader('castep')
 @atoms_reader('castep_log')
-def CastepOutputReader(castep_file, atoms_ref=None, abort=False, format=None):
-    """Parse .castep file, and return Atoms object with positions,
-       energy, forces, and possibly stress and atomic populations as
-       well"""
-
-    if type(castep_file) == type(''):
-        castep_file_name = castep_file
-        castep_file = open(castep_file,'r')
-    else:
-        castep_file_name = '<open file>'
-    castep_file = iter(castep_file)
-
-    param = CastepParam()
-
-    if atoms_ref is not None and not atoms_ref.has_property('frac_pos'):
-        atoms_ref.add_property('frac_pos', 0.0, n_cols=3)
-        atoms_ref.frac_pos[:] = np.dot(atoms_ref.g, atoms_ref.pos)
-
-    got_header = False
-    eof = False
-    while True:
-
-        castep_output = []
+class CastepOutputReader(CastepIndexedReader):
+    """
+    Parse .castep file, and return Atoms object with positions,
+    energy, forces, and possibly stress and atomic populations as
+    well, for each iteration.
+
+    `blocks` is a list of the optional sections of each iteration to
+    parse, by default all of :attr:`BLOCKS`. Leaving out ones that are
+    not needed makes reading faster. See :class:`CastepIndexedReader`
+    for the remaining arguments.
+    """
+
+    BLOCKS = ('forces', 'force_components', 'stress', 'populations', 'dipoles', 'kpoints')
+
+    def __init__(self, castep_file, atoms_ref=None, abort=False, format=None, frame=None,
+                 index=True, blocks=None):
+        CastepIndexedReader.__init__(self, castep_file, frame, index)
+        if self.filename is not None:
+            self.castep_file_name = self.filename
+        else:
+            self.castep_file_name = '<open file>'
+        if blocks is None:
+            blocks = self.BLOCKS
+        self.blocks = blocks
+        self.abort = abort
+
+        self.atoms_ref = atoms_ref
+        self.atoms_ref_given = atoms_ref is not None
+        if atoms_ref is not None and not atoms_ref.has_property('frac_pos'):
+            atoms_ref.add_property('frac_pos', 0.0, n_cols=3)
+            atoms_ref.frac_pos[:] = np.dot(atoms_ref.g, atoms_ref.pos)
+
+        self._param_file = None
+        self._header_params = {}
+
+    def _scan(self, offsets, flags):
+        f = self.file
+        frame_start = f.tell()
+        flag = 0
         while True:
-            try:
-                line = castep_file.next()
-            except StopIteration:
-                eof = True
-                break
-            castep_output.append(line)
-
-            if line.startswith(' Atomic calculation performed'):
-                if got_header:
-                    got_param = True
-                else:
-                    got_header = True
-
-            if line.startswith(' Starting MD iteration'):
-                break
-
-            if line.startswith(' Starting BFGS iteration'):
+            line = f.readline()
+            if not line:
                 break
+            if line.startswith(castep_user_parameters_line):
+                flag |= CASTEP_FRAME_HAS_PARAMS
+            elif line.startswith(castep_iteration_markers):
+                offsets.append(frame_start)
+                flags.append(flag)
+                frame_start = f.tell()
+                flag = 0
+        if f.tell() > frame_start:
+            offsets.append(frame_start)
+            flags.append(flag)
+        return f.tell()
+
+    def _read_param_file(self):
+        # If iprint < 2, params are not in .castep, file so let's look for .param file in same place
+        if self._param_file is None:
+            self._param_file = CastepParam()
+            param_file = os.path.splitext(self.castep_file_name)[0]+'.param'
+            if os.path.exists(param_file):
+                self._param_file.read(param_file)
+            else:
+                self._param_file = False
+        return self._param_file
+
+    def _params_after(self, frame):
+        # Parameters are accumulated from the start of the file: each
+        # iteration adds the user parameters it contains, or those from
+        # the .param file if it has none
+        header_frames = [i for i in range(frame+1) if self.flags[i] & CASTEP_FRAME_HAS_PARAMS]
+        param = CastepParam()
+        last = -1
+        for i in header_frames:
+            if i not in self._header_params:
+                self._header_params[i] = CastepParam()
+                try:
+                    self._header_params[i].read_from_castep_output(self.frame_lines(i))
+                except ValueError:
+                    self._header_params[i] = None
+            if i > last + 1 or self._header_params[i] is None:
+                self._update_from_param_file(param)
+            if self._header_params[i] is not None:
+                param.update(self._header_params[i])
+            last = i
+        if frame > last:
+            self._update_from_param_file(param)
+        return param
+
+    def _update_from_param_file(self, param):
+        param_file = self._read_param_file()
+        if param_file:
+            param.update(param_file)
+        elif self.abort:
+            raise ValueError('No user parameters found in castep output')
 
-            if line.startswith(' BFGS: improving iteration'):
-                break
+    def _reference(self, frame):
+        # Iterations after the first inherit from the first, as when they are read in sequence
+        if frame == 0 and not self.atoms_ref_given:
+            return None
+        if self.atoms_ref is None:
+            self._parse(0, self.frame_lines(0))
+        return self.atoms_ref
 
-        if castep_output == []:
-            break
+    def _parse(self, frame, castep_output):
+        atoms_ref = self._reference(frame)
+        param = self._params_after(frame)
+        sections = _find_castep_sections(castep_output)
+        abort = self.abort
 
-        # Remove newlines from end of each line in castep_output
-        castep_output = [line.rstrip() for line in castep_output]
+        def last(name):
+            return sections.get(name, [None])[-1]
 
         # NB: CASTEP doesn't always print 'Total time'
         run_time = None
-        total_time = filter(lambda s: s.startswith('Total time'), castep_output)
-        if total_time == []:
-            has_converged = filter(lambda s: s.startswith('Total energy has converged'), castep_output)
-            if abort and has_converged == []:
+        if 'total_time' not in sections:
+            if abort and 'converged' not in sections:
                 raise ValueError("castep didn't complete")
         else:
-            run_time = float(total_time[0].split()[3])
-
-        # Now we should have contents of a valid .castep file in castep_output
-
-        # First let's read the user parameters for this run from top of file
-        new_param = CastepParam()
-        try:
-            new_param.read_from_castep_output(castep_output)
-            param.update(new_param)
-        except ValueError:
-            # If iprint < 2, params are not in .castep, file so let's look for .param file in same place
-            param_file = os.path.splitext(castep_file_name)[0]+'.param'
-            if os.path.exists(param_file):
-                new_param.read(param_file)
-                param.update(new_param)
-            elif abort:
-                raise
+            run_time = float(castep_output[sections['total_time'][0]].split()[3])
 
         # Next let's extract the lattice and atomic positions
-        lattice_lines = [i for (i,x) in enumerate(castep_output) if x == '                                      Unit Cell']
-
-        if lattice_lines == []:
+        if 'unit_cell' not in sections:
             if atoms_ref is None or abort:
                 raise ValueError('No unit cell found in castep file - try passing atoms_ref')
             else:
                 lattice = atoms_ref.lattice.copy()
         else:
-            lattice_line = lattice_lines[-1] # last lattice
+            lattice_line = last('unit_cell') # last lattice
 
             lattice_lines = castep_output[lattice_line+3:lattice_line+6]
             lattice = fzeros((3,3))
@@ -792,8 +1106,8 @@ def CastepOutputReader(castep_file, atoms_ref=None, abort=False, format=None):
             lattice[:,2] = map(float, lattice_lines[1].split()[0:3])
             lattice[:,3] = map(float, lattice_lines[2].split()[0:3])
 
-        cell_contents = [i for (i,x) in  enumerate(castep_output) if x == '                                     Cell Contents']
-        if cell_contents == []:
+        cell_contents = 'cell_contents' in sections
+        if not cell_contents:
             if atoms_ref is None or abort:
                 raise ValueError('No cell contents found in castep file - try passing atoms_ref')
             else:
@@ -801,7 +1115,7 @@ def CastepOutputReader(castep_file, atoms_ref=None, abort=False, format=None):
                 n_atoms = atoms_ref.n
 
         if cell_contents:
-            cell_first_line = cell_contents[-1] # last cell contents line
+            cell_first_line = last('cell_contents') # last cell contents line
 
             try:
                 n_atoms = int(castep_output[cell_first_line+2].split()[-1])
@@ -859,121 +1173,92 @@ def CastepOutputReader(castep_file, atoms_ref=None, abort=False, format=None):
         # (correct if we're doing a variable cell geom. opt. with fixed ions)
         atoms.pos[:] = np.dot(atoms.lattice, atoms.frac_pos)
 
-        energy_lines = filter(lambda s: s.startswith('Final energy') and not s.endswith('<- EDFT'), castep_output)
-
-        # If we're using smearing, correct energy is 'free energy'
-        energy_lines.extend(filter(lambda s: s.startswith('Final free energy (E-TS)'), castep_output))
-
-        # Are we doing finite basis correction?
-        energy_lines.extend(filter(lambda s: s.startswith(' Total energy corrected for finite basis set'), castep_output))
+        # If we're using smearing, correct energy is 'free energy', and
+        # if we're doing finite basis correction that takes precedence
+        energy_line = None
+        for name in ('energy_corrected', 'energy_free', 'energy_final'):
+            if name in sections:
+                energy_line = castep_output[last(name)]
+                break
 
-        if (len(energy_lines) == 0):
+        if energy_line is None:
             if abort:
                 raise ValueError('No total energy found in castep file')
         else:
-            # Use last matching energy line in file
             # Has this energy been corrected for the finite basis set?
             energy_param_name = 'energy'
-            if 'not corrected for finite basis set' in energy_lines[-1]: energy_param_name = 'energy_no_basis_corr'
+            if 'not corrected for finite basis set' in energy_line: energy_param_name = 'energy_no_basis_corr'
 
-            fields = energy_lines[-1].split()
+            fields = energy_line.split()
             if 'eV' not in fields:
                 if abort:
-                    raise ValueError('No value found in energy line "%s"' % energy_lines[-1])
+                    raise ValueError('No value found in energy line "%s"' % energy_line)
             else:
                 atoms.params[energy_param_name] = float(fields[fields.index('eV')-1])
 
         # If we're doing geom-opt, look for enthalpy
-        enthalpy_lines = [s for s in castep_output if s.startswith(' BFGS: finished iteration ') or
-                          s.startswith(' BFGS: Final Enthalpy')]
-        if enthalpy_lines:
-            atoms.params['enthalpy'] = float(enthalpy_lines[-1].split()[-2])
-
-        try:
-
-            for fn in ('Forces', 'Symmetrised Forces'):
-                force_start_lines = [i for (i,s) in enumerate(castep_output) if s.find('****** %s ******' % fn) != -1]
-                if force_start_lines: break
-
-            if force_start_lines == []:
-                raise ValueError
-
-            # Use last set of forces
-            force_start = force_start_lines[-1]
+        if 'enthalpy' in sections:
+            atoms.params['enthalpy'] = float(castep_output[last('enthalpy')].split()[-2])
 
+        def read_forces(force_start, name):
             # Extract force lines from .castep file
             force_lines = castep_output[force_start+6:force_start+6+atoms.n]
 
             # remove "cons" tags from constrained degrees of freedom
             force_lines = [ s.replace("(cons' d)", "") for s in force_lines ]
 
-            atoms.add_property('force',0.0,n_cols=3)
+            atoms.add_property(name,0.0,overwrite=True,n_cols=3)
 
             # Fill in the forces
             for i, line in enumerate(force_lines):
                 line = line.replace('*','') # Remove the *s
                 el, num_str, fx, fy, fz = line.split()
                 num = int(num_str)
-                atoms.force[:,lookup[(el,num)]] = (fx,fy,fz)
-
-        except ValueError, m:
-            if abort:
-                raise ValueError('No forces found in castep file %s: ' % m)
-
-        # Individual contributions to total force
-        for name,label in [('force_ewald', 'Ewald forces'),
-                           ('force_locpot', 'Local potential forces'),
-                           ('force_nlpot', 'Non-local potential forces'),
-                           ('force_extpot', 'External potential forces')]:
-            force_start_lines = [i for (i,s) in enumerate(castep_output) if s.find('****** %s ******' % label) != -1]
-            if force_start_lines == []: continue
+                getattr(atoms, name)[:,lookup[(el,num)]] = (fx,fy,fz)
 
+        if 'forces' in self.blocks:
             # Use last set of forces
-            force_start = force_start_lines[-1]
-
-            # Extract force lines from .castep file
-            force_lines = castep_output[force_start+6:force_start+6+atoms.n]
-
-            # remove "cons" tags from constrained degrees of freedom
-            force_lines = [ s.replace("(cons' d)", "") for s in force_lines ]
-
-            atoms.add_property(name,0.0,overwrite=True,n_cols=3)
+            force_start = last('Forces')
+            if force_start is None:
+                force_start = last('Symmetrised Forces')
+            try:
+                if force_start is None:
+                    raise ValueError('no force block')
+                read_forces(force_start, 'force')
+            except ValueError, m:
+                if abort:
+                    raise ValueError('No forces found in castep file %s: %s' % (self.castep_file_name, m))
 
-            # Fill in the forces
-            for i, line in enumerate(force_lines):
-                line = line.replace('*','') # Remove the *s
-                el, num_str, fx, fy, fz = line.split()
-                num = int(num_str)
-                getattr(atoms, name)[:,lookup[(el,num)]] = (fx,fy,fz)
+        # Individual contributions to total force
+        if 'force_components' in self.blocks:
+            for name,label in [('force_ewald', 'Ewald forces'),
+                               ('force_locpot', 'Local potential forces'),
+                               ('force_nlpot', 'Non-local potential forces'),
+                               ('force_extpot', 'External potential forces')]:
+                if label in sections:
+                    read_forces(last(label), name)
 
         # Have we calculated stress?
         got_virial = False
-        for sn in ('Stress Tensor', 'Symmetrised Stress Tensor'):
-            stress_start_lines = [i for i,s in enumerate(castep_output) if s.find('****** %s ******' % sn) != -1 ]
-            if stress_start_lines: break
-
-        if stress_start_lines:
-            stress_start = stress_start_lines[-1]
-            stress_lines = castep_output[stress_start+6:stress_start+9]
-            virial = fzeros((3,3),float)
-            for i, line in fenumerate(stress_lines):
-                star1, label, vx, vy, vz, star2 = line.split()
-                virial[:,i] = [-float(v) for v in (vx,vy,vz) ]
-            got_virial = True
+        if 'stress' in self.blocks:
+            stress_start = last('Stress Tensor')
+            if stress_start is None:
+                stress_start = last('Symmetrised Stress Tensor')
+            if stress_start is not None:
+                stress_lines = castep_output[stress_start+6:stress_start+9]
+                virial = fzeros((3,3),float)
+                for i, line in fenumerate(stress_lines):
+                    star1, label, vx, vy, vz, star2 = line.split()
+                    virial[:,i] = [-float(v) for v in (vx,vy,vz) ]
+                got_virial = True
 
         spin_polarised = 'spin_polarised' in param and param['spin_polarised']
 
         # Have we calculated local populations and charges?
-        if 'popn_calculate' in param and param['popn_calculate']:
-            try:
-                try:
-                    popn_start = castep_output.index('     Atomic Populations')
-                except ValueError:
-                    try:
-                        popn_start = castep_output.index('     Atomic Populations (Mulliken)')
-                    except ValueError:
-                        raise
+        if 'populations' in self.blocks and 'popn_calculate' in param and param['popn_calculate']:
+            popn_start = sections.get('Atomic Populations', sections.get('Atomic Populations (Mulliken)', [None]))[0]
 
+            if popn_start is not None:
                 popn_lines = castep_output[popn_start+4:popn_start+4+atoms.n]
 
                 atoms.add_property('popn_s',0.0)
@@ -1000,16 +1285,15 @@ def CastepOutputReader(castep_file, atoms_ref=None, abort=False, format=None):
                     if spin_polarised:
                         atoms.popn_spin[lookup[(el,num)]] = float(spin)
 
-            except ValueError:
-                if abort:
-                    raise ValueError('No populations found in castep file')
+            elif abort:
+                raise ValueError('No populations found in castep file')
 
         mod_param = param.copy()
 
         # check for calculation of dipole moment - one vector per spin component
-        if ' calculate electric dipole moment of system     : on' in castep_output:
-            dipole_magnitudes = [s for s in castep_output if s.startswith('  +  Magnitude of Dipole')]
-            dipole_directions = [s for s in castep_output if s.startswith('  +  Direction of Dipole')]
+        if 'dipoles' in self.blocks and 'dipole_on' in sections:
+            dipole_magnitudes = [castep_output[i] for i in sections.get('dipole_magnitude', [])]
+            dipole_directions = [castep_output[i] for i in sections.get('dipole_direction', [])]
 
             dipoles = []
             for mag_line, dir_line in zip(dipole_magnitudes, dipole_directions):
@@ -1020,17 +1304,13 @@ def CastepOutputReader(castep_file, atoms_ref=None, abort=False, format=None):
             for i,dipole in fenumerate(dipoles):
                 mod_param['dipole%d' % i] = dipole
 
-
         # append K-point information
-        try:
-            kpoint_start = castep_output.index('                              k-Points For BZ Sampling')
-            kp_mesh_line = castep_output[kpoint_start+2]
+        if 'kpoints' in self.blocks and 'kpoints' in sections:
+            kp_mesh_line = castep_output[sections['kpoints'][0]+2]
             fields = kp_mesh_line.split()
             mod_param['kpoints_mp_grid'] = [int(fields[-3]), int(fields[-2]), int(fields[-1])]
-        except ValueError:
-            pass
 
-        mod_param['castep_file_name'] = castep_file_name
+        mod_param['castep_file_name'] = self.castep_file_name
 
         if run_time is not None:
             mod_param['castep_run_time'] = run_time
@@ -1039,15 +1319,12 @@ def CastepOutputReader(castep_file, atoms_ref=None, abort=False, format=None):
         if got_virial:
             mod_param['virial'] = virial*atoms.cell_volume()/GPA
 
-        if atoms_ref is None:
-            atoms_ref = atoms.copy()
+        if self.atoms_ref is None:
+            self.atoms_ref = atoms.copy()
 
         atoms.params.update(mod_param)
 
-        yield atoms
-
-        if eof:
-            break
+        return atoms
 
 @atoms_reader('magres')
 def MagresReader(source, atoms_ref=None, format=None):
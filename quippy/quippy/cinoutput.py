@@ -107,10 +107,16 @@ from quippy import FortranDerivedTypes
 FortranDerivedTypes['type(cinoutput)'] = CInOutput
 
 class CInOutputReader(object):
-    """Class to read atoms from a CInOutput. Supports generator and random access via indexing."""
+    """Class to read atoms from a CInOutput. Supports generator and random access via indexing.
+
+    If `cache` is a :class:`~quippy.io.FrameCache`, frames accessed by
+    index are stored in it and repeated accesses do not go back to the
+    file. This is not needed when reading through an :class:`~quippy.io.AtomsReader`,
+    which maintains its own cache."""
 
     def __init__(self, source, frame=None, range=None, start=0, stop=None, step=1, no_compute_index=False,
-                 zero=False, one_frame_per_file=False, indices=None, string=False, format=None):
+                 zero=False, one_frame_per_file=False, indices=None, string=False, format=None, cache=None):
+        self.cache = cache
         if isinstance(source, basestring):
             self.opened = True
             self.source = CInOutput(source, action=INPUT, append=False, zero=zero, range=range,
@@ -160,7 +166,14 @@ class CInOutputReader(object):
         return len(self.source)
 
     def __getitem__(self, idx):
-        return self.source[idx]
+        if self.cache is None or not (isinstance(idx, int) or isinstance(idx, np.integer)):
+            return self.source[idx]
+        if idx < 0: idx = idx + len(self.source)
+        at = self.cache.fetch(idx)
+        if at is None:
+            at = self.source[idx]
+            self.cache.store(idx, at)
+        return at
 
     def __getattr__(self, name):
         if self.netcdf_file is not None:
@@ -217,10 +230,10 @@ AtomsWriters['stdout'] = AtomsWriters['extxyz'] = AtomsWriters['xyz'] \
 
 class CInOutputStringReader(CInOutputReader):
     def __init__(self, source, frame=None, range=None, start=0, stop=None, step=1, no_compute_index=False,
-                 zero=False, one_frame_per_file=False, indices=None, format=None):
+                 zero=False, one_frame_per_file=False, indices=None, format=None, cache=None):
         CInOutputReader.__init__(self, source=source, frame=frame, range=range, start=start, stop=stop, step=step,
                                  no_compute_index=no_compute_index, zero=zero, one_frame_per_file=one_frame_per_file,
-                                 indices=indices, string=True)
+                                 indices=indices, string=True, cache=cache)
 
 AtomsReaders['string'] = CInOutputStringReader
 
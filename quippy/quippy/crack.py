@@ -54,6 +54,10 @@ __all__.extend(['crack_rescale_homogeneous_xy',
                 'make_crack_advance_map',
                 'find_crack_tip_coordination',
                 'irwin_modeI_crack_tip_stress_field',
+                'irwin_modeI_stress_components',
+                'IRWIN_PARAMS',
+                'CrackTipStressFitter',
+                'fit_crack_trajectory',
                 'strain_to_G',
                 'G_to_strain',
                 'get_strain',
@@ -889,6 +893,375 @@ class IrwinStressField(object):
         return sigma
 
 
+# Parameters of the Irwin K-field fit, in the order used by
+# :func:`irwin_modeI_stress_components` and :class:`CrackTipStressFitter`
+IRWIN_PARAMS = ['K', 'x0', 'y0', 'sxx0', 'syy0', 'sxy0']
+
+# Weights of xx, yy and xy residuals, so that xy and yx are both counted
+# as in a fit to the full stress tensor
+_IRWIN_WEIGHTS = np.array([1.0, 1.0, sqrt(2.0)])
+
+
+def irwin_modeI_stress_components(x, y, K, x0, y0, sxx0=0.0, syy0=0.0, sxy0=0.0,
+                                  jacobian=False):
+    """
+    Irwin singular crack tip stress field plus a uniform far field stress
+
+    Parameters
+    ----------
+    x, y : array_like
+       Positions at which to evaluate the stress field
+    K : float
+       Mode I stress intensity factor
+    x0, y0 : float
+       Position of crack tip
+    sxx0, syy0, sxy0 : float
+       Far field stress components
+    jacobian : bool
+       If True, also return derivatives with respect to the parameters
+
+    Returns
+    -------
+    sigma : array with shape ``x.shape + (3,)``
+       The xx, yy and xy components of the stress
+    jac : array with shape ``x.shape + (3, 6)``
+       Only if `jacobian` is True. Derivatives of `sigma` with respect
+       to the parameters, in the order given by :data:`IRWIN_PARAMS`.
+    """
+    dx = np.asarray(x) - x0
+    dy = np.asarray(y) - y0
+    r2 = dx*dx + dy*dy
+    r = np.sqrt(r2)
+
+    # h = t/2, where t is the angle from the line y=y0 ahead of the tip
+    h = 0.5*np.arctan2(dy, dx)
+    sin_h, cos_h = np.sin(h), np.cos(h)
+    sin_3h, cos_3h = np.sin(3.0*h), np.cos(3.0*h)
+
+    g = np.empty(dx.shape + (3,))
+    g[...,0] = cos_h*(1.0 - sin_h*sin_3h) # xx
+    g[...,1] = cos_h*(1.0 + sin_h*sin_3h) # yy
+    g[...,2] = sin_h*cos_h*cos_3h         # xy
+
+    radial = 1.0/np.sqrt(2*pi*r)
+    singular = K*radial[...,np.newaxis]*g
+
+    sigma = singular.copy()
+    sigma[...,0] += sxx0
+    sigma[...,1] += syy0
+    sigma[...,2] += sxy0
+
+    if not jacobian:
+        return sigma
+
+    # Angular derivatives dg/dt, using sin(h)*cos(h) = sin(2h)/2
+    sin_2h, cos_2h = 2.0*sin_h*cos_h, cos_h*cos_h - sin_h*sin_h
+    a = cos_2h*sin_3h + 1.5*sin_2h*cos_3h
+    dg_dt = np.empty(dx.shape + (3,))
+    dg_dt[...,0] = 0.5*(-sin_h - a)
+    dg_dt[...,1] = 0.5*(-sin_h + a)
+    dg_dt[...,2] = 0.5*(cos_2h*cos_3h - 1.5*sin_2h*sin_3h)
+
+    # Chain rule, with dr/dx0 = -dx/r, dr/dy0 = -dy/r,
+    # dt/dx0 = dy/r**2 and dt/dy0 = -dx/r**2
+    dsigma_dr = -0.5*singular/r[...,np.newaxis]
+    dsigma_dt = K*radial[...,np.newaxis]*dg_dt
+
+    jac = np.zeros(dx.shape + (3, 6))
+    jac[...,0] = radial[...,np.newaxis]*g
+    jac[...,1] = (-dsigma_dr*(dx/r)[...,np.newaxis] + dsigma_dt*(dy/r2)[...,np.newaxis])
+    jac[...,2] = (-dsigma_dr*(dy/r)[...,np.newaxis] - dsigma_dt*(dx/r2)[...,np.newaxis])
+    jac[...,0,3] = 1.0
+    jac[...,1,4] = 1.0
+    jac[...,2,5] = 1.0
+
+    return sigma, jac
+
+
+def _stress_components(sigma):
+    # xx, yy and xy components of an array of 3x3 stress tensors
+    sigma = np.asarray(sigma)
+    return np.c_[sigma[:,0,0], sigma[:,1,1], 0.5*(sigma[:,0,1] + sigma[:,1,0])]
+
+
+def _irwin_residuals(p, var_index, all_params, x, y, data):
+    all_params = all_params.copy()
+    all_params[var_index] = p
+    model = irwin_modeI_stress_components(x, y, *all_params)
+    return ((model - data)*_IRWIN_WEIGHTS).ravel()
+
+
+def _irwin_jacobian(p, var_index, all_params, x, y, data):
+    all_params = all_params.copy()
+    all_params[var_index] = p
+    model, jac = irwin_modeI_stress_components(x, y, *all_params, jacobian=True)
+    jac = jac[...,var_index]*_IRWIN_WEIGHTS[:,np.newaxis]
+    return jac.reshape(-1, len(var_index))
+
+
+def _fit_irwin(params, fix_params, x, y, data):
+    """
+    Least squares fit of the Irwin K-field to the xx, yy and xy stress
+    components `data` at positions `x`, `y`, starting from `params` and
+    keeping `fix_params` fixed, using the analytic Jacobian.
+
+    Returns the fitted parameters as a dictionary, the names of those
+    which were varied, the covariance matrix (or None if it is
+    singular) and the final residuals.
+    """
+    from scipy.optimize import leastsq
+
+    var_params = [key for key in IRWIN_PARAMS if key not in fix_params]
+    var_index = np.array([IRWIN_PARAMS.index(key) for key in var_params])
+    all_params = np.array([fix_params.get(key, params[key]) for key in IRWIN_PARAMS], dtype=float)
+
+    args = (var_index, all_params, x, y, data)
+    fitted, cov, infodict, mesg, success = leastsq(_irwin_residuals, all_params[var_index],
+                                                   args=args, Dfun=_irwin_jacobian,
+                                                   full_output=True)
+    fitted = np.atleast_1d(fitted)
+    params = dict(zip(IRWIN_PARAMS, all_params))
+    params.update(zip(var_params, fitted))
+    return params, var_params, cov, _irwin_residuals(fitted, *args)
+
+
+def _initial_crack_params(atoms, params):
+    # Fill in guesses for any of the Irwin K-field parameters missing from `params`
+
+    if 'K' not in params:
+       # Guess for stress intensity factor K
+       if 'K' in atoms.info:
+           params['K'] = atoms.info['K']
+       else:
+           try:
+               params['K'] = get_stress_intensity_factor(atoms)
+           except KeyError:
+               params['K'] = 1.0*MPA_SQRT_M
+
+    if 'sxx0' not in params or 'syy0' not in params or 'sxy0' not in params:
+       # Guess for far-field stress
+       if 'sigma0' in atoms.info:
+          params['sxx0'], params['syy0'], params['sxy0'] = atoms.info['sigma0']
+       else:
+          try:
+              E = atoms.info['YoungsModulus']
+              nu = atoms.info['PoissonRatio_yx']
+              Ep = E/(1-nu**2)
+              params['syy0'] = Ep*atoms.info['strain']
+              params['sxx0'] = nu*params['syy0']
+              params['sxy0'] = 0.0
+          except KeyError:
+              params['syy0'] = 0.0
+              params['sxx0'] = 0.0
+              params['sxy0'] = 0.0
+
+    if 'x0' not in params or 'y0' not in params:
+       # Guess for crack position
+       try:
+           params['x0'], params['y0'], _ = atoms.info['CrackPos']
+       except KeyError:
+           params['x0'] = (atoms.positions[:, 0].min() +
+                           (atoms.positions[:, 0].max() - atoms.positions[:, 0].min())/3.0)
+           params['y0'] = 0.0
+
+    return params
+
+
+class CrackTipStressFitter(object):
+    """
+    Track a crack tip through a trajectory by fitting the Irwin `K`-field
+
+    Each call to :meth:`fit` carries out the same fit as
+    :func:`fit_crack_stress_field`, but the fit for each frame starts from
+    the parameters found for the previous one and uses the analytic
+    Jacobian from :func:`irwin_modeI_stress_components`. The first fit,
+    and the first after :meth:`reset`, starts from the guesses described
+    for :func:`fit_crack_stress_field`.
+
+    Parameters
+    ----------
+    r_range : sequence of two floats, optional
+       Fit only atoms with ``r_range[0] < r < r_range[1]``, where `r` is
+       the distance from the previous crack position. If ``None``, all
+       atoms are used.
+    fix_params : dict, optional
+       Names and values of parameters to fix during the fit
+    calc : Calculator object, optional
+       Used to compute per-atom stresses with its ``get_stresses()``
+       method. Default is ``atoms.get_calculator()``.
+    stress_property : str, optional
+       If present, read precomputed per-atom stresses from this property
+       instead of using a calculator. The property should have 6 columns
+       in Voigt order, as written by
+       :func:`~quippy.elasticity.elastic_fields`, or 9 columns giving a
+       full 3x3 tensor.
+    skin : float
+       Atoms are first selected in an annulus `skin` wider than
+       `r_range` on each side. The annulus is then found within this
+       candidate list, which is only rebuilt once the crack tip shift
+       plus the largest atomic displacement since it was built exceeds
+       `skin`.
+
+    Calling the fitter on an :class:`~quippy.atoms.Atoms` object fits it
+    and returns an array of the fitted ``K, x0, y0, sxx0, syy0, sxy0``
+    and the crack position z coordinate, so a fitter can be passed to
+    :meth:`~quippy.io.AtomsReader.map`.
+    """
+
+    def __init__(self, r_range=(0., 50.), fix_params=None, calc=None,
+                 stress_property=None, skin=2.0):
+        self.r_range = r_range
+        if fix_params is None:
+            fix_params = {}
+        self.fix_params = fix_params
+        self.calc = calc
+        self.stress_property = stress_property
+        self.skin = skin
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the previous fit and annulus selection
+        """
+        self.params = None
+        self._candidates = None
+        self._ref_pos = None
+        self._ref_centre = None
+        self.stats = {'fits': 0, 'selections': 0}
+
+    def select(self, atoms, x0, y0):
+        """
+        Return the indices of the atoms in the fitting annulus centred on ``(x0, y0)``
+        """
+        pos = atoms.positions[:, :2]
+        if self.r_range is None:
+            return np.arange(len(atoms))
+        rmin, rmax = self.r_range
+
+        rebuild = self._candidates is None or len(pos) != len(self._ref_pos)
+        if not rebuild:
+            shift = sqrt((x0 - self._ref_centre[0])**2 + (y0 - self._ref_centre[1])**2)
+            displacement = np.sqrt(((pos - self._ref_pos)**2).sum(axis=1)).max()
+            rebuild = shift + displacement >= self.skin
+
+        if rebuild:
+            r = np.sqrt((pos[:, 0] - x0)**2 + (pos[:, 1] - y0)**2)
+            self._candidates = np.nonzero((r > rmin - self.skin) & (r < rmax + self.skin))[0]
+            self._ref_pos = pos.copy()
+            self._ref_centre = (x0, y0)
+            self.stats['selections'] += 1
+
+        candidates = self._candidates
+        r = np.sqrt((pos[candidates, 0] - x0)**2 + (pos[candidates, 1] - y0)**2)
+        return candidates[(r > rmin) & (r < rmax)]
+
+    def get_stress_components(self, atoms, indices):
+        """
+        Return the xx, yy and xy stress components of the atoms `indices`
+        as an array of shape ``(len(indices), 3)``
+        """
+        if self.stress_property is not None:
+            stress = np.asarray(atoms.properties[self.stress_property]).T[indices]
+            if stress.shape[1] == 6:
+                return np.c_[stress[:, 0], stress[:, 1], stress[:, 5]]
+            elif stress.shape[1] == 9:
+                return _stress_components(stress.reshape(-1, 3, 3))
+            else:
+                raise ValueError('stress property %s should have 6 or 9 columns' % self.stress_property)
+
+        calc = self.calc
+        if calc is None:
+            calc = atoms.get_calculator()
+        return _stress_components(calc.get_stresses(atoms)[indices])
+
+    def fit(self, atoms, sigma=None, initial_params=None):
+        """
+        Fit the stresses on `atoms`, or those given in the array `sigma`
+        with shape ``(len(atoms), 3, 3)``, and return the fitted
+        parameters as a dictionary with keys ``[K, x0, y0, sxx0, syy0,
+        sxy0]``. `initial_params` overrides the starting values.
+        """
+        params = {}
+        if self.params is not None:
+            params.update(self.params)
+        if initial_params is not None:
+            params.update(initial_params)
+        params = _initial_crack_params(atoms, params)
+        params.update(self.fix_params)
+
+        indices = self.select(atoms, params['x0'], params['y0'])
+        if sigma is None:
+            data = self.get_stress_components(atoms, indices)
+        else:
+            data = _stress_components(np.asarray(sigma)[indices])
+
+        x = atoms.positions[indices, 0]
+        y = atoms.positions[indices, 1]
+        params, var_params, cov, residuals = _fit_irwin(params, self.fix_params, x, y, data)
+
+        self.params = params
+        self.stats['fits'] += 1
+        return params
+
+    def __call__(self, atoms):
+        params = self.fit(atoms)
+        return np.array([params[key] for key in IRWIN_PARAMS] + [atoms.cell[2,2]/2.0])
+
+
+def fit_crack_trajectory(trajectory, r_range=(0., 50.), fix_params=None, calc=None,
+                         stress_property=None, skin=2.0, initial_params=None,
+                         nprocs=1, chunksize=None, filename=None):
+    """
+    Fit the Irwin `K`-field to every frame of `trajectory`
+
+    Frames are fitted in order with a :class:`CrackTipStressFitter`, so
+    each fit starts from the result for the previous frame. Arguments
+    `r_range`, `fix_params`, `calc`, `stress_property` and `skin` are
+    passed to the fitter. `initial_params` gives starting values for
+    the first frame.
+
+    If `trajectory` is an :class:`~quippy.io.AtomsReader` and `nprocs`
+    is greater than 1, contiguous chunks of `chunksize` frames are
+    fitted in parallel with :meth:`~quippy.io.AtomsReader.map`. The
+    first frame of each chunk then starts from `initial_params` and the
+    guesses made by :func:`fit_crack_stress_field`, so frames should
+    have a ``CrackPos`` entry close to the crack tip, and `calc` must be
+    picklable.
+
+    Returns
+    -------
+    K : array with shape ``(n_frames,)``
+       Stress intensity factor
+    crack_pos : array with shape ``(n_frames, 3)``
+       Crack tip positions, as stored in ``atoms.info['CrackPos']`` by
+       :func:`fit_crack_stress_field`
+    sigma0 : array with shape ``(n_frames, 3)``
+       Far field stress components ``sxx0, syy0, sxy0``
+
+    If `filename` is given the same time series are also written to it
+    as text, one line per frame.
+    """
+    fitter = CrackTipStressFitter(r_range, fix_params, calc, stress_property, skin)
+    if initial_params is not None:
+        fitter.params = dict(initial_params)
+
+    if hasattr(trajectory, 'map'):
+        results = trajectory.map(fitter, nprocs=nprocs, chunksize=chunksize)
+    else:
+        results = [fitter(at) for at in trajectory]
+    results = np.array(results).reshape(-1, len(IRWIN_PARAMS)+1)
+
+    K = results[:, 0]
+    crack_pos = results[:, [1, 2, 6]]
+    sigma0 = results[:, 3:6]
+
+    if filename is not None:
+        np.savetxt(filename, np.c_[K, crack_pos, sigma0],
+                   header='K CrackPos_x CrackPos_y CrackPos_z sxx0 syy0 sxy0')
+
+    return K, crack_pos, sigma0
+
+
 def strain_to_G(strain, E, nu, orig_height):
     """
     Convert from strain to energy release rate G for thin strip geometry
@@ -1067,41 +1440,7 @@ def fit_crack_stress_field(atoms, r_range=(0., 50.), initial_params=None, fix_pa
     if initial_params is not None:
        params.update(initial_params)
 
-    if 'K' not in params:
-       # Guess for stress intensity factor K
-       if 'K' in atoms.info:
-           params['K'] = atoms.info['K']
-       else:
-           try:
-               params['K'] = get_stress_intensity_factor(atoms)
-           except KeyError:
-               params['K'] = 1.0*MPA_SQRT_M
-
-    if 'sxx0' not in params or 'syy0' not in params or 'sxy0' not in params:
-       # Guess for far-field stress
-       if 'sigma0' in atoms.info:
-          params['sxx0'], params['syy0'], params['sxy0'] = atoms.info['sigma0']
-       else:
-          try:
-              E = atoms.info['YoungsModulus']
-              nu = atoms.info['PoissonRatio_yx']
-              Ep = E/(1-nu**2)
-              params['syy0'] = Ep*atoms.info['strain']
-              params['sxx0'] = nu*params['syy0']
-              params['sxy0'] = 0.0
-          except KeyError:
-              params['syy0'] = 0.0
-              params['sxx0'] = 0.0
-              params['sxy0'] = 0.0
-
-    if 'x0' not in params or 'y0' not in params:
-       # Guess for crack position
-       try:
-           params['x0'], params['y0'], _ = atoms.info['CrackPos']
-       except KeyError:
-           params['x0'] = (atoms.positions[:, 0].min() +
-                           (atoms.positions[:, 0].max() - atoms.positions[:, 0].min())/3.0)
-           params['y0'] = 0.0
+    params = _initial_crack_params(atoms, params)
 
     # Override any fixed parameters
     if fix_params is None:
@@ -1128,7 +1467,7 @@ def fit_crack_stress_field(atoms, r_range=(0., 50.), initial_params=None, fix_pa
     sigma[:,0,2] = 0.0
     sigma[:,2,0] = 0.0
     sigma[:,1,2] = 0.0
-    sigma[:,2.1] = 0.0
+    sigma[:,2,1] = 0.0
 
     mask = Ellipsis # all atoms
     if r_range is not None:
@@ -1138,33 +1477,16 @@ def fit_crack_stress_field(atoms, r_range=(0., 50.), initial_params=None, fix_pa
     if verbose:
        print 'Fitting on %r atoms' % sigma[mask,1,1].shape
 
-    def objective_function(params, x, y, sigma, var_params):
-        params = dict(zip(var_params, params))
-        if fix_params is not None:
-            params.update(fix_params)
-        irwin_sigma = IrwinStressField(**params).get_stresses(atoms)
-        delta_sigma = sigma[mask,:,:] - irwin_sigma[mask,:,:]
-        return delta_sigma.reshape(delta_sigma.size)
-
-    # names and values of parameters which can vary in this fit
-    var_params = sorted([key for key in params.keys() if key not in fix_params.keys() ])
-    initial_params = [params[key] for key in var_params]
-
-    from scipy.optimize import leastsq
-    fitted_params, cov, infodict, mesg, success = leastsq(objective_function,
-                                                         initial_params,
-                                                         args=(x, y, sigma, var_params),
-                                                         full_output=True)
-
-    params = dict(zip(var_params, fitted_params))
-    params.update(fix_params)
+    # Fit the xx, yy and xy components, using the analytic Jacobian
+    params, var_params, cov, residuals = _fit_irwin(params, fix_params, x[mask], y[mask],
+                                                    _stress_components(sigma[mask]))
 
     # estimate variance in parameter estimates
     if cov is None:
        # singular covariance matrix
-       err = dict(zip(var_params, [0.]*len(fitted_params)))
+       err = dict(zip(var_params, [0.]*len(var_params)))
     else:
-       s_sq = (objective_function(fitted_params, x, y, sigma, var_params)**2).sum()/(sigma.size-len(fitted_params))
+       s_sq = (residuals**2).sum()/(residuals.size - len(var_params))
        cov = cov * s_sq
        err = dict(zip(var_params, np.sqrt(np.diag(cov))))
 
@@ -141,11 +141,18 @@ class Dynamics(object):
               Use special filename ``"-"`` for stdout (default).
 
     :param loginterval: interval at which to write log lines
+
+    :param cutoff_skin: if not ``None``, set the neighbour list skin
+                        of `atoms`, so that connectivity is only fully
+                        rebuilt after some atom has moved more than
+                        half the skin, and otherwise just the distances
+                        are updated. See :meth:`connect_info`.
     """
 
     def __init__(self, atoms, timestep, trajectory,
                  trajectoryinterval=10, initialtemperature=None,
-                 logfile='-', loginterval=1, loglabel='D'):
+                 logfile='-', loginterval=1, loglabel='D',
+                 cutoff_skin=None):
 
         # we will do the calculation in place, to minimise number of copies,
         # unless atoms is not a quippy Atoms
@@ -153,6 +160,8 @@ class Dynamics(object):
             warnings.warn('Dynamics atoms is not quippy.Atoms instance, copy forced!')
             atoms = Atoms(atoms)
         self.atoms = atoms
+        if cutoff_skin is not None:
+            self.atoms.cutoff_skin = cutoff_skin
 
         if self.atoms.has('masses'):
             if self.atoms.has_property('mass'):
@@ -229,6 +238,17 @@ class Dynamics(object):
     nsteps = property(get_number_of_steps)
 
 
+    def connect_info(self):
+        """
+        Return a dictionary with the number of full neighbour list
+        ``rebuilds`` and of distance-only updates (``reuses``) done so
+        far for the dynamics atoms, and the ``cutoff_skin`` in use.
+        """
+        return {'rebuilds': int(self.atoms.connect.n_rebuilds),
+                'reuses': int(self.atoms.connect.n_reuses),
+                'cutoff_skin': float(self.atoms.cutoff_skin)}
+
+
     def insert_observer(self, function, position=0, interval=1,
                         *args, **kwargs):
         """Insert an observer."""
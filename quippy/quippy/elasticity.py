@@ -16,9 +16,7 @@
 # HQ X
 # HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
 
-from quippy import available_modules
-if 'scipy' in available_modules:
-    from scipy import stats
+from quippy import available_modules, get_fortran_indexing
 from farray import *
 from quippy.atoms import Atoms
 from quippy import _elasticity
@@ -162,6 +160,204 @@ def atomic_strain(at, r0, crystal_factor=1.0):
     return strain/crystal_factor
 
 
+def _matmul(A, B):
+    # Product of two stacks of 3x3 matrices
+    return np.einsum('nij,njk->nik', A, B)
+
+def _transpose(A):
+    return A.transpose(0, 2, 1)
+
+def _strain_vectors(S):
+    """
+    Stacked equivalent of :func:`strain_vector`: returns an ``(N,6)``
+    array of Voigt strain vectors from an ``(N,3,3)`` array
+    """
+    return np.c_[S[:,0,0] - 1.0, S[:,1,1] - 1.0, S[:,2,2] - 1.0,
+                 2.0*S[:,1,2], 2.0*S[:,0,2], 2.0*S[:,0,1]]
+
+def _stress_vectors(sig):
+    """
+    Stacked equivalent of :func:`stress_vector`
+    """
+    return np.c_[sig[:,0,0], sig[:,1,1], sig[:,2,2],
+                 sig[:,1,2], sig[:,0,2], sig[:,0,1]]
+
+def _stress_matrices(stress):
+    """
+    Stacked equivalent of :func:`stress_matrix`: returns an
+    ``(N,3,3)`` array from an ``(N,6)`` array of Voigt stress vectors
+    """
+    s1, s2, s3, s4, s5, s6 = stress.T
+    return np.array([[s1, s6, s5],
+                     [s6, s2, s4],
+                     [s5, s4, s3]]).transpose(2, 0, 1)
+
+def _polar_decomposition(E):
+    """
+    Polar decomposition E = S*R of a stack of matrices, where S is
+    symmetric and R is a rotation:
+
+       EEt = E*E', EEt = VDV' D diagonal, S = V D^1/2 V', R = S^-1*E
+    """
+    D, V = np.linalg.eigh(_matmul(E, _transpose(E)))
+    S = np.einsum('nij,nj,nkj->nik', V, np.sqrt(D), V)
+    R = _matmul(np.einsum('nij,nj,nkj->nik', V, D**-0.5, V), E)
+    return S, R
+
+def _set_stress_eig(at, indices):
+    # Eigenvalues and eigenvectors of stress for atoms with zero-based `indices`,
+    # ordered by descending eigenvalue
+    stress = at.stress.view(np.ndarray)
+    D, SigEvecs = np.linalg.eigh(_stress_matrices(stress[:,indices].T))
+    at.stress_eval.view(np.ndarray)[:,indices] = D[:,::-1].T
+    at.stress_evec1.view(np.ndarray)[:,indices] = SigEvecs[:,:,2].T
+    at.stress_evec2.view(np.ndarray)[:,indices] = SigEvecs[:,:,1].T
+    at.stress_evec3.view(np.ndarray)[:,indices] = SigEvecs[:,:,0].T
+
+def _zero_based(j):
+    if get_fortran_indexing():
+        return j - 1
+    return j
+
+def _tetrahedric_fields(at, a, cij, mask, save_reference, use_reference):
+    """
+    Strain and stress for all four-fold coordinated atoms at once, using
+    stacks of 3x3 matrices. See :func:`elastic_fields`.
+    """
+    i_index, j, shift, distance, diff = at.connect.neighbour_csr()
+    j = _zero_based(j)
+
+    select = np.diff(i_index) == 4
+    if mask is not None:
+        select &= np.asarray(mask, dtype=bool)
+    centres = np.nonzero(select)[0]
+    n = len(centres)
+    if n == 0:
+        return
+
+    # Neighbour displacements as an (n,4,3) array
+    rows = i_index[centres][:,np.newaxis] + np.arange(4)
+
+    # Consider neighbours in order of their index within the primitive cell
+    if at.has_property('primitive_index'):
+        primitive_index = at.primitive_index.view(np.ndarray)
+        order = np.argsort(primitive_index[j[rows]], axis=1, kind='mergesort')
+        rows = rows[np.arange(n)[:,np.newaxis], order]
+    d = diff[rows]
+
+    # Find cubic axes from neighbours, as columns of E
+    n1 = d[:,1] - d[:,0]
+    n2 = d[:,2] - d[:,0]
+    n3 = d[:,3] - d[:,0]
+    E = np.empty((n, 3, 3))
+    E[:,:,0] = (n1 + n2 - n3)/a
+    E[:,:,1] = (n2 + n3 - n1)/a
+    E[:,:,2] = (n3 + n1 - n2)/a
+
+    # Skip degenerate tetrahedra
+    good = ~(E == 0.0).all(axis=1).any(axis=1)
+    centres, E = centres[good], E[good]
+    n = len(centres)
+    if n == 0:
+        return
+
+    # Kill near zero elements
+    E[abs(E) < 1e-6] = 0.0
+    E[(E < 0.0).reshape(n, 9).all(axis=1)] *= -1.0
+
+    # Skip flat tetrahedra, and reflect third axis of left-handed sets
+    # so that R is a proper rotation
+    det = np.linalg.det(E)
+    centres, E, det = centres[det != 0.0], E[det != 0.0], det[det != 0.0]
+    E[det < 0.0, :, 2] *= -1.0
+
+    S, R = _polar_decomposition(E)
+
+    if save_reference or use_reference:
+        primitive_index = at.primitive_index.view(np.ndarray)[centres]
+        types, first, which = np.unique(primitive_index, return_index=True, return_inverse=True)
+
+    if save_reference:
+        for p, k in zip(types, first):
+            key = 'strain_inv_%d' % p
+            if key not in at.params:
+                at.params[key] = np.linalg.inv(S[k])
+
+    if use_reference:
+        S_inv = np.array([np.asarray(at.params['strain_inv_%d' % p]) for p in types])
+        S = _matmul(S, S_inv[which])
+
+    # Strain in rotated coordinate system
+    strain = _strain_vectors(S)
+    at.strain.view(np.ndarray)[:,centres] = strain.T
+
+    # Test for permutations - check which way x points
+    RtE = _matmul(_transpose(R), E)
+    x = RtE[:,:,0]
+    rotXYZ = np.array([[0.0, 1.0, 0.0],
+                       [0.0, 0.0, 1.0],
+                       [1.0, 0.0, 0.0]])
+    y_axis = (x[:,1] > x[:,0]) & (x[:,1] > x[:,2])
+    z_axis = ~y_axis & (x[:,2] > x[:,0]) & (x[:,2] > x[:,1])
+    R[y_axis] = np.einsum('ij,njk->nik', rotXYZ, R[y_axis])
+    R[z_axis] = np.einsum('ij,njk->nik', rotXYZ.T, R[z_axis])
+
+    if save_reference:
+        for p, k in zip(types, first):
+            key = 'rotation_inv_%d' % p
+            if key not in at.params:
+                at.params[key] = R[k].T
+
+    if use_reference:
+        R_inv = np.array([np.asarray(at.params['rotation_inv_%d' % p]) for p in types])
+        R = _matmul(R, R_inv[which])
+
+    if cij is None:
+        return
+
+    # Rotate to crystal coordinate system to apply Cij matrix
+    RtSR = _matmul(_matmul(_transpose(R), S), R)
+    sig = _stress_matrices(np.dot(_strain_vectors(RtSR), np.asarray(cij).T))
+
+    # Rotate back to local coordinate system and symmetrise
+    RsigRt = _matmul(_matmul(R, sig), _transpose(R))
+    RsigRt = (RsigRt + _transpose(RsigRt))/2.0
+    stress = _stress_vectors(RsigRt)
+
+    at.stress.view(np.ndarray)[:,centres] = stress.T
+    at.strain_energy_density.view(np.ndarray)[centres] = 0.5*(strain*stress).sum(axis=1)
+    _set_stress_eig(at, centres)
+
+def _interpolate_fields(at, cij, mask):
+    """
+    Set strain and stress of oxygen atoms to the mean of their neighbours
+    """
+    i_index, j = at.connect.neighbour_csr()[:2]
+    j = _zero_based(j)
+    n_neighb = np.diff(i_index)
+    centre = np.repeat(np.arange(at.n), n_neighb)
+
+    select = (at.z.view(np.ndarray) == 8) & (n_neighb > 0)
+    if mask is not None:
+        select &= np.asarray(mask, dtype=bool)
+    indices = np.nonzero(select)[0]
+    if len(indices) == 0:
+        return
+
+    def neighbour_mean(field):
+        total = np.array([np.bincount(centre, weights=row[j], minlength=at.n) for row in field])
+        return total[:,indices]/n_neighb[indices]
+
+    strain = at.strain.view(np.ndarray)
+    strain[:,indices] = neighbour_mean(strain)
+    if cij is not None:
+        stress = at.stress.view(np.ndarray)
+        stress[:,indices] = neighbour_mean(stress)
+        _set_stress_eig(at, indices)
+        at.strain_energy_density.view(np.ndarray)[indices] = \
+            0.5*(strain[:,indices]*stress[:,indices]).sum(axis=0)
+
+
 elastic_fields_fortran = elastic_fields # Fortran elastic fields routine
 
 def elastic_fields(at, a=None,  bond_length=None, c=None, c_vector=None, cij=None,
@@ -182,7 +378,11 @@ def elastic_fields(at, a=None,  bond_length=None, c=None, c_vector=None, cij=Non
     relative to the ideal structure, using `a` as the cubic lattice
     constant (related to bond length by a factor :math:`sqrt{3}/4`).
     This deformation is then split into a strain and a rotation
-    using a Polar decomposition.
+    using a Polar decomposition. All tetrahedra are gathered from the
+    neighbour list with :meth:`~quippy.atoms.Connection.neighbour_csr`
+    and processed together as stacks of 3x3 matrices. As in
+    :func:`elastic_fields_fortran`, left-handed sets of axes are
+    reflected so that the rotation is proper.
 
     If `save_reference` or `use_reference` are True then `at` must have
     a `primitive_index` integer property which is different for each
@@ -208,17 +408,6 @@ def elastic_fields(at, a=None,  bond_length=None, c=None, c_vector=None, cij=Non
 
     """
 
-    def compute_stress_eig(i):
-        D, SigEvecs = np.linalg.eig(stress_matrix(at.stress[:,i]))
-
-        # Order by descending size of eigenvalues
-        sorted_evals, order = zip(*sorted(zip(D, [1,2,3]),reverse=True))
-
-        at.stress_eval[:,i]  = sorted_evals
-        at.stress_evec1[:,i] = SigEvecs[:,order[0]]
-        at.stress_evec2[:,i] = SigEvecs[:,order[1]]
-        at.stress_evec3[:,i] = SigEvecs[:,order[2]]
-
     if sum([a is None, bond_length is None]) != 1:
         raise ValueError('One of lattice constant or bond length must be given')
 
@@ -241,6 +430,12 @@ def elastic_fields(at, a=None,  bond_length=None, c=None, c_vector=None, cij=Non
         at.add_property('stress_evec3', 0.0, n_cols=3)
         at.add_property('strain_energy_density', 0.0)
 
+    if system == 'tetrahedric':
+        _tetrahedric_fields(at, a, cij, mask, save_reference, use_reference)
+        if interpolate:
+            _interpolate_fields(at, cij, mask)
+        return
+
     rotXYZ = fzeros((3,3))
     rotXYZ[1,2] = 1.0
     rotXYZ[2,3] = 1.0
@@ -248,8 +443,9 @@ def elastic_fields(at, a=None,  bond_length=None, c=None, c_vector=None, cij=Non
     E = fidentity(3)
 
     n_at=0
+    stress_computed = []
 
-    # Consider first atoms with four neighbours
+    # Consider first atoms with six neighbours
     for i in frange(at.n):
         if mask is not None and not mask[i]: continue
 
@@ -258,86 +454,60 @@ def elastic_fields(at, a=None,  bond_length=None, c=None, c_vector=None, cij=Non
         if (system == 'anatase' and at.z[i] == 22):
            print i, len(neighb)
 
-        if (system == 'tetrahedric' and len(neighb) == 4) or (system == 'anatase' and len(neighb) == 6):
-
-            if (system == 'tetrahedric' and len(neighb) == 4):
-
-                #print '\nProcessing atom', i
-
-                # Consider neighbours in order of their index within the primitive cell
-                if hasattr(at, 'primitive_index'):
-                    (j1,i1), (j2,i2), (j3,i3), (j4,i4) = sorted((at.primitive_index[n.j],i) for i,n in fenumerate(neighb))
-                else:
-                    (j1,i1), (j2,i2), (j3,i3), (j4,i4) = list((n.j,i) for i,n in fenumerate(neighb))
-
-                # Find cubic axes from neighbours
-                n1 = neighb[i2].diff - neighb[i1].diff
-                n2 = neighb[i3].diff - neighb[i1].diff
-                n3 = neighb[i4].diff - neighb[i1].diff
-                #print 'n1', n1.norm(), n1
-                #print 'n2', n2.norm(), n2
-                #print 'n3', n3.norm(), n3
-
-                E[:,1] = (n1 + n2 - n3)/a
-                E[:,2] = (n2 + n3 - n1)/a
-                E[:,3] = (n3 + n1 - n2)/a
-
-                if all(E[:,1] == 0) or all(E[:,2] == 0) or all(E[:,3]) == 0:
-                    continue
-
-            elif (system == 'anatase' and len(neighb) == 6):
-                #c_vector indicates the direction of the longest O-O bond (among the ones with Ti as a center of symmetry).
-                #It is necessary to identify the crystal orientation. 
-
-                n_at = n_at + 1
-
-                if(c_vector==None):
-                    c_vector = fzeros(3)
-                    c_vector[:] = [0, 0, 1]
-
-                c_local = fzeros(3)
-                for j in frange(3):
-                    c_local[j] = c_vector[j] * (c/2)
-
-                # Consider neighbours in order of their index within the primitive cell
-                if hasattr(at, 'primitive_index'):
-                    (j1,i1), (j2,i2), (j3,i3), (j4,i4), (j5,i5), (j6,i6) = sorted((at.primitive_index[n.j],i) for i,n in fenumerate(neighb))
-                else:
-                    (j1,i1), (j2,i2), (j3,i3), (j4,i4), (j5,i5), (j6,i6) = list((n.j,i) for i,n in fenumerate(neighb))
-
-                dd = fzeros(6)
-                dd[1] = np.linalg.norm(c_local - neighb[i1].diff)
-                dd[2] = np.linalg.norm(c_local - neighb[i2].diff)
-                dd[3] = np.linalg.norm(c_local - neighb[i3].diff)
-                dd[4] = np.linalg.norm(c_local - neighb[i4].diff)
-                dd[5] = np.linalg.norm(c_local - neighb[i5].diff)
-                dd[6] = np.linalg.norm(c_local - neighb[i6].diff)
-                #print dd[5], c_local - neighb[i5].diff
-                ind =  np.argsort(dd)
-               
-                dd2 = fzeros(3)
-                dd2[1] = at.distance_min_image( neighb[ind[2]].j , neighb[ind[3]].j )
-                dd2[2] = at.distance_min_image( neighb[ind[2]].j , neighb[ind[4]].j )
-                dd2[3] = at.distance_min_image( neighb[ind[2]].j , neighb[ind[5]].j )
-                ind2 = np.argsort(dd2) 
-                if  ind2[3] == 2:
-                     a1 = ind[4] 
-                     a2 = ind[3] 
-                     ind[4] = a2 
-                     ind[3] = a1
-                elif ind2[3] == 3:
-                     a1 = ind[5] 
-                     a2 = ind[3] 
-                     ind[5] = a2 
-                     ind[3] = a1
-
-                n1 = neighb[ind[1]].diff - neighb[ind[6]].diff
-                n2 = neighb[ind[2]].diff - neighb[ind[3]].diff
-                n3 = neighb[ind[4]].diff - neighb[ind[5]].diff
-
-                E[:,1] = n3/a
-                E[:,2] = n2/a
-                E[:,3] = n1/c
+        if (system == 'anatase' and len(neighb) == 6):
+
+            #c_vector indicates the direction of the longest O-O bond (among the ones with Ti as a center of symmetry).
+            #It is necessary to identify the crystal orientation. 
+
+            n_at = n_at + 1
+
+            if(c_vector==None):
+                c_vector = fzeros(3)
+                c_vector[:] = [0, 0, 1]
+
+            c_local = fzeros(3)
+            for j in frange(3):
+                c_local[j] = c_vector[j] * (c/2)
+
+            # Consider neighbours in order of their index within the primitive cell
+            if hasattr(at, 'primitive_index'):
+                (j1,i1), (j2,i2), (j3,i3), (j4,i4), (j5,i5), (j6,i6) = sorted((at.primitive_index[n.j],i) for i,n in fenumerate(neighb))
+            else:
+                (j1,i1), (j2,i2), (j3,i3), (j4,i4), (j5,i5), (j6,i6) = list((n.j,i) for i,n in fenumerate(neighb))
+
+            dd = fzeros(6)
+            dd[1] = np.linalg.norm(c_local - neighb[i1].diff)
+            dd[2] = np.linalg.norm(c_local - neighb[i2].diff)
+            dd[3] = np.linalg.norm(c_local - neighb[i3].diff)
+            dd[4] = np.linalg.norm(c_local - neighb[i4].diff)
+            dd[5] = np.linalg.norm(c_local - neighb[i5].diff)
+            dd[6] = np.linalg.norm(c_local - neighb[i6].diff)
+            #print dd[5], c_local - neighb[i5].diff
+            ind =  np.argsort(dd)
+           
+            dd2 = fzeros(3)
+            dd2[1] = at.distance_min_image( neighb[ind[2]].j , neighb[ind[3]].j )
+            dd2[2] = at.distance_min_image( neighb[ind[2]].j , neighb[ind[4]].j )
+            dd2[3] = at.distance_min_image( neighb[ind[2]].j , neighb[ind[5]].j )
+            ind2 = np.argsort(dd2) 
+            if  ind2[3] == 2:
+                 a1 = ind[4] 
+                 a2 = ind[3] 
+                 ind[4] = a2 
+                 ind[3] = a1
+            elif ind2[3] == 3:
+                 a1 = ind[5] 
+                 a2 = ind[3] 
+                 ind[5] = a2 
+                 ind[3] = a1
+
+            n1 = neighb[ind[1]].diff - neighb[ind[6]].diff
+            n2 = neighb[ind[2]].diff - neighb[ind[3]].diff
+            n3 = neighb[ind[4]].diff - neighb[ind[5]].diff
+
+            E[:,1] = n3/a
+            E[:,2] = n2/a
+            E[:,3] = n1/c
 
             #print 'E', E
 
@@ -407,22 +577,14 @@ def elastic_fields(at, a=None,  bond_length=None, c=None, c_vector=None, cij=Non
                 at.strain_energy_density[i] = 0.5*np.dot(at.strain[:,i], at.stress[:,i])
                 #print at.strain[:, i]
 
-                compute_stress_eig(i)
+                stress_computed.append(i-1)
 
-    # For atoms without 4 neighbours, interpolate stress and strain fields
-    if interpolate:
-        for i in frange(at.n):
-            if mask is not None and not mask[i]: continue
-
-            neighb = at.neighbours[i]
-            if at.z[i] != 8 or  len(neighb) == 0 : continue
+    if stress_computed:
+        _set_stress_eig(at, np.array(stress_computed))
 
-            at.strain[:,i] = at.strain[:,[n.j for n in neighb]].mean(axis=2)
-            if cij is not None:
-                at.stress[:,i] = at.stress[:,[n.j for n in neighb]].mean(axis=2)
-                compute_stress_eig(i)
-
-            at.strain_energy_density[i] = 0.5*np.dot(at.strain[:,i], at.stress[:,i])
+    # For atoms without 6 neighbours, interpolate stress and strain fields
+    if interpolate:
+        _interpolate_fields(at, cij, mask)
 
     if (system == 'anatase'):
         print 'Ti atoms computed', n_at
@@ -485,7 +647,7 @@ class AtomResolvedStressField(object):
         else:
             elastic_fields(atoms, a=self.a, cij=self.cij, **self.extra_args)
 
-            sigma[:,0,0], sigma[:,1,1], sigma[:,2,2], sigma[:,1,2], sigma[:,0,2], sigma[0,1] = atoms.stress
+            sigma[:,0,0], sigma[:,1,1], sigma[:,2,2], sigma[:,1,2], sigma[:,0,2], sigma[:,0,1] = atoms.stress
 
         # Fill in symmetric components
         sigma[:,1,0] = sigma[:,0,1]
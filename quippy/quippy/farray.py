@@ -39,6 +39,47 @@ del major, minor
 
 TABLE_STRING_LENGTH = 10
 
+def _map_simple_index(idx):
+    if isinstance(idx, int) or isinstance(idx, np.integer):
+        return FortranArray.map_int(idx)
+    if isinstance(idx, slice):
+        start = idx.start
+        if start is not None:
+            if not (isinstance(start, int) or isinstance(start, np.integer)):
+                return None
+            start = FortranArray.map_int(start)
+        return slice(start, idx.stop, idx.step)
+    return None
+
+def _fortran_index(indx, ndim):
+    """Pure Python version of :func:`quippy.arraydata.fortran_index`.
+
+    Map a one-based index made up only of integers and slices to the
+    equivalent zero-based index for an array with `ndim` dimensions,
+    following the same rules as :meth:`FortranArray.mapindices`.
+    Returns None for any other kind of index."""
+    if type(indx) is not tuple:
+        idx = _map_simple_index(indx)
+        if idx is None or ndim <= 1:
+            return idx
+        return (Ellipsis, idx)
+
+    res = []
+    if len(indx) < ndim:
+        res.append(Ellipsis)
+    for idx in indx:
+        idx = _map_simple_index(idx)
+        if idx is None:
+            return None
+        res.append(idx)
+    return tuple(res)
+
+try:
+    from quippy.arraydata import fortran_index, fortran_getitem, fortran_setitem
+except ImportError:
+    fortran_index = _fortran_index
+    fortran_getitem = fortran_setitem = None
+
 def frange(min,max=None,step=1):
     """Fortran equivalent of :func:`range` builtin.
 
@@ -123,9 +164,6 @@ class FortranArray(np.ndarray):
     def __array_finalize__(self, obj):
         if obj is None:
             return
-        logging.debug('in __array_finalize__, self.parent=%r, obj.parent=%r' % (getattr(self, 'parent', None),
-                                                                                getattr(obj, 'parent', None)))
-
         if not self.flags.owndata:
             self.parent = getattr(obj, 'parent', None)
 
@@ -275,20 +313,35 @@ class FortranArray(np.ndarray):
 
     def __getitem__(self, indx):
         "Overloaded __getitem__ which accepts one-based indices."
-        if getattr(self, 'parent', None) and self.parent() is None:
+        parent = getattr(self, 'parent', None)
+        if parent and parent() is None:
             raise RuntimeError("array's parent has gone out of scope!")
-        indx = self.mapindices(indx)
-        obj = np.ndarray.__getitem__(self, indx)
-        if isinstance(obj, np.ndarray):
-            fa = obj.view(self.__class__)
-            return fa
+        # integers and slices are mapped by fortran_index(), which
+        # returns None for fancy indices needing the full mapindices()
+        cindx = fortran_index(indx, self.ndim)
+        if cindx is None:
+            cindx = self.mapindices(indx)
+        obj = np.ndarray.__getitem__(self, cindx)
+        if isinstance(obj, np.ndarray) and type(obj) is not type(self):
+            return obj.view(self.__class__)
         return obj
 
     def __setitem__(self, indx, value):
         "Overloaded __setitem__ which accepts one-based indices."
-        if getattr(self, 'parent', None) and self.parent() is None:
+        parent = getattr(self, 'parent', None)
+        if parent and parent() is None:
             raise RuntimeError("array's parent has gone out of scope!")
 
+        cindx = fortran_index(indx, self.ndim)
+        if cindx is not None:
+            # assign through a plain ndarray view, since some versions
+            # of numpy call back into __getitem__ for slice assignment,
+            # which would map the indices a second time
+            np.ndarray.__setitem__(self.view(np.ndarray), cindx, value)
+        else:
+            self._setitem_fancy(indx, value)
+
+    def _setitem_fancy(self, indx, value):
         domap = True
         doext = False
         if isinstance(indx, slice): domap = False
@@ -317,24 +370,26 @@ class FortranArray(np.ndarray):
 
     def __getslice__(self, i, j):
         "Overloaded __getslice__ which accepts one-based indices."
-        if getattr(self, 'parent', None) and self.parent() is None:
+        parent = getattr(self, 'parent', None)
+        if parent and parent() is None:
             raise RuntimeError("array's parent has gone out of scope!")
 
         if i != 0:
             i = FortranArray.map_int(i)
-        obj = np.ndarray.__getslice__(self, i, j)
-        if isinstance(obj, np.ndarray):
-            fa = obj.view(self.__class__)
-            return fa
+        obj = np.ndarray.__getitem__(self, slice(i, j))
+        if type(obj) is not type(self):
+            return obj.view(self.__class__)
+        return obj
 
     def __setslice__(self, i, j, value):
         "Overloaded __setslice__ which accepts one-based indices."
-        if getattr(self, 'parent', None) and self.parent() is None:
+        parent = getattr(self, 'parent', None)
+        if parent and parent() is None:
             raise RuntimeError("array's parent has gone out of scope!")
 
         if i != 0:
             i = FortranArray.map_int(i)
-        np.ndarray.__setslice__(self, i, j, value)
+        np.ndarray.__setitem__(self.view(np.ndarray), slice(i, j), value)
 
     def nonzero(self):
         """Return the one-based indices of the elements of a which are not zero."""
@@ -521,6 +576,12 @@ class FortranArray(np.ndarray):
         else:
             return farray([''.join(x).strip() for x in self])
 
+if fortran_getitem is not None:
+    # equivalent C implementations, which avoid a Python level call
+    # for integer and slice indices
+    FortranArray.__getitem__ = fortran_getitem
+    FortranArray.__setitem__ = fortran_setitem
+
 
 def padded_str_array(d, length):
     """Return :class:`FortranArray` with shape ``(length, len(d))``,
@@ -0,0 +1,159 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+"""
+Helpers for writing ``FilePot`` drivers in Python which can run either
+once per calculation or as a long-lived process.
+
+A driver is a function ``calculate(at, args_str)`` which evaluates the
+:class:`~quippy.atoms.Atoms` object `at` and returns an
+:class:`~quippy.atoms.Atoms` object (usually `at` itself) with the
+results stored as described for ``FilePot``: ``energy`` and ``virial``
+parameters and ``force``, ``local_e`` and ``local_virial`` properties.
+:func:`main` then handles both ways ``FilePot`` can run the driver::
+
+   command xyzfile outfile [args_str...]
+   command --persistent socket_path
+
+In the first form, `xyzfile` is read, `calculate` is called once and
+the results are written to `outfile`. In the second form, which is used
+when ``FilePot`` is initialised with ``persistent=T``, the driver
+listens on the Unix domain socket `socket_path` and calls `calculate`
+for each configuration received until ``FilePot`` closes the
+connection. This avoids reimporting quippy and rereading input files
+on every step. Each message is a 16 character ASCII length followed by
+that many bytes; each request is an `args_str` message followed by an
+extended XYZ message, and each reply is a single extended XYZ message.
+
+A minimal driver looks like this::
+
+   from quippy.filepotdriver import main
+
+   def calculate(at, args_str):
+       ...
+       return at
+
+   if __name__ == '__main__':
+       main(calculate)
+"""
+
+import os
+import sys
+import socket
+import logging
+
+from quippy.atoms import Atoms
+
+__all__ = ['send_frame', 'recv_frame', 'serve', 'run_once', 'main']
+
+fplog = logging.getLogger('quippy.filepotdriver')
+
+MSG_LEN_SIZE = 16
+
+
+def recv_exact(sock, size):
+    """
+    Read exactly `size` bytes from `sock`. Raises :exc:`EOFError` if
+    the connection is closed first.
+    """
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        data = sock.recv(remaining)
+        if not data:
+            raise EOFError('connection closed after %d of %d bytes' % (size - remaining, size))
+        chunks.append(data)
+        remaining -= len(data)
+    return ''.join(chunks)
+
+
+def send_frame(sock, data):
+    """
+    Send the string `data` on `sock`, preceded by its length
+    """
+    sock.sendall('%*d' % (MSG_LEN_SIZE, len(data)) + data)
+
+
+def recv_frame(sock):
+    """
+    Receive a string sent with :func:`send_frame`
+    """
+    return recv_exact(sock, int(recv_exact(sock, MSG_LEN_SIZE)))
+
+
+def serve(calculate, path):
+    """
+    Listen on the Unix domain socket `path` and call `calculate` for
+    each configuration received from a single ``FilePot`` client,
+    returning when the client closes the connection. Returns the
+    number of configurations evaluated.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    n_calls = 0
+    try:
+        server.bind(path)
+        server.listen(1)
+        sock, address = server.accept()
+        try:
+            while True:
+                try:
+                    args_str = recv_frame(sock)
+                except EOFError:
+                    break
+                at = Atoms(recv_frame(sock), format='string')
+                at = calculate(at, args_str)
+                send_frame(sock, at.write('string'))
+                n_calls += 1
+        finally:
+            sock.close()
+    finally:
+        server.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    fplog.info('served %d calculations on %s' % (n_calls, path))
+    return n_calls
+
+
+def run_once(calculate, xyzfile, outfile, args_str=''):
+    """
+    Read `xyzfile`, call `calculate` and write the results to `outfile`
+    """
+    at = Atoms(xyzfile)
+    at = calculate(at, args_str)
+    at.write(outfile)
+
+
+def main(calculate, argv=None):
+    """
+    Run `calculate` in whichever mode is selected by the command line
+    arguments `argv` (default ``sys.argv``), as described above.
+    """
+    if argv is None:
+        argv = sys.argv
+    if len(argv) == 3 and argv[1] == '--persistent':
+        serve(calculate, argv[2])
+    elif len(argv) >= 3:
+        run_once(calculate, argv[1], argv[2], ' '.join(argv[3:]))
+    else:
+        sys.stderr.write('Usage: %s <xyzfile> <outfile> [KEY=VALUE]...\n'
+                         '       %s --persistent <socket_path>\n' % (argv[0], argv[0]))
+        sys.exit(1)
@@ -24,7 +24,8 @@ the frames. If you want to load the entire file into memory and
 manipulate it use an :class:`AtomsList`.
 """
 
-import sys, os, fnmatch, re, itertools, glob, operator, warnings, math, logging
+import sys, os, fnmatch, re, itertools, glob, operator, warnings, math, logging, multiprocessing
+from collections import OrderedDict
 
 import numpy as np
 
@@ -35,7 +36,7 @@ from quippy.atoms import Atoms
 from quippy.farray import FortranArray
 
 __all__ = ['AtomsReaders', 'AtomsWriters', 'atoms_reader',
-           'AtomsReader', 'AtomsWriter', 'AtomsList',
+           'AtomsReader', 'AtomsWriter', 'AtomsList', 'FrameCache',
            'read_dataset', 'time_ordered_series', 'read', 'write', 'dict2atoms']
 
 AtomsReaders = {}
@@ -58,6 +59,122 @@ def atoms_reader(source):
         return func
     return decorate
 
+class FrameCache(object):
+    """
+    Least recently used (LRU) cache of :class:`Atoms` objects, bounded
+    by an estimate of their total memory usage in bytes.
+
+    Entries are kept in an ordered map from key to ``(at, nbytes)``,
+    with the least recently used entry first, so lookup, insertion and
+    eviction are all O(1). A running total of the sizes reported by
+    :meth:`Atoms.mem_estimate` is maintained, and least recently used
+    entries are evicted until the total fits within `mem_limit`. The
+    most recently stored entry is never evicted.
+
+    `mem_limit` is in bytes. If it is `None` the cache is unbounded. The
+    default of -1 chooses a limit when the first frame is stored of ten
+    times the size of that frame, up to a maximum of 100 MB.
+
+    A single :class:`FrameCache` can be shared between several readers,
+    as long as each one uses distinct keys. The counters :attr:`hits`,
+    :attr:`misses` and :attr:`evictions` accumulate over the lifetime
+    of the cache; see also :meth:`info`.
+    """
+
+    def __init__(self, mem_limit=-1):
+        self.mem_limit = mem_limit
+        self.mem_usage = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __repr__(self):
+        return '<%s len=%d mem_usage=%d mem_limit=%r hits=%d misses=%d evictions=%d>' % \
+               (self.__class__.__name__, len(self), self.mem_usage, self.mem_limit,
+                self.hits, self.misses, self.evictions)
+
+    def fetch(self, key):
+        """
+        Return the entry stored under `key` and mark it as most
+        recently used, or return `None` if there is no such entry
+        """
+        try:
+            at, nbytes = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries[key] = (at, nbytes)
+        self.hits += 1
+        return at
+
+    def peek(self, key):
+        """
+        Return the entry stored under `key` without updating the usage
+        order or the hit and miss counters. Raises :exc:`KeyError` if
+        there is no such entry.
+        """
+        return self._entries[key][0]
+
+    def store(self, key, at):
+        """
+        Store `at` under `key` as the most recently used entry, then
+        evict least recently used entries until the memory limit is met
+        """
+        try:
+            nbytes = at.mem_estimate()
+        except AttributeError:
+            nbytes = 0
+
+        if key in self._entries:
+            self.mem_usage -= self._entries.pop(key)[1]
+        self._entries[key] = (at, nbytes)
+        self.mem_usage += nbytes
+
+        if self.mem_limit == -1:
+            self.mem_limit = min(10*nbytes, 100*1024**2)
+
+        if self.mem_limit is not None:
+            while len(self._entries) > 1 and self.mem_usage > self.mem_limit:
+                old_key, (old_at, old_nbytes) = self._entries.popitem(last=False)
+                self.mem_usage -= old_nbytes
+                self.evictions += 1
+            logging.debug('FrameCache now holds %d entries (%d bytes)' % (len(self._entries), self.mem_usage))
+
+    def discard(self, key):
+        """
+        Remove the entry stored under `key`, if there is one
+        """
+        try:
+            self.mem_usage -= self._entries.pop(key)[1]
+        except KeyError:
+            pass
+
+    def clear(self):
+        """
+        Remove all entries. The hit, miss and eviction counters are not reset.
+        """
+        self._entries.clear()
+        self.mem_usage = 0
+
+    def info(self):
+        """
+        Return a dictionary of cache statistics
+        """
+        return {'len': len(self),
+                'mem_usage': self.mem_usage,
+                'mem_limit': self.mem_limit,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
+
+
 class AtomsReaderMixin(object):
     def __repr__(self):
         try:
@@ -141,10 +258,15 @@ class AtomsReader(AtomsReaderMixin):
     `start`, `stop` and `step` can be used to restrict the range of frames
     read from `source`. The first frame in the file has index zero.
 
-    `cache_limit` determines how many configurations will be stored in
-    memory. If more than `cache_limit` configurations are read in, the
-    least recently accessed configurations are thrown away. To store
-    everything, use an :class:`AtomsList` instead.
+    `cache_mem_limit` determines how much memory, in bytes, may be used
+    to store configurations which have already been read. When this is
+    exceeded, the least recently accessed configurations are thrown
+    away. The default is to allow ten times the size of the first
+    frame, up to 100 MB. To store everything, use an :class:`AtomsList`
+    instead. Alternatively, an existing :class:`FrameCache` can be
+    passed in as `cache`, in which case `cache_mem_limit` is ignored
+    and entries are stored under ``(cache_key, frame)`` keys. Cache
+    statistics are available from :meth:`cache_info`.
 
     Some `sources` understand additional keyword arguments from
     `**kwargs`. For example the CASTEP file reader can take an
@@ -177,10 +299,18 @@ class AtomsReader(AtomsReaderMixin):
     :class:`Atoms` object within ``al`` and ``al[i:j]`` returns objects
     from `i` upto but not including `j`. Like ordinary Python lists,
     indices start from 0 and run up to ``len(al)-1``.
+
+    Per-frame analyses of trajectory files can be spread over several
+    processes with :meth:`map` and :meth:`reduce`, e.g.::
+
+       def volume(at):
+          return at.get_volume()
+
+       volumes = AtomsReader('traj.xyz').map(volume, nprocs=8)
     """
 
     def __init__(self, source, format=None, start=None, stop=None, step=None,
-                 cache_mem_limit=-1, rename=None, **kwargs):
+                 cache_mem_limit=-1, rename=None, cache=None, cache_key=None, **kwargs):
 
         def file_exists(f):
             return f == "stdin" or os.path.exists(f) or len(glob.glob(f)) > 0
@@ -191,13 +321,13 @@ class AtomsReader(AtomsReaderMixin):
         self._stop = stop
         self._step = step
 
-        self.cache_mem_limit = cache_mem_limit
-        logging.debug('AtomsReader memory limit %r' % self.cache_mem_limit)
+        if cache is None:
+            cache = FrameCache(cache_mem_limit)
+        self._cache = cache
+        self._cache_key = cache_key
+        logging.debug('AtomsReader memory limit %r' % self._cache.mem_limit)
 
         self._source_len = None
-        self._cache_dict = {}
-        self._cache_list  = []
-        self._cache_mem_usage = []
 
         self.opened = False
         self.reader = source
@@ -256,6 +386,11 @@ class AtomsReader(AtomsReaderMixin):
                 if not isinstance(item, Atoms):
                     is_list_of_atoms = False
 
+        # remember how to reopen file sources, so map() and reduce() can read them in worker processes
+        self._reopen_args = None
+        if is_filename_sequence or (isinstance(self.reader, basestring) and os.path.exists(self.reader)):
+            self._reopen_args = (self.reader, format, rename, kwargs)
+
         if is_filename_sequence:
             self.reader = AtomsSequenceReader(self.reader, format=format, **kwargs)
         elif is_list_of_atoms:
@@ -318,32 +453,30 @@ class AtomsReader(AtomsReaderMixin):
     def __getslice__(self, first, last):
         return self.__getitem__(slice(first,last,None))
 
+    @property
+    def cache_mem_limit(self):
+        """
+        Maximum memory, in bytes, used to cache frames
+        """
+        return self._cache.mem_limit
+
+    def cache_info(self):
+        """
+        Return a dictionary of statistics for the frame cache, see :meth:`FrameCache.info`
+        """
+        return self._cache.info()
+
+    def _cache_entry_key(self, frame):
+        if self._cache_key is None:
+            return frame
+        return (self._cache_key, frame)
+
     def _cache_fetch(self, frame):
         # least recently used (LRU) cache
-        try:
-            self._cache_list.append(self._cache_list.pop(self._cache_list.index(frame)))
-            return True   # cache hit
-        except ValueError:
-            return False  # cache miss
+        return self._cache.fetch(self._cache_entry_key(frame))
 
     def _cache_store(self, frame, at):
-        self._cache_list.append(frame)
-        self._cache_dict[frame] = at
-
-        if self.cache_mem_limit is not None:
-            if self.cache_mem_limit == -1:
-                self.cache_mem_limit = min(10*at.mem_estimate(), 100*1024**2)
-
-            if self.cache_mem_limit == 0:
-                while len(self._cache_dict) > 1:
-                    logging.debug('Reducing AtomsReader cache size from %d' % len(self._cache_dict))
-                    del self._cache_dict[self._cache_list.pop(0)]
-            else:
-                self._cache_mem_usage.append(at.mem_estimate())
-                while len(self._cache_dict) > 1 and sum(self._cache_mem_usage) > self.cache_mem_limit:
-                    logging.debug('Reducing AtomsReader cache size from %d' % len(self._cache_dict))
-                    self._cache_mem_usage.pop(0)
-                    del self._cache_dict[self._cache_list.pop(0)]
+        self._cache.store(self._cache_entry_key(frame), at)
 
     def __getitem__(self, frame):
         if not self.random_access:
@@ -355,12 +488,12 @@ class AtomsReader(AtomsReaderMixin):
                 frame = range(*slice(self._start, self._stop, self._step).indices(source_len))[frame]
             if frame < 0: frame = frame + len(self)
 
-            if not self._cache_fetch(frame):
+            at = self._cache_fetch(frame)
+            if at is None:
                 at = self.reader[frame]
                 at = self.filter(at)
                 self._cache_store(frame, at)
 
-            at = self._cache_dict[frame]
             if not hasattr(at, 'source'):
                 at.source = self.source
             if not hasattr(at, 'frame'):
@@ -410,11 +543,11 @@ class AtomsReader(AtomsReaderMixin):
                 frames = itertools.islice(frames, self._start or 0, self._stop or None, self._step or 1)
                 atoms  = itertools.islice(atoms, self._start or 0, self._stop or None, self._step or 1)
 
-            n_frames = 0
+            seen_frames = []
             last_frame = 0
             for (frame,at) in itertools.izip(frames, atoms):
                 self._cache_store(frame, at)
-                n_frames += 1
+                seen_frames.append(frame)
                 last_frame = frame
                 if not hasattr(at, 'source'):
                     at.source = self.source
@@ -423,8 +556,9 @@ class AtomsReader(AtomsReaderMixin):
                 yield at
 
             # once iteration is finished, random access will be possible if all frames fitted inside cache
-            if len(self._cache_dict) == n_frames:
-                self.reader = self._cache_dict
+            if all(self._cache_entry_key(frame) in self._cache for frame in seen_frames):
+                self.reader = dict((frame, self._cache.peek(self._cache_entry_key(frame)))
+                                   for frame in seen_frames)
                 self._source_len = last_frame+1
 
     def __iter__(self):
@@ -433,6 +567,208 @@ class AtomsReader(AtomsReaderMixin):
     def __reversed__(self):
         return self.iterframes(reverse=True)
 
+    def _frame_indices(self, frames=None):
+        # Convert `frames` (None, int, slice or sequence of ints) to a list of frame indices
+        indices = range(len(self))
+        if frames is None:
+            return indices
+        elif isinstance(frames, slice):
+            return indices[frames]
+        elif isinstance(frames, int) or isinstance(frames, np.integer):
+            return [indices[frames]]
+        else:
+            return [indices[frame] for frame in frames]
+
+    def _source_frames(self, frames=None):
+        # As _frame_indices(), but giving frame indices in the underlying source
+        source_len = self._source_len or len(self.reader)
+        all_frames = range(*slice(self._start, self._stop, self._step).indices(source_len))
+        return [all_frames[index] for index in self._frame_indices(frames)]
+
+    def _columnar_source(self):
+        # Return (filename, format) if the source is a single XYZ or NetCDF file
+        # which get_array() and get_param() can read directly, or (None, None) if not
+        if self._reopen_args is None or self.rename is not None or not self.random_access:
+            return None, None
+        filename, format = self._reopen_args[:2]
+        if not isinstance(filename, basestring):
+            return None, None
+        if format in ('xyz', 'extxyz'):
+            return filename, 'xyz'
+        if format == 'nc':
+            return filename, 'nc'
+        return None, None
+
+    def get_array(self, name, frames=None):
+        """
+        Return the per-atom property `name` for all the frames in this
+        reader, or for the subset given by `frames` (an integer, slice
+        or sequence of integers), stacked into a single array of shape
+        ``(n_frames, n_atoms, ncols)``, or ``(n_frames, n_atoms)`` if
+        `name` has only one column. The result is an ordinary zero-based
+        array, with the columns of each property in the last dimension,
+        i.e. the transpose of the corresponding :class:`Atoms` attribute.
+
+        For Extended XYZ files only the requested columns of each frame
+        are parsed, using the frame index and the ``Properties`` header
+        (see :func:`quippy.xyz.xyz_get_array`). For NetCDF files the
+        data is read in a single hyperslab access. Readers which provide
+        their own :meth:`get_array` method, such as
+        :class:`~quippy.qtraj.QTrajReader`, are used directly. For other
+        sources each frame is read in turn. All selected frames must have the
+        same number of atoms.
+        """
+        if not self.random_access:
+            if frames is not None:
+                raise IndexError('Cannot select frames from an AtomsReader which does not support random access')
+            values = [np.asarray(getattr(at, name)).T for at in self]
+            return np.array(values)
+
+        source_frames = self._source_frames(frames)
+        if hasattr(self.reader, 'get_array') and self.rename is None:
+            return self.reader.get_array(name, source_frames)
+        filename, format = self._columnar_source()
+        if format == 'xyz':
+            from quippy.xyz import xyz_get_array
+            return xyz_get_array(filename, name, source_frames)
+        elif format == 'nc':
+            from quippy.netcdf import NetCDFFrameReader
+            ncreader = NetCDFFrameReader(filename)
+            try:
+                return np.array(ncreader.get_array(name, source_frames))
+            finally:
+                ncreader.close()
+        else:
+            values = [np.asarray(getattr(self[index], name)).T for index in self._frame_indices(frames)]
+            return np.array(values)
+
+    def get_param(self, name, frames=None):
+        """
+        Return the per-frame parameter `name` (e.g. ``energy`` or
+        ``virial``) for all the frames in this reader, or for the subset
+        given by `frames`, as a single array with the frame as the first
+        dimension. ``Lattice`` is also accepted.
+
+        As for :meth:`get_array`, only the comment lines of Extended XYZ
+        files are parsed, and NetCDF variables are read in one access.
+        """
+        def param(at):
+            if name.lower() == 'lattice':
+                return np.asarray(at.lattice)
+            return np.asarray(at.params[name])
+
+        if not self.random_access:
+            if frames is not None:
+                raise IndexError('Cannot select frames from an AtomsReader which does not support random access')
+            return np.array([param(at) for at in self])
+
+        source_frames = self._source_frames(frames)
+        if hasattr(self.reader, 'get_param') and self.rename is None:
+            return self.reader.get_param(name, source_frames)
+        filename, format = self._columnar_source()
+        if format == 'xyz':
+            from quippy.xyz import xyz_get_param
+            return xyz_get_param(filename, name, source_frames)
+        elif format == 'nc':
+            from quippy.netcdf import NetCDFFrameReader, netcdf_frame_lattice
+            ncreader = NetCDFFrameReader(filename)
+            try:
+                if name.lower() == 'lattice':
+                    return np.array([netcdf_frame_lattice(ncreader.source, frame) for frame in source_frames])
+                value = np.array(ncreader.get_array(name, source_frames))
+                if value.ndim == 3:
+                    # matrix parameters are stored transposed
+                    value = value.transpose((0, 2, 1))
+                return value
+            finally:
+                ncreader.close()
+        else:
+            return np.array([param(self[index]) for index in self._frame_indices(frames)])
+
+    def _map_chunks(self, nprocs, chunksize):
+        # Split the frames of the underlying source selected by this
+        # reader into contiguous chunks, so each worker reads a
+        # consecutive run of frames from its own copy of the file.
+        # Returns None if the frames can only be read in this process.
+        if nprocs == 1 or self._reopen_args is None or not self.random_access:
+            return None
+        frames = self._source_frames()
+        if len(frames) == 0:
+            return None
+        if chunksize is None:
+            chunksize = max(1, int(math.ceil(float(len(frames))/(4*nprocs))))
+        return [frames[i:i+chunksize] for i in range(0, len(frames), chunksize)]
+
+    def _map_pool(self, nprocs, chunks, func, reducer):
+        pool = multiprocessing.Pool(processes=min(nprocs, len(chunks)),
+                                    initializer=_map_worker_init,
+                                    initargs=self._reopen_args)
+        try:
+            return pool.map(_map_worker_chunk, [(func, reducer, chunk) for chunk in chunks], chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    def map(self, func, nprocs=None, chunksize=None):
+        """
+        Return the list ``[func(at) for at in self]``, evaluated in
+        parallel using `nprocs` worker processes (default is one per
+        CPU).
+
+        The frames are split into contiguous chunks of `chunksize`
+        frames (default is to make four chunks per process). Each
+        worker process opens the source file(s) independently and reads
+        its chunks by random access, using the frame index for XYZ files
+        (the ``.xyz.idx`` file, which is created when this reader is
+        opened if it does not already exist) or the frame dimension for
+        NetCDF files. Results are returned in frame order.
+
+        `func` is sent to the worker processes, so it must be picklable,
+        i.e. a function defined at the top level of a module, and so
+        must the values it returns. The :class:`Atoms` objects passed to
+        `func` are not returned to this process, so any changes made to
+        them are lost.
+
+        If the source is not a file or does not support random access,
+        or if `nprocs` is 1, the frames are processed serially in this
+        process instead.
+        """
+        if nprocs is None:
+            nprocs = multiprocessing.cpu_count()
+        chunks = self._map_chunks(nprocs, chunksize)
+        if chunks is None:
+            return [func(at) for at in self]
+
+        results = self._map_pool(nprocs, chunks, func, None)
+        return list(itertools.chain(*results))
+
+    def reduce(self, func, reducer, initial=None, nprocs=None, chunksize=None):
+        """
+        Apply `func` to each frame and combine the results in frame
+        order using the two argument function `reducer`, as for the
+        builtin :func:`reduce`, i.e. ``reduce(reducer, self.map(func),
+        initial)``.
+
+        Arguments are as for :meth:`map`. In parallel mode each worker
+        process reduces its own chunks before the partial results are
+        combined in this process, so `reducer` must be associative
+        (e.g. :func:`operator.add` or :func:`max`) and must also be
+        picklable. If `initial` is given it is only used once, in the
+        final combination.
+        """
+        if nprocs is None:
+            nprocs = multiprocessing.cpu_count()
+        chunks = self._map_chunks(nprocs, chunksize)
+        if chunks is None:
+            partials = [func(at) for at in self]
+        else:
+            partials = self._map_pool(nprocs, chunks, func, reducer)
+
+        if initial is None:
+            return reduce(reducer, partials)
+        else:
+            return reduce(reducer, partials, initial)
+
     def filter(self, at):
         """
         Apply read-time filters to `at`
@@ -450,6 +786,24 @@ class AtomsReader(AtomsReaderMixin):
         return at
 
 
+# AtomsReader opened by each worker process in AtomsReader.map() and AtomsReader.reduce()
+_map_worker_reader = None
+
+def _map_worker_init(source, format, rename, kwargs):
+    global _map_worker_reader
+    _map_worker_reader = AtomsReader(source, format=format, rename=rename,
+                                     cache_mem_limit=0, **kwargs)
+
+def _map_worker_chunk(args):
+    func, reducer, frames = args
+    results = []
+    for frame in frames:
+        results.append(func(_map_worker_reader[frame]))
+    if reducer is None:
+        return results
+    return reduce(reducer, results)
+
+
 class AtomsList(AtomsReaderMixin, list):
     """
     An :class:`AtomsList` is just like an :class:`AtomsReader` except
@@ -588,14 +942,23 @@ def AtomsWriter(dest, format=None, **kwargs):
 
 
 class AtomsSequenceReader(object):
-    """Read Atoms from a list of sources"""
+    """
+    Read Atoms from a list of sources
+
+    A single :class:`FrameCache` is shared between the readers for
+    all of the sources, so the memory limit applies to the sequence as
+    a whole rather than to each source in turn.
+    """
 
-    def __init__(self, sources, **kwargs):
+    def __init__(self, sources, cache_mem_limit=-1, cache=None, **kwargs):
         self.sources = sources
         self.readers = []
         self.lengths = []
-        for source in sources:
-            reader = AtomsReader(source, **kwargs)
+        if cache is None:
+            cache = FrameCache(cache_mem_limit)
+        self.cache = cache
+        for i, source in enumerate(sources):
+            reader = AtomsReader(source, cache=self.cache, cache_key=i, **kwargs)
             self.readers.append(reader)
             try:
                 self.lengths.append(len(reader))
@@ -21,19 +21,26 @@ Module containing :class:`LOTFDynamics` integrator for doing 'Learn on the Fly'
 predictor-corrector dynamics within the ASE molecular dynamics framework.
 """
 
+import multiprocessing
 import numpy as np
 
-from quippy.clusters import (HYBRID_ACTIVE_MARK, HYBRID_NO_MARK,
+from quippy.clusters import (HYBRID_ACTIVE_MARK, HYBRID_BUFFER_MARK,
+                             HYBRID_BUFFER_OUTER_LAYER_MARK, HYBRID_NO_MARK,
                              construct_hysteretic_region,
                              create_hybrid_weights,
-                             create_cluster_simple)
+                             create_cluster_simple,
+                             create_cluster_info_from_mark,
+                             carve_cluster,
+                             update_cluster_positions,
+                             bfs_atom_centred)
 from quippy.potential import Potential, ForceMixingPotential
 from quippy.table import Table
 from quippy.system import system_get_random_seed, system_set_random_seeds, system_timer
 from quippy.util import args_str
 
 
-__all__ = ['LOTFDynamics', 'update_hysteretic_qm_region', 'iter_atom_centered_clusters']
+__all__ = ['LOTFDynamics', 'update_hysteretic_qm_region', 'iter_atom_centered_clusters',
+           'AtomCenteredClusters']
 
 
 from ase.md.md import MolecularDynamics
@@ -440,7 +447,7 @@ def update_hysteretic_qm_region(atoms, old_qm_list, qm_centre, qm_inner_radius,
     return qm_list
 
 
-def iter_atom_centered_clusters(at, mark_name='hybrid_mark', **cluster_args):
+def iter_atom_centered_clusters(at, mark_name='hybrid_mark', nprocs=1, **cluster_args):
     """
     Iterate over all atom-centered (little) clusters in `at`.
 
@@ -448,16 +455,34 @@ def iter_atom_centered_clusters(at, mark_name='hybrid_mark', **cluster_args):
     only those atoms where ``hybrid_mark == HYBRID_ACTIVE_MARK`` are
     included. Otherwise, all atoms are included.
 
-    Clusters are constructed by calling
+    Clusters are constructed with :class:`AtomCenteredClusters`, using
+    `nprocs` processes, which gives the same clusters as calling
     :func:`~quippy.clusters.create_hybrid_weights` and
     :func:`~quippy.clusters.create_cluster_simple` once for each atom
     of interest, after setting ``hybrid_mark=HYBRID_ACTIVE_MARK`` for that
-    atom only.
+    atom only. That is still done if the hysteretic buffer or transition
+    region options, which :class:`AtomCenteredClusters` does not
+    support, are used.
 
     Any keyword arguments given are passed along to both cluster
     creation functions.
     """
 
+    if not _can_batch_clusters(cluster_args):
+        for c in _iter_atom_centered_clusters_serial(at, mark_name, **cluster_args):
+            yield c
+        return
+
+    clusters = AtomCenteredClusters(mark_name, nprocs=nprocs, reuse=False, **cluster_args)
+    try:
+        result = clusters.update(at)
+    finally:
+        clusters.close()
+    for c in result:
+        yield c
+
+
+def _iter_atom_centered_clusters_serial(at, mark_name='hybrid_mark', **cluster_args):
     saved_hybrid_mark = None
     if hasattr(at, 'hybrid_mark'):
         saved_hybrid_mark = at.hybrid_mark.copy()
@@ -480,3 +505,210 @@ def iter_atom_centered_clusters(at, mark_name='hybrid_mark', **cluster_args):
         at.add_property('hybrid_mark', saved_hybrid_mark, overwrite=True)
     else:
         del at.properties['hybrid_mark']
+
+
+def _bool_arg(value):
+    if isinstance(value, basestring):
+        return value.strip().lower() in ('t', 'true', '1')
+    return bool(value)
+
+
+def _can_batch_clusters(cluster_args):
+    return not (_bool_arg(cluster_args.get('hysteretic_buffer', False)) or
+                _bool_arg(cluster_args.get('hysteretic_connect', False)) or
+                int(cluster_args.get('transition_hops', 0)) > 1 or
+                cluster_args.get('weight_interpolation', 'hop_ramp') != 'hop_ramp')
+
+
+def _carve_cluster(at, cluster_args_str, members, marks):
+    at.hybrid_mark[members] = marks
+    try:
+        cluster_info = create_cluster_info_from_mark(at, cluster_args_str)
+        return carve_cluster(at, cluster_args_str, cluster_info)
+    finally:
+        at.hybrid_mark[members] = HYBRID_NO_MARK
+
+
+def _pool_carve_clusters(task):
+    # the worker pool outlives each update, so every chunk of clusters
+    # comes with its own copy of the Atoms, which needs connectivity
+    at, cutoff, cutoff_skin, nneightol, cluster_args_str, chunk = task
+    at.set_cutoff(cutoff, cutoff_skin)
+    at.nneightol = nneightol
+    at.calc_connect()
+    return [_carve_cluster(at, cluster_args_str, members_idx, marks)
+            for (members_idx, marks) in chunk]
+
+
+class AtomCenteredClusters(object):
+    """
+    Build the atom-centered (little) clusters of an :class:`~.Atoms`
+    object, for example to fit LOTF or to collect QM training data,
+    and keep them up to date as the atoms move.
+
+    Each cluster is the same as that made by
+    :func:`~quippy.clusters.create_hybrid_weights` and
+    :func:`~quippy.clusters.create_cluster_simple` with
+    ``hybrid_mark=HYBRID_ACTIVE_MARK`` for the central atom only, but
+    the bond hopping for all the centres is done in a single call to
+    :func:`~quippy.clusters.bfs_atom_centred`, and
+    :func:`~.Atoms.calc_connect` is called once rather than once per
+    cluster. The clusters that need to be carved can be shared between
+    `nprocs` worker processes.
+
+    If `reuse` is true (the default), the clusters from the previous
+    call to :meth:`update` are kept. A cluster is only carved again if
+    the atoms (and periodic images) within ``buffer_hops`` hops of its
+    centre, or one hop further if the cluster is terminated, have
+    changed. Otherwise the existing cluster is moved to the new
+    positions with :func:`~quippy.clusters.update_cluster_positions`.
+    The cluster heuristics of
+    :func:`~quippy.clusters.create_cluster_info_from_mark` are not
+    reapplied in that case.
+
+    `mark_name` selects the centres as for
+    :func:`iter_atom_centered_clusters`, and all other keyword
+    arguments are passed on to the cluster creation functions. The
+    hysteretic buffer and transition region options of
+    :func:`~quippy.clusters.create_hybrid_weights` are not supported.
+
+    Reused clusters are updated in place, so the clusters returned by
+    one call to :meth:`update` may be changed by the next. The number of
+    clusters carved and reused so far is recorded in :attr:`stats`.
+
+    If `nprocs` > 1, the worker processes are started by the first
+    :meth:`update` that needs them and kept until :meth:`close` is
+    called or the object is deleted.
+    """
+
+    def __init__(self, mark_name='hybrid_mark', nprocs=1, reuse=True, **cluster_args):
+        if not _can_batch_clusters(cluster_args):
+            raise ValueError('AtomCenteredClusters does not support hysteretic buffers or transition regions')
+        self.mark_name = mark_name
+        self.nprocs = nprocs
+        self.reuse = reuse and not _bool_arg(cluster_args.get('terminate_octahedra', False))
+        self.cluster_args = cluster_args
+        self.cluster_args_str = args_str(cluster_args)
+
+        self.buffer_hops = int(cluster_args.get('buffer_hops', 3))
+        self.mark_buffer_outer_layer = _bool_arg(cluster_args.get('mark_buffer_outer_layer', True))
+        self.nneighb_only = _bool_arg(cluster_args.get('cluster_hopping_nneighb_only', True))
+        self.min_images_only = _bool_arg(cluster_args.get('min_images_only', False))
+        self.n_hops = self.buffer_hops
+        if _bool_arg(cluster_args.get('terminate', True)):
+            self.n_hops += 1
+
+        self.stats = {'carved': 0, 'reused': 0}
+        self._pool = None
+        self.reset()
+
+    def close(self):
+        """
+        Shut down the worker processes, if any. They are started again
+        if needed by the next call to :meth:`update`.
+        """
+        pool = getattr(self, '_pool', None)
+        if pool is not None:
+            pool.close()
+            pool.join()
+            self._pool = None
+
+    def __del__(self):
+        self.close()
+
+    def reset(self):
+        """
+        Forget all clusters, so that they are all carved by the next
+        call to :meth:`update`
+        """
+        self._cache = {}
+        self._n_atoms = None
+
+    def _marks(self, members):
+        hop = members[:, 4]
+        keep = hop <= self.buffer_hops
+        marks = np.where(hop == 0, HYBRID_ACTIVE_MARK, HYBRID_BUFFER_MARK)
+        if self.mark_buffer_outer_layer and self.buffer_hops > 0:
+            marks[hop == self.buffer_hops] = HYBRID_BUFFER_OUTER_LAYER_MARK
+        return members[keep, 0], marks[keep]
+
+    def update(self, at, indices=None):
+        """
+        Return a list of the clusters centred on each of the atoms in
+        `indices`, or those selected by `mark_name` if `indices` is
+        not given.
+        """
+        if indices is None:
+            if hasattr(at, self.mark_name):
+                indices = (getattr(at, self.mark_name) == HYBRID_ACTIVE_MARK).nonzero()[0]
+            else:
+                indices = at.indices
+        indices = [int(i) for i in indices]
+        if not indices:
+            return []
+
+        if len(at) != self._n_atoms:
+            self.reset()
+            self._n_atoms = len(at)
+
+        saved_hybrid_mark = None
+        if hasattr(at, 'hybrid_mark'):
+            saved_hybrid_mark = at.hybrid_mark.copy()
+        at.add_property('hybrid_mark', HYBRID_NO_MARK, overwrite=True)
+
+        try:
+            system_timer('atom_centered_clusters')
+            at.calc_connect()
+            hops = bfs_atom_centred(at, indices, self.n_hops,
+                                    nneighb_only=self.nneighb_only,
+                                    min_images_only=self.min_images_only)
+            # columns are centre number, atom index, shift and hop count
+            rows = np.array(hops.int).T
+            bounds = np.searchsorted(rows[:, 0], np.arange(1, len(indices)+2))
+
+            clusters = [None]*len(indices)
+            cache = {}
+            to_carve = []
+            for k, centre in enumerate(indices):
+                members = rows[bounds[k]:bounds[k+1], 1:]
+                members_idx, marks = self._marks(members)
+                cached = self._cache.get(centre)
+                if (self.reuse and cached is not None and
+                    np.array_equal(cached[0], members)):
+                    cluster = cached[1]
+                    at.hybrid_mark[members_idx] = marks
+                    update_cluster_positions(at, self.cluster_args_str, cluster)
+                    at.hybrid_mark[members_idx] = HYBRID_NO_MARK
+                    clusters[k] = cluster
+                    cache[centre] = cached
+                    self.stats['reused'] += 1
+                else:
+                    to_carve.append((k, centre, members, members_idx, marks))
+
+            if self.nprocs > 1 and len(to_carve) > 1:
+                if self._pool is None:
+                    self._pool = multiprocessing.Pool(self.nprocs)
+                tasks = [(members_idx, marks) for (k, centre, members, members_idx, marks) in to_carve]
+                chunksize = (len(tasks) + self.nprocs - 1)//self.nprocs
+                chunks = [(at, at.cutoff, at.cutoff_skin, at.nneightol, self.cluster_args_str, tasks[i:i+chunksize])
+                          for i in range(0, len(tasks), chunksize)]
+                carved = sum(self._pool.map(_pool_carve_clusters, chunks, chunksize=1), [])
+            else:
+                carved = [_carve_cluster(at, self.cluster_args_str, members_idx, marks)
+                          for (k, centre, members, members_idx, marks) in to_carve]
+
+            for (k, centre, members, members_idx, marks), cluster in zip(to_carve, carved):
+                clusters[k] = cluster
+                cache[centre] = (members, cluster)
+            self.stats['carved'] += len(to_carve)
+
+            if self.reuse:
+                self._cache = cache
+            system_timer('atom_centered_clusters')
+        finally:
+            if saved_hybrid_mark is not None:
+                at.add_property('hybrid_mark', saved_hybrid_mark, overwrite=True)
+            else:
+                del at.properties['hybrid_mark']
+
+        return clusters
@@ -19,6 +19,8 @@
 import logging, StringIO
 from math import pi
 
+import numpy as np
+
 from quippy.atoms import make_lattice, get_lattice_params
 from quippy.io import atoms_reader, AtomsReaders, AtomsWriters
 from quippy.periodictable import ElementName
@@ -31,9 +33,9 @@ from quippy.dictionary import (Dictionary, PROPERTY_INT, PROPERTY_REAL,
 from quippy.table import TABLE_STRING_LENGTH
 from quippy.ordereddict import *
 from quippy.farray import *
-from quippy import netcdf_file
+from quippy import netcdf_file, get_fortran_indexing
 
-__all__ = ['NetCDFReader']
+__all__ = ['NetCDFReader', 'NetCDFFrame', 'NetCDFFrameReader']
 
 def netcdf_dimlen(obj, name):
     """Return length of dimension 'name'. Works for both netCDF4 and pupynere."""
@@ -43,6 +45,91 @@ def netcdf_dimlen(obj, name):
     except TypeError:
         return n
 
+DEG_TO_RAD = pi/180.0
+
+remap_names = {'coordinates': 'pos',
+               'velocities': 'velo',
+               'cell_lengths': None,
+               'cell_angles': None,
+               'cell_lattice': None,
+               'cell_rotated': None}
+
+frame_view_names = {'pos': 'coordinates',
+                    'velo': 'velocities'}
+
+def netcdf_frame_lattice(source, frame):
+    """Return the lattice of frame `frame` of the NetCDF file `source` from the cell lengths and angles"""
+    cl = source.variables['cell_lengths'][frame]
+    ca = source.variables['cell_angles'][frame]
+    return make_lattice(cl[0],cl[1],cl[2],ca[0]*DEG_TO_RAD,ca[1]*DEG_TO_RAD,ca[2]*DEG_TO_RAD)
+
+def netcdf_frame_view(var, frame):
+    """
+    Return a read-only view of frame `frame` of the NetCDF variable
+    `var`, transposed to match the :class:`Atoms` property layout.
+
+    For files opened with :mod:`quippy.pupynere` using ``mmap=True``,
+    this is a view directly into the memory-mapped record data, so no
+    data is copied until it is used. With the :mod:`netCDF4` module the
+    frame is read into a new array.
+    """
+    data = getattr(var, 'data', None)
+    if isinstance(data, np.ndarray):
+        value = data[frame]
+    else:
+        value = np.asarray(var[frame])
+    if value.dtype.kind != 'S': value = value.T
+    value = value.view()
+    value.flags.writeable = False
+    if get_fortran_indexing():
+        value = value.view(FortranArray)
+    return value
+
+def netcdf_frame_to_atoms(source, frame):
+    """Construct an :class:`Atoms` object from frame `frame` of the NetCDF file `source`"""
+
+    from quippy import Atoms
+
+    lattice = netcdf_frame_lattice(source, frame)
+    at = Atoms(n=netcdf_dimlen(source, 'atom'), lattice=lattice, properties={})
+
+    for name, var in source.variables.iteritems():
+        name = remap_names.get(name, name)
+
+        if name is None:
+            continue
+
+        name = str(name) # in case it's a unicode string
+
+        if 'frame' in var.dimensions:
+            if 'atom' in var.dimensions:
+                # It's a property
+                value = var[frame]
+                if value.dtype.kind != 'S': value = value.T
+                at.add_property(name, value)
+            else:
+                # It's a param
+                if var.dimensions == ('frame','string'):
+                    # if it's a single string, join it and strip it
+                    at.params[name] = ''.join(var[frame]).strip()
+                else:
+                    if name == 'cutoff':
+                        at.cutoff = var[frame]
+                    elif name == 'cutoff_skin':
+                        at.cutoff_skin = var[frame]
+                    elif name == 'nneightol':
+                        at.nneightol = var[frame]
+                    elif name == 'pbc':
+                        at.pbc = var[frame]
+                    else:
+                        at.params[name] = var[frame].T
+
+    if 'cell_rotated' in source.variables:
+        orig_lattice = source.variables['cell_lattice'][frame]
+        at.set_lattice(orig_lattice, True)
+
+    return at
+
 @atoms_reader(netcdf_file)
 @atoms_reader('nc')
 def NetCDFReader(source, frame=None, start=0, stop=None, step=1, format=None):
@@ -52,26 +139,6 @@ def NetCDFReader(source, frame=None, start=0, stop=None, step=1, format=None):
         opened = True
         source = netcdf_file(source)
 
-    from quippy import Atoms
-
-    DEG_TO_RAD = pi/180.0
-
-    remap_names = {'coordinates': 'pos',
-                   'velocities': 'velo',
-                   'cell_lengths': None,
-                   'cell_angles': None,
-                   'cell_lattice': None,
-                   'cell_rotated': None}
-
-    prop_type_to_value = {PROPERTY_INT: 0,
-                          PROPERTY_REAL: 0.0,
-                          PROPERTY_STR: "",
-                          PROPERTY_LOGICAL: False}
-
-    prop_dim_to_ncols = {('frame','atom','spatial'): 3,
-                         ('frame','atom','label'): 1,
-                         ('frame', 'atom'): 1}
-
     if frame is not None:
         start = frame
         stop = frame+1
@@ -81,53 +148,168 @@ def NetCDFReader(source, frame=None, start=0, stop=None, step=1, format=None):
             stop = source.variables['cell_lengths'].shape[0]
 
     for frame in range(start, stop, step):
-        cl = source.variables['cell_lengths'][frame]
-        ca = source.variables['cell_angles'][frame]
-        lattice = make_lattice(cl[0],cl[1],cl[2],ca[0]*DEG_TO_RAD,ca[1]*DEG_TO_RAD,ca[2]*DEG_TO_RAD)
+        yield netcdf_frame_to_atoms(source, frame)
+
+    if opened: source.close()
+
+
+class NetCDFFrame(object):
+    """
+    Lazy, read-only view of a single frame of a NetCDF trajectory.
 
-        at = Atoms(n=netcdf_dimlen(source, 'atom'), lattice=lattice, properties={})
+    Per-atom variables are available as attributes with the same names
+    and shapes as the corresponding :class:`Atoms` properties, e.g.
+    ``frame.pos`` and ``frame.force``, and per-frame variables are
+    available through :attr:`params`. When the file was opened with
+    :mod:`quippy.pupynere` these are views into the memory-mapped file
+    rather than copies. Use :meth:`get_atoms` to construct a full
+    :class:`Atoms` object.
+    """
 
-        for name, var in source.variables.iteritems():
-            name = remap_names.get(name, name)
+    def __init__(self, source, frame):
+        self._source = source
+        self.frame = frame
 
-            if name is None:
+    def __repr__(self):
+        return '<%s frame=%d n=%d>' % (self.__class__.__name__, self.frame, self.n)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        var = self._source.variables.get(frame_view_names.get(name, name))
+        if var is None:
+            var = self._source.variables.get(name)
+        if var is None or var.dimensions[:2] != ('frame', 'atom'):
+            raise AttributeError('NetCDF frame has no per-atom variable %r' % name)
+        return netcdf_frame_view(var, self.frame)
+
+    @property
+    def n(self):
+        return netcdf_dimlen(self._source, 'atom')
+
+    @property
+    def lattice(self):
+        if 'cell_rotated' in self._source.variables:
+            return farray(self._source.variables['cell_lattice'][self.frame])
+        return farray(netcdf_frame_lattice(self._source, self.frame))
+
+    @property
+    def properties(self):
+        """
+        List of the names of the per-atom variables in this frame
+        """
+        return [str(remap_names.get(name, name)) for (name, var) in self._source.variables.iteritems()
+                if var.dimensions[:2] == ('frame', 'atom')]
+
+    @property
+    def params(self):
+        """
+        Dictionary of the per-frame variables in this frame
+        """
+        params = {}
+        for name, var in self._source.variables.iteritems():
+            if remap_names.get(name, name) is None:
+                continue
+            if var.dimensions[:1] != ('frame',) or 'atom' in var.dimensions:
                 continue
+            if var.dimensions == ('frame','string'):
+                params[str(name)] = ''.join(var[self.frame]).strip()
+            else:
+                params[str(name)] = var[self.frame].T
+        return params
 
-            name = str(name) # in case it's a unicode string
+    def mem_estimate(self):
+        return 0
 
-            if 'frame' in var.dimensions:
-                if 'atom' in var.dimensions:
-                    # It's a property
-                    value = var[frame]
-                    if value.dtype.kind != 'S': value = value.T
-                    at.add_property(name, value)
-                else:
-                    # It's a param
-                    if var.dimensions == ('frame','string'):
-                        # if it's a single string, join it and strip it
-                        at.params[name] = ''.join(var[frame]).strip()
-                    else:
-                        if name == 'cutoff':
-                            at.cutoff = var[frame]
-                        elif name == 'cutoff_skin':
-                            at.cutoff_skin = var[frame]
-                        elif name == 'nneightol':
-                            at.nneightol = var[frame]
-                        elif name == 'pbc':
-                            at.pbc = var[frame]
-                        else:
-                            at.params[name] = var[frame].T
-
-        if 'cell_rotated' in source.variables:
-            cell_rotated = source.variables['cell_rotated'][frame]
-            orig_lattice = source.variables['cell_lattice'][frame]
-            #if cell_rotated == 1:
-            at.set_lattice(orig_lattice, True)
-
-        yield at
+    def get_atoms(self):
+        """
+        Construct and return an :class:`Atoms` object for this frame
+        """
+        return netcdf_frame_to_atoms(self._source, self.frame)
+
+
+class NetCDFFrameReader(object):
+    """
+    Random access reader returning :class:`NetCDFFrame` views rather
+    than :class:`Atoms` objects. The file is opened with memory
+    mapping where the NetCDF implementation supports it.
+
+    Whole-trajectory arrays of a single variable can be obtained with
+    :meth:`get_array`, which avoids visiting each frame in turn.
+
+    As for :func:`NetCDFReader`, `frame` or `start`, `stop` and `step`
+    select a subset of the frames in the file; indices passed to the
+    reader are then relative to this selection.
+    """
+
+    def __init__(self, source, frame=None, start=0, stop=None, step=1, format=None):
+        self.opened = False
+        if isinstance(source, basestring):
+            self.opened = True
+            try:
+                source = netcdf_file(source, mmap=True)
+            except TypeError:
+                source = netcdf_file(source)
+        self.source = source
+
+        n_frames = self.source.variables['cell_lengths'].shape[0]
+        if frame is not None:
+            if frame < 0: frame = frame + n_frames
+            start = frame
+            stop = frame+1
+            step = 1
+        start, stop, step = slice(start, stop, step).indices(n_frames)
+        self.frames = range(start, stop, step)
+        if stop < 0:
+            stop = None # reversed selection running up to and including frame 0
+        self.selection = slice(start, stop, step)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, frame):
+        if isinstance(frame, slice):
+            return [self[f] for f in range(*frame.indices(len(self)))]
+        if frame < 0: frame = frame + len(self)
+        if frame < 0 or frame >= len(self):
+            raise IndexError('frame %d out of range 0..%d' % (frame, len(self)))
+        return NetCDFFrame(self.source, self.frames[frame])
+
+    def __iter__(self):
+        for frame in self.frames:
+            yield NetCDFFrame(self.source, frame)
+
+    def get_array(self, name, frames=None):
+        """
+        Return per-atom variable `name` for all frames, or for the
+        frames selected by the slice or index array `frames`, as an
+        array of shape ``(n_frames, n_atoms, ncols)`` (or ``(n_frames,
+        n_atoms)`` for scalar properties). `frames` is relative to the
+        reader's selection of frames. Where possible this is a
+        read-only strided view into the memory mapped file.
+        """
+        var = self.source.variables.get(frame_view_names.get(name, name))
+        if var is None:
+            var = self.source.variables.get(name)
+        if var is None or var.dimensions[:1] != ('frame',):
+            raise KeyError('NetCDF file has no per-frame variable %r' % name)
+        data = getattr(var, 'data', None)
+        if not isinstance(data, np.ndarray):
+            data = var
+        value = data[self.selection]
+        if frames is not None:
+            value = value[frames]
+        value = np.asarray(value)
+        if value.base is not None:
+            value = value.view()
+            value.flags.writeable = False
+        return value
 
     def close(self):
-        if self.opened: source.close()
+        if self.opened:
+            self.source.close()
+
+AtomsReaders['ncview'] = NetCDFFrameReader
 
 class NetCDFWriter(object):
 
@@ -29,6 +29,7 @@ import imp
 import weakref
 import re
 from types import MethodType
+from functools import partial
 
 import numpy as np
 
@@ -172,137 +173,183 @@ def type_is_compatible(spec, arg):
             # Check each dimension matches
             return all([x == y for (x,y) in zip(adims,dims)])
 
-def process_in_args(args, kwargs, inargs, prefix, args_str_args, routine_name):
-    # Process positional arguments
-    newargs = []
-    modargs = []
-    for arg, spec in zip(args,inargs):
-        if arg is not None and spec['type'].startswith('type'):
-            cls = FortranDerivedTypes[spec['type'].lower()]
-            if isinstance(arg, cls):
-                newargs.append(arg._fpointer)
-                modargs.append(None)
+class CallPlan(object):
+    """
+    Argument marshalling plan for a single wrapped Fortran routine
+
+    The plan is built once from the routine's documentation
+    dictionary when the routine is wrapped, so that the lists of input
+    and output arguments, the keyword argument lookup table, whether
+    the routine accepts an `args_str` argument, and which arguments
+    need converting or updating are not recomputed on every call.
+    Calls with no keyword arguments take a positional fast path which
+    skips keyword and `args_str` processing entirely.
+    """
+
+    # Conversions needed for input arguments
+    _PLAIN, _DERIVED_TYPE, _CHARACTER = range(3)
+
+    def __init__(self, fobj, doc, prefix, name):
+        self.fobj = fobj
+        self.doc = doc
+        self.prefix = prefix
+        self.name = name
+
+        self.inargs  = [ x for x in doc['args'] if not 'intent(out)' in x['attributes'] ]
+        self.outargs = [ x for x in doc['args'] if 'intent(out)' in x['attributes'] ]
+        self.args_str_args = doc['args_str']
+
+        self.kwarg_lookup = dict([(badnames.get(x['name'].lower(),x['name'].lower()),x) for x in self.inargs])
+        self.got_args_str = prefix+'args_str' in self.kwarg_lookup
+
+        self.in_kinds = []
+        for spec in self.inargs:
+            if spec['type'].startswith('type'):
+                self.in_kinds.append((CallPlan._DERIVED_TYPE, spec['type'].lower()))
+            elif spec['type'].startswith('character'):
+                self.in_kinds.append((CallPlan._CHARACTER, None))
             else:
-                try:
-                    raise NotImplementedError
-                    newarg = cls(arg)
-                    newargs.append(newarg._fpointer)
-                    modargs.append(newarg)
-                except:
-                    TypeError('Argument %s should be of type %s but got incompatible type %s' % (arg, spec['type'], type(arg)))
-
-        elif arg is not None and spec['type'].startswith('character'):
-            # if arg is a list of strings of unequal length, pad with spaces
-            if isinstance(arg, list) and any([len(x) != len(arg[0]) for x in arg]):
-                a = s2a(arg).T
-                newargs.append(a)
-                modargs.append(None)
+                self.in_kinds.append((CallPlan._PLAIN, None))
+        self.all_plain = all([kind == CallPlan._PLAIN for (kind, typename) in self.in_kinds])
+
+        # positions of derived type input arguments which may be modified by the call
+        self.update_inargs = [i for (i, spec) in enumerate(self.inargs)
+                              if spec['type'].startswith('type') and not 'fintent(in)' in spec['attributes']]
+
+        self.out_types = []
+        for spec in self.outargs:
+            if spec['type'].startswith('type'):
+                self.out_types.append(spec['type'].lower())
+            elif spec['type'] == 'logical':
+                self.out_types.append('logical')
             else:
-                newargs.append(arg)
-                modargs.append(None)
+                self.out_types.append(None)
+
+    def __repr__(self):
+        return '<CallPlan for %s: %d in, %d out, args_str=%r>' % (self.name, len(self.inargs),
+                                                                  len(self.outargs), self.got_args_str)
+
+    def process_in_args(self, args, kwargs):
+        """
+        Convert positional arguments `args` and keyword arguments
+        `kwargs` for the Fortran routine, returning a tuple
+        `(newargs, newkwargs)`. Derived type instances are replaced by
+        their :attr:`_fpointer`, and unexpected keyword arguments are
+        merged into the `args_str` argument if there is one.
+        """
+        if self.all_plain:
+            newargs = args
         else:
-            newargs.append(arg)
-            modargs.append(None)
-
-    # Process keyword arguments and args_str arguments.
-
-    # If we're expecting an args_str argument, then any kwarg is
-    # permitted. Otherwise kwarg name must match one of the expected
-    # names. If kwarg name matches one of expected values, but type of
-    # argument does not, then we assume it's an arg_str argument.
-
-    kwarg_lookup = dict([(badnames.get(x['name'].lower(),x['name'].lower()),x) for x in inargs])
-    got_args_str = prefix+'args_str' in kwarg_lookup
-
-    newkwargs = {}
-    modkwargs = {}
-    args_str_kwargs = {}
-    for k,a in kwargs.iteritems():
-        k = prefix+k
-        if got_args_str:
-            if k != prefix+'args_str' and (k not in kwarg_lookup or (k in kwarg_lookup and not type_is_compatible(kwarg_lookup[k], a))):
-                if k[len(prefix):] not in args_str_args:
-                    wraplog.warn('Converting unexpected keyword argument "%s" to routine "%s()" to an args_str argument - is this a typo?' %
-                                 (k[len(prefix):], routine_name))
-                args_str_kwargs[k[len(prefix):]] = a
+            newargs = []
+            for arg, (kind, typename) in zip(args, self.in_kinds):
+                if arg is None or kind == CallPlan._PLAIN:
+                    newargs.append(arg)
+                elif kind == CallPlan._DERIVED_TYPE:
+                    if not isinstance(arg, FortranDerivedTypes[typename]):
+                        raise TypeError('Argument %s should be of type %s but got incompatible type %s' % (arg, typename, type(arg)))
+                    newargs.append(arg._fpointer)
+                else:
+                    # if arg is a list of strings of unequal length, pad with spaces
+                    if isinstance(arg, list) and any([len(x) != len(arg[0]) for x in arg]):
+                        arg = s2a(arg).T
+                    newargs.append(arg)
+
+        if not kwargs:
+            return newargs, {}
+
+        prefix = self.prefix
+        kwarg_lookup = self.kwarg_lookup
+        newkwargs = {}
+        args_str_kwargs = {}
+        for k,a in kwargs.iteritems():
+            k = prefix+k
+            if self.got_args_str:
+                if k != prefix+'args_str' and (k not in kwarg_lookup or not type_is_compatible(kwarg_lookup[k], a)):
+                    if k[len(prefix):] not in self.args_str_args:
+                        wraplog.warn('Converting unexpected keyword argument "%s" to routine "%s()" to an args_str argument - is this a typo?' %
+                                     (k[len(prefix):], self.name))
+                    args_str_kwargs[k[len(prefix):]] = a
+                    continue
+            if k not in kwarg_lookup:
+                raise ValueError('Unknown keyword argument %s' % k)
+            if a is None:
                 continue
-        if k not in kwarg_lookup:
-            raise ValueError('Unknown keyword argument %s' % k)
-        if kwarg_lookup[k]['type'].startswith('type'):
-            cls = FortranDerivedTypes[kwarg_lookup[k]['type'].lower()]
-            if isinstance(a, cls):
+            spec_type = kwarg_lookup[k]['type']
+            if spec_type.startswith('type'):
+                if not isinstance(a, FortranDerivedTypes[spec_type.lower()]):
+                    raise TypeError('Argument %s should be of type %s, but got incompatible type %s' % (k, spec_type, type(a)))
                 newkwargs[k] = a._fpointer
-                modkwargs[k] = None
-            elif a is None:
-                continue
             else:
-                try:
-                    raise NotImplementedError
-                    na = cls(a)
-                    newkwargs[k] = na._fpointer
-                    modkwargs[k] = na
-                except:
-                    raise TypeError('Argument %s should be of type %s, but got incompatible type %s' % (k,a,kwarg_lookup[k],type(a)))
-        else:
-            if a is None: continue
-            newkwargs[k] = a
-            modkwargs[k] = None
-
-    # Construct final args_str by merging args_str argument with args_str_kwargs
-    if got_args_str:
-        args_str_final = ''
-        if prefix+'args_str' in newkwargs:
-            if isinstance(newkwargs[prefix+'args_str'], basestring):
-                args_str_final = args_str_final + " " + newkwargs[prefix+'args_str']
-            else:
-                args_str_final = args_str_final + " " + args_str(newkwargs[prefix+'args_str'])
-        if args_str_kwargs != {}:
-            args_str_final = args_str_final + " " + args_str(args_str_kwargs)
-        if args_str_final != '':
-            newkwargs[prefix+'args_str'] = args_str_final
+                newkwargs[k] = a
+
+        # Construct final args_str by merging args_str argument with args_str_kwargs
+        if self.got_args_str:
+            args_str_final = ''
+            if prefix+'args_str' in newkwargs:
+                if isinstance(newkwargs[prefix+'args_str'], basestring):
+                    args_str_final = args_str_final + " " + newkwargs[prefix+'args_str']
+                else:
+                    args_str_final = args_str_final + " " + args_str(newkwargs[prefix+'args_str'])
+            if args_str_kwargs != {}:
+                args_str_final = args_str_final + " " + args_str(args_str_kwargs)
+            if args_str_final != '':
+                newkwargs[prefix+'args_str'] = args_str_final
 
-    return tuple(newargs), tuple(modargs), newkwargs, modkwargs
+        return newargs, newkwargs
 
-def process_results(res, args, kwargs, inargs, outargs, prefix):
-    newres = []
+    def process_results(self, res, args, kwargs):
+        """
+        Update derived type arguments modified by the call and
+        convert the ``intent(out)`` results `res`.
+        """
+        # update any objects in args or kwargs affected by this call
+        n_args = len(args)
+        for i in self.update_inargs:
+            if i < n_args and isinstance(args[i], FortranDerivedType):
+                args[i]._update()
+
+        if kwargs:
+            for k,a in kwargs.iteritems():
+                if (isinstance(a, FortranDerivedType) and
+                    not 'fintent(in)' in self.kwarg_lookup[self.prefix+k]['attributes']):
+                    a._update()
+
+        if res is None:
+            return None
 
-    madeseq = False
-    if res is not None and len(outargs) <= 1:
-        madeseq = True
-        res = (res,)
+        madeseq = False
+        if len(self.outargs) <= 1:
+            madeseq = True
+            res = (res,)
 
-    # intent(out) arguments form result tuple
-    if res is not None:
-        for r, spec in zip(res,outargs):
-            if spec['type'].startswith('type'):
-                newres.append(FortranDerivedTypes[spec['type'].lower()](fpointer=r,finalise=True))
+        # intent(out) arguments form result tuple
+        newres = []
+        for r, out_type in zip(res, self.out_types):
+            if out_type is not None and out_type != 'logical':
+                newres.append(FortranDerivedTypes[out_type](fpointer=r,finalise=True))
             elif isinstance(r, np.ndarray):
                 if get_fortran_indexing():
                     # Convert to one-based FortranArray
                     r = r.view(FortranArray)
                 newres.append(r)
-            elif spec['type'] == 'logical':
+            elif out_type == 'logical':
                 newres.append(r == QUIPPY_TRUE)
             else:
                 newres.append(r)
 
-    # update any objects in args or kwargs affected by this call
-    for arg, spec in zip(args, inargs):
-        if (isinstance(arg, FortranDerivedType) and not 'fintent(in)' in spec['attributes']):
-            arg._update()
-
-    type_lookup = dict([(badnames.get(x['name'].lower(),x['name'].lower()),x) for x in inargs])
-    for k,a in kwargs.iteritems():
-        k = prefix + k
-        if (isinstance(a, FortranDerivedType) and not 'fintent(in)' in type_lookup[k]['attributes']):
-            a._update()
+        if madeseq:
+            return newres[0]
+        else:
+            return tuple(newres)
 
-    if res is None:
-        return None
-    elif madeseq:
-        return newres[0]
-    else:
-        return tuple(newres)
+    def __call__(self, args, kwargs):
+        """
+        Convert the arguments, call the Fortran routine and convert
+        the results.
+        """
+        newargs, newkwargs = self.process_in_args(args, kwargs)
+        res = self.fobj(*newargs, **newkwargs)
+        return self.process_results(res, args, kwargs)
 
 
 class FortranDerivedType(object):
@@ -325,6 +372,7 @@ class FortranDerivedType(object):
     _subobjs = {}
     _arrays = {}
     _interfaces = {}
+    _call_plans = {}
     _elements = {}
     _cmp_skip_fields = []
     _cmp_tol = 1e-8
@@ -544,54 +592,29 @@ class FortranDerivedType(object):
         appropriate subclass of :class:`FortranDerivedType`. Arrays
         are converted to use one-based indexing using
         :class:`~quippy.farray.FortranArray`.
+
+        The argument conversions are carried out by the
+        :class:`CallPlan` for `name` in :attr:`_call_plans`, which is
+        built when the class is wrapped.
         """
-        
+
         if not name.startswith('__init__') and self._fpointer is None:
             raise ValueError('%s object not initialised.' % self.__class__.__name__)
 
-        if not name in self._routines:
-            raise NameError('Unknown fortran routine: %s' % name)
-
-        fobj, doc = self._routines[name]
-
-        #inargs  = filter(lambda x: not 'intent(out)' in x['attributes'], doc['args'])
-        #outargs = filter(lambda x: 'intent(out)' in x['attributes'], doc['args'])
-
-        inargs  = [ x for x in doc['args'] if not 'intent(out)' in x['attributes'] ]
-        outargs = [ x for x in doc['args'] if 'intent(out)' in x['attributes'] ]
-        args_str_args = doc['args_str']
-        
-        if not name.startswith('__init__'):
-            # Put self at beginning of args list
-            args = tuple([self] + list(args))
-        newargs, modargs, newkwargs, modkwargs = process_in_args(args, kwargs, inargs, self._prefix, args_str_args, name)
-
         try:
-            res = fobj(*newargs, **newkwargs)
-        except RuntimeError:
-            raise
-            try:
-                exctype, value, tb = sys.exc_info()
-
-                if is_interactive_shell():
-                    error_str = 'Fortran routine %s(%s):\n %s' % (name, ', '.join(list('%r' % a for a in args) + ['%s=%r' % (k,v) for (k,v) in kwargs.iteritems()]), str(value).strip())
-                else:
-                    # Remove Fortran traceback
-                    error_str = str(value).strip().split('\n')[-1].strip()
-
-                raise exctype, RuntimeError(error_str), tb
-
-            finally:
-                del tb
-        except:
-            raise
+            plan = self._call_plans[name]
+        except KeyError:
+            if not name in self._routines:
+                raise NameError('Unknown fortran routine: %s' % name)
+            fobj, doc = self._routines[name]
+            plan = self._call_plans[name] = CallPlan(fobj, doc, self._prefix, name)
 
-        if not name.startswith('__init__'):
-            newres = process_results(res, args, kwargs, inargs, outargs, self._prefix)
-        else:
-            newres = res
+        if name.startswith('__init__'):
+            newargs, newkwargs = plan.process_in_args(args, kwargs)
+            return plan.fobj(*newargs, **newkwargs)
 
-        return newres
+        # Put self at beginning of args list
+        return plan((self,) + args, kwargs)
 
 
     def _runinterface(self, name, *args, **kwargs):
@@ -847,6 +870,27 @@ def wrap_all(fobj, spec, mods, merge_mods, short_names, prefix, package, modules
 
 
 
+def make_method_interface_doc(intf_doc, intf, routines):
+    doc = '\n'.join(intf_doc) + '\n\n'
+
+    for rname,spec,routine in routines:
+        if spec['args_str']:
+            doc += args_str_table(spec)
+
+    doc += 'Wrapper around Fortran interface ``%s`` containing multiple routines:\n\n' % intf
+
+    for rname,spec,routine in routines:
+        routine_lines = routine.__doc__.split('\n')
+        signature_line = routine_lines[0]
+        if intf == '__init__':
+           signature_line = signature_line.replace('.'+rname,'')
+
+        doc +=        ('   .. function :: %s\n' % signature_line +
+            '\n'.join(['      %s'   % line for line in routine_lines[1:]])) + '\n\n'
+
+    return doc
+
+
 def wrapmod(modobj, moddoc, modname, modfile, short_names, params, prefix, pymodname):
 
     wrapmethod = lambda name: lambda self, *args, **kwargs: self._runroutine(name, *args, **kwargs)
@@ -1006,41 +1050,26 @@ def wrapmod(modobj, moddoc, modname, modfile, short_names, params, prefix, pymod
             if intf in methods:
                 methods['__'+intf] = methods[intf]
 
-            docname = intf
-            if docname.endswith('_'): docname=docname[:-1]
-
-            func = wrapinterface(intf)
-            if intf == '__init__': docname = 'initialise'
-            docname = rev_special_names.get(docname, docname)
-            
-            doc = '\n'.join(moddoc['interfaces'][docname]['doc']) + '\n\n'
-
-            for rname,spec,routine in value:
-                if spec['args_str']:
-                    doc += args_str_table(spec)
-
-            doc += 'Wrapper around Fortran interface ``%s`` containing multiple routines:\n\n' % intf
-
             for rname,spec,routine in value:
                 if rname in methods:
                     methods['_'+rname] = methods[rname]
                     del methods[rname]
 
-                routine_lines = routine.__doc__.split('\n')
-                signature_line = routine_lines[0]
-                if intf == '__init__':
-                   signature_line = signature_line.replace('.'+rname,'')
-                #signature_line = signature_line.replace(rname, intf)
-                
-                doc +=        ('   .. function :: %s\n' % signature_line +
-                    '\n'.join(['      %s'   % line for line in routine_lines[1:]])) + '\n\n'
+            docname = intf
+            if docname.endswith('_'): docname=docname[:-1]
+            if intf == '__init__': docname = 'initialise'
+            docname = rev_special_names.get(docname, docname)
 
             if intf != '__init__':
-                func.__doc__ = doc
+                func = LazyDocFunction(wrapinterface(intf),
+                                       partial(make_method_interface_doc,
+                                               moddoc['interfaces'][docname]['doc'], intf, value))
                 func.__module__ = pymodname
                 methods[intf] = func
             else:
-                constructor = wrapinit(constructor_name, doc)
+                # constructor docstring is needed now for the class docstring
+                constructor = wrapinit(constructor_name,
+                                       make_method_interface_doc(moddoc['interfaces'][docname]['doc'], intf, value))
 
         constructor_doc_lines = constructor.__doc__.split('\n')
         constructor_doc_lines.append('Class is wrapper around Fortran type ``%s`` defined in file :git:`%s`.\n' % (cls, modfile))
@@ -1058,6 +1087,8 @@ def wrapmod(modobj, moddoc, modname, modfile, short_names, params, prefix, pymod
                                '_subobjs': {},
                                '_arrays': {},
                                '_interfaces': _interfaces,
+                               '_call_plans': dict((name, CallPlan(fobj, doc, prefix, name))
+                                                   for (name, (fobj, doc)) in _routines.iteritems()),
                                '_elements': {},
                                })
         FortranDerivedTypes['type(%s)' % cls.lower()] = new_cls
@@ -1387,13 +1418,56 @@ def process_docstring(doc):
     return doc
 
 
+class LazyDocFunction(object):
+    # Callable wrapper around the function `func`, whose docstring is
+    # generated by calling `make_doc()` when it is first needed rather
+    # than when the routine is wrapped. Binds as a method when stored
+    # as a class attribute, like an ordinary function. (The class
+    # docstring is replaced by the __doc__ property below.)
+
+    def __init__(self, func, make_doc):
+        self.func = func
+        self.make_doc = make_doc
+        self._doc = None
+        self.__name__ = func.__name__
+        self.__module__ = func.__module__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return MethodType(self, obj, objtype)
+
+    def _get_doc(self):
+        if self.make_doc is not None:
+            self._doc = self.make_doc()
+            self.make_doc = None
+        return self._doc
+
+    def _set_doc(self, doc):
+        self._doc = doc
+        self.make_doc = None
+
+    __doc__ = property(_get_doc, _set_doc)
+
+
 def add_doc(func, fobj, doc, fullname, name, prefix, format='numpydoc', skip_this=False, modfile=None):
+    """
+    Return a :class:`LazyDocFunction` wrapping `func`, with a docstring
+    generated by :func:`make_doc` on first access.
+    """
     func.__name__ = fullname
+    func = LazyDocFunction(func, partial(make_doc, fobj, doc, fullname, name, prefix,
+                                         format, skip_this, modfile))
     func._fobj = fobj
+    return func
 
+
+def make_doc(fobj, doc, fullname, name, prefix, format='numpydoc', skip_this=False, modfile=None):
     if doc is None:
-        func.__doc__ = None
-        return func
+        return None
 
     if format not in ['numpydoc', 'sphinx']:
         raise ValueError('Unsuported format %s' % format)
@@ -1494,8 +1568,7 @@ def add_doc(func, fobj, doc, fullname, name, prefix, format='numpydoc', skip_thi
 
     final_doc += ref_header + '\nRoutine is wrapper around Fortran routine ``%s`` defined in file :git:`%s`.' % (fullname, modfile)        
             
-    func.__doc__ = final_doc
-    return func
+    return final_doc
 
 
 def args_str_table(spec):
@@ -1563,15 +1636,10 @@ def wraproutine(modobj, moddoc, name, shortname, prefix, skip_this=False, modfil
     doc = moddoc['routines'][name]
     fobj = getattr(modobj, prefix+name)
 
-    inargs  = [ x for x in doc['args'] if not 'intent(out)' in x['attributes'] ]
-    outargs = [ x for x in doc['args'] if 'intent(out)' in x['attributes'] ]
-    args_str_args = doc['args_str']
-
-    #inargs  = filter(lambda x: not 'intent(out)' in x['attributes'], doc['args'])
-    #outargs = filter(lambda x: 'intent(out)' in x['attributes'], doc['args'])
+    plan = CallPlan(fobj, doc, prefix, name)
 
     def func(*args, **kwargs):
-        newargs, modargs, newkwargs, modkwargs = process_in_args(args, kwargs, inargs, prefix, args_str_args, name)
+        newargs, newkwargs = plan.process_in_args(args, kwargs)
 
         try:
             res = fobj(*newargs, **newkwargs)
@@ -1592,9 +1660,7 @@ def wraproutine(modobj, moddoc, name, shortname, prefix, skip_this=False, modfil
         except:
             raise
 
-        newres = process_results(res, args, kwargs, inargs, outargs, prefix)
-
-        return newres
+        return plan.process_results(res, args, kwargs)
 
     return add_doc(func, fobj, doc, name, shortname, prefix,
                    format='numpydoc', skip_this=skip_this, modfile=modfile)
@@ -1676,27 +1742,22 @@ def wrapinterface(name, intf_spec, routines, prefix, modfile=None):
         raise TypeError('No matching routine found in interface %s' % name)
 
 
-    doc = '\n'.join(intf_spec['doc']) + '\n\n'
+    def make_interface_doc():
+        doc = '\n'.join(intf_spec['doc']) + '\n\n'
 
-    doc += 'Routine is wrapper around Fortran interface ``%s`` containing multiple routines:\n\n' % name
-    
-    for rname, spec, routine, modfile in routines:
+        doc += 'Routine is wrapper around Fortran interface ``%s`` containing multiple routines:\n\n' % name
 
-        # regenerate routine documentation, using sphinx format rather than numpydoc format
-        tmp_routine = add_doc(routine, routine._fobj, spec, rname, name, prefix, format='sphinx', modfile=modfile)
+        for rname, spec, routine, modfile in routines:
 
-        
-        routine_lines = tmp_routine.__doc__.split('\n')
+            # regenerate routine documentation, using sphinx format rather than numpydoc format
+            routine_lines = make_doc(routine._fobj, spec, rname, name, prefix, format='sphinx', modfile=modfile).split('\n')
 
-        doc +=        ('  .. function :: %s\n' % routine_lines[0] +
-            '\n'.join(['     %s'   % line for line in routine_lines[1:]])) + '\n'
+            doc +=        ('  .. function :: %s\n' % routine_lines[0] +
+                '\n'.join(['     %s'   % line for line in routine_lines[1:]])) + '\n'
 
-        #doc = doc.replace("``%s``"%rname,"``%s``"%rname.upper())
-        #doc = doc.replace(rname,name)
-        #doc = doc.replace("``%s``"%rname.upper(),"``%s``"%rname)
+        return doc
 
-    func.__doc__ = doc
-    return func
+    return LazyDocFunction(func, make_interface_doc)
 
 
 def update_doc_string(doc, extra, sections=None, signature=None):
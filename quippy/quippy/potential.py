@@ -17,6 +17,7 @@
 # HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
 
 import logging
+import multiprocessing
 import weakref
 from math import sqrt
 
@@ -28,6 +29,7 @@ from quippy import get_fortran_indexing
 from quippy.clusters import HYBRID_NO_MARK, HYBRID_ACTIVE_MARK
 from quippy.oo_fortran import update_doc_string
 from quippy.atoms import Atoms
+from quippy.io import AtomsReader
 from quippy.util import quip_xml_parameters, dict_to_args_str
 from quippy.elasticity import stress_matrix
 from quippy.farray import farray, frange, fzeros
@@ -113,6 +115,27 @@ the `calculator` argument to the :class:`Potential` constructor, e.g.::
 with `atoms` to the new :class:`Potential` instance, by calling
 :meth:'.Atoms.set_calculator`.
 
+`cutoff_skin`, if given, is copied to the :attr:`~.Atoms.cutoff_skin`
+attribute of each :class:`~.Atoms` object passed to :meth:`calculate`.
+The neighbour list is then built with cutoff ``cutoff + cutoff_skin``
+and fully rebuilt only once some atom has moved by more than
+``cutoff_skin/2``; on other steps only the stored distances are
+updated. When the atoms are not a :class:`quippy.atoms.Atoms`
+instance, the copy made for the calculation is kept and updated in
+place on subsequent calls so that its neighbour list can be reused.
+:meth:`connect_info` reports how many rebuilds and reuses there have
+been.
+
+If `zero_copy` is true, :meth:`calculate` passes preallocated
+output buffers held by the :class:`Potential` directly to
+:meth:`calc`, and the ``energies`` and ``forces`` results (e.g. from
+:meth:`get_forces`) are views into these buffers rather than
+copies. The buffers are overwritten by the next calculation, so
+callers must copy results they want to keep. Only the ``energy``,
+``energies``, ``forces``, ``stress`` and ``stresses`` properties use
+the buffers; other properties, and any extra outputs left in
+:attr:`.Atoms.arrays` or :attr:`.Atoms.info`, are handled as usual.
+
 .. note::
 
     QUIP potentials do not compute stress and per-atom stresses
@@ -128,7 +151,7 @@ with `atoms` to the new :class:`Potential` instance, by calling
     array in :attr:`.Atoms.arrays` containing volumes for each atom.
 
 """,
-    signature='Potential(init_args[, pot1, pot2, param_str, param_filename, bulk_scale, mpi_obj, callback, calculator, atoms, calculation_always_required])')
+    signature='Potential(init_args[, pot1, pot2, param_str, param_filename, bulk_scale, mpi_obj, callback, calculator, atoms, calculation_always_required, cutoff_skin, zero_copy])')
 
     callback_map = {}
 
@@ -139,13 +162,19 @@ with `atoms` to the new :class:`Potential` instance, by calling
     def __init__(self, init_args=None, pot1=None, pot2=None, param_str=None,
                  param_filename=None, bulk_scale=None, mpi_obj=None,
                  callback=None, calculator=None, atoms=None,
-                 calculation_always_required=False,
-                 fpointer=None, finalise=True,
+                 calculation_always_required=False, cutoff_skin=None,
+                 zero_copy=False, fpointer=None, finalise=True,
                  error=None, **kwargs):
 
         self._calc_args = {}
         self._default_properties = []
         self.calculation_always_required = calculation_always_required
+        self.cutoff_skin = cutoff_skin
+        self._persistent_atoms = None
+        self._persistent_keys = None
+        self.zero_copy = zero_copy
+        self._buffers = None
+        self._calc_many_buffers = None
         Calculator.__init__(self, atoms=atoms)
 
         if callback is not None or calculator is not None:
@@ -262,6 +291,137 @@ with `atoms` to the new :class:`Potential` instance, by calling
           default arguments.""")
 
 
+    calc_many_properties = ['energy', 'force', 'virial', 'local_energy', 'local_virial']
+
+    def calc_many(self, configs, properties=None, nprocs=1, chunksize=None,
+                  args_str=None, **kwargs):
+        """
+        Evaluate this :class:`Potential` for each of a sequence of
+        configurations, returning the results as stacked arrays.
+
+        `configs` can be a list of :class:`~.Atoms` (or ASE Atoms)
+        objects, an :class:`~quippy.io.AtomsReader` or
+        :class:`~quippy.io.AtomsList`, or any other iterable of
+        configurations. `properties` is a list of QUIP output names
+        chosen from ``energy``, ``force``, ``virial``, ``local_energy``
+        and ``local_virial``, defaulting to ``['energy', 'force']``.
+
+        The calc args string is built once from :meth:`get_calc_args_str`,
+        any keyword arguments and `args_str`, as for :meth:`calc`, and the
+        output arrays are allocated once and reused for consecutive
+        configurations with the same number of atoms.
+
+        If `nprocs` is greater than one (or None, meaning one process per
+        CPU), configurations are evaluated in a pool of `nprocs` worker
+        processes, in chunks of `chunksize` configurations. The workers
+        are forked from this process and use this :class:`Potential`
+        directly, so it is not pickled. When `configs` is an
+        :class:`~quippy.io.AtomsReader` on a random access file, each
+        worker reads its own frames as for :meth:`.AtomsReader.map`;
+        otherwise configurations are pickled and sent to the workers.
+
+        Returns a dictionary with an ``n_atoms`` array giving the number
+        of atoms in each configuration and an array for each of the
+        requested `properties`:
+
+        ================  =================================
+        Key               Shape
+        ================  =================================
+        ``n_atoms``       ``(n_configs,)``
+        ``energy``        ``(n_configs,)``
+        ``virial``        ``(n_configs, 3, 3)``
+        ``force``         ``(sum(n_atoms), 3)``
+        ``local_energy``  ``(sum(n_atoms),)``
+        ``local_virial``  ``(sum(n_atoms), 9)``
+        ================  =================================
+
+        Per-atom results for all configurations are concatenated along
+        the first axis, like ASE arrays, and can be split by configuration
+        with ``np.split(force, np.cumsum(n_atoms)[:-1])``.
+        """
+        global _calc_many_state
+
+        if properties is None:
+            properties = ['energy', 'force']
+        for name in properties:
+            if name not in Potential.calc_many_properties:
+                raise ValueError('Unknown property "%s" for calc_many(), should be one of %s' %
+                                 (name, ', '.join(Potential.calc_many_properties)))
+
+        if not isinstance(args_str, basestring):
+            args_str = dict_to_args_str(args_str)
+        args_str = ' '.join((self.get_calc_args_str(), dict_to_args_str(kwargs), args_str))
+
+        if nprocs is None:
+            nprocs = multiprocessing.cpu_count()
+
+        self._calc_many_buffers = None
+        _calc_many_state = (self, properties, args_str)
+        try:
+            if nprocs == 1:
+                results = [_calc_many_config(at) for at in configs]
+            elif isinstance(configs, AtomsReader):
+                results = configs.map(_calc_many_config, nprocs=nprocs, chunksize=chunksize)
+            else:
+                configs = list(configs)
+                if chunksize is None:
+                    chunksize = max(1, len(configs)//(4*nprocs))
+                pool = multiprocessing.Pool(nprocs)
+                try:
+                    results = pool.map(_calc_many_config, configs, chunksize)
+                finally:
+                    pool.close()
+                    pool.join()
+        finally:
+            _calc_many_state = None
+            self._calc_many_buffers = None
+
+        stacked = {'n_atoms': np.array([n for (n, values) in results], dtype=int)}
+        for i, name in enumerate(properties):
+            values = [config_values[i] for (n, config_values) in results]
+            if name in ('energy', 'virial'):
+                stacked[name] = np.array(values)
+            elif values:
+                stacked[name] = np.concatenate(values)
+            else:
+                stacked[name] = np.zeros({'force': (0, 3),
+                                          'local_energy': (0,),
+                                          'local_virial': (0, 9)}[name])
+        return stacked
+
+
+    def _calc_config(self, at, properties, args_str):
+        # Evaluate `properties` for a single configuration for calc_many(),
+        # reusing the output buffers while the number of atoms is unchanged.
+        # Returns number of atoms and a list of results in ASE array layout.
+        if not isinstance(at, Atoms):
+            at = Atoms(at)
+        n = len(at)
+        buffers = self._calc_many_buffers
+        if buffers is None or buffers['local_energy'].shape != (n,):
+            buffers = {'energy':       farray(0.0),
+                       'force':        fzeros((3, n)),
+                       'virial':       fzeros((3, 3)),
+                       'local_energy': fzeros(n),
+                       'local_virial': fzeros((9, n))}
+            self._calc_many_buffers = buffers
+
+        outputs = [buffers[name] if name in properties else None
+                   for name in Potential.calc_many_properties]
+        _potential.Potential.calc(self, at, *(outputs + [args_str]))
+
+        values = []
+        for name in properties:
+            value = buffers[name].view(np.ndarray)
+            if name == 'energy':
+                values.append(float(value))
+            elif name in ('force', 'local_virial'):
+                values.append(value.T.copy())
+            else:
+                values.append(value.copy())
+        return (n, values)
+
+
     @staticmethod
     def callback(at_ptr):
         from quippy import Atoms
@@ -317,10 +477,9 @@ with `atoms` to the new :class:`Potential` instance, by calling
         if isinstance(atoms, Atoms):
             self.quippy_atoms = weakref.proxy(atoms)
         else:
-            potlog.debug('Potential atoms is not quippy.Atoms instance, copy forced!')
-            self.quippy_atoms = Atoms(atoms)
-        initial_arrays = self.quippy_atoms.arrays.keys()
-        initial_info = self.quippy_atoms.info.keys()
+            self.quippy_atoms = self._get_persistent_atoms(atoms)
+        if self.cutoff_skin is not None and self.quippy_atoms.cutoff_skin != self.cutoff_skin:
+            self.quippy_atoms.cutoff_skin = self.cutoff_skin
 
         if properties is None:
             properties = ['energy', 'forces', 'stress']
@@ -334,6 +493,13 @@ with `atoms` to the new :class:`Potential` instance, by calling
         if not self.calculation_required(atoms, properties):
             return
 
+        if self.zero_copy and properties.issubset(self.zero_copy_properties):
+            self._calculate_zero_copy(properties)
+            return
+
+        initial_arrays = self.quippy_atoms.arrays.keys()
+        initial_info = self.quippy_atoms.info.keys()
+
         args_map = {
             'energy':          {'energy': None},
             'energies':        {'local_energy': None},
@@ -374,16 +540,9 @@ with `atoms` to the new :class:`Potential` instance, by calling
         if 'numeric_forces' in properties:
             self.results['numeric_forces'] = self.quippy_atoms.numeric_force.copy().view(np.ndarray).T
         if 'stress' in properties:
-            stress = -self.quippy_atoms.virial.copy().view(np.ndarray)/self.quippy_atoms.get_volume()
-            # convert to 6-element array in Voigt order
-            self.results['stress'] = np.array([stress[0, 0], stress[1, 1], stress[2, 2],
-                                               stress[1, 2], stress[0, 2], stress[0, 1]])
+            self.results['stress'] = self._virial_to_stress(self.quippy_atoms.virial)
         if 'stresses' in properties:
-            lv = np.array(self.quippy_atoms.local_virial) # make a copy
-            vol_per_atom = self.get('vol_per_atom', self.quippy_atoms.get_volume()/len(atoms))
-            if isinstance(vol_per_atom, basestring):
-                vol_per_atom = self.quippy_atoms.arrays[vol_per_atom]
-            self.results['stresses'] = -lv.T.reshape((len(atoms), 3, 3), order='F')/vol_per_atom
+            self.results['stresses'] = self._local_virial_to_stresses(self.quippy_atoms.local_virial)
 
         if 'elastic_constants' in properties:
             cij_dx = self.get('cij_dx', 1e-2)
@@ -467,6 +626,133 @@ with `atoms` to the new :class:`Potential` instance, by calling
         return self.get_property('unrelaxed_elastic_constants', atoms)
 
 
+    zero_copy_properties = set(['energy', 'energies', 'forces', 'stress', 'stresses'])
+
+    def _calculate_zero_copy(self, properties):
+        # Calculate `properties` directly into the preallocated output
+        # buffers, and store views of them in self.results
+        at = self.quippy_atoms
+        if self._buffers is None or self._buffers['local_energy'].shape != (len(at),):
+            self._buffers = {'energy':       farray(0.0),
+                             'force':        fzeros((3, len(at))),
+                             'virial':       fzeros((3, 3)),
+                             'local_energy': fzeros(len(at)),
+                             'local_virial': fzeros((9, len(at)))}
+        buffers = self._buffers
+
+        calc_args = {}
+        if 'energy' in properties:
+            calc_args['energy'] = buffers['energy']
+        if 'energies' in properties:
+            calc_args['local_energy'] = buffers['local_energy']
+        if 'forces' in properties:
+            calc_args['force'] = buffers['force']
+        if 'stress' in properties:
+            calc_args['virial'] = buffers['virial']
+        if 'stresses' in properties:
+            calc_args['local_virial'] = buffers['local_virial']
+        self.calc(at, **calc_args)
+
+        if 'energy' in properties:
+            self.results['energy'] = float(buffers['energy'])
+        if 'energies' in properties:
+            self.results['energies'] = buffers['local_energy'].view(np.ndarray)
+        if 'forces' in properties:
+            self.results['forces'] = buffers['force'].view(np.ndarray).T
+        if 'stress' in properties:
+            self.results['stress'] = self._virial_to_stress(buffers['virial'])
+        if 'stresses' in properties:
+            self.results['stresses'] = self._local_virial_to_stresses(buffers['local_virial'])
+
+
+    def _virial_to_stress(self, virial):
+        # convert to 6-element array in Voigt order
+        stress = -virial.view(np.ndarray)/self.quippy_atoms.get_volume()
+        return np.array([stress[0, 0], stress[1, 1], stress[2, 2],
+                         stress[1, 2], stress[0, 2], stress[0, 1]])
+
+
+    def _local_virial_to_stresses(self, local_virial):
+        n = len(self.quippy_atoms)
+        lv = local_virial.view(np.ndarray)
+        vol_per_atom = self.get('vol_per_atom', self.quippy_atoms.get_volume()/n)
+        if isinstance(vol_per_atom, basestring):
+            vol_per_atom = self.quippy_atoms.arrays[vol_per_atom]
+        return -lv.T.reshape((n, 3, 3), order='F')/vol_per_atom
+
+
+    def get_property(self, name, atoms=None, allow_calculation=True):
+        if not self.zero_copy:
+            return Calculator.get_property(self, name, atoms, allow_calculation)
+
+        # as Calculator.get_property(), but without copying array results
+        if atoms is None:
+            atoms = self.atoms
+            system_changes = []
+        else:
+            system_changes = self.check_state(atoms)
+            if system_changes:
+                self.reset()
+        if name not in self.results:
+            if not allow_calculation:
+                return None
+            self.calculate(atoms, [name], system_changes)
+        return self.results[name]
+
+
+    def _get_persistent_atoms(self, atoms):
+        # Return a quippy copy of `atoms`, which is not a quippy Atoms. The
+        # copy made on the previous call is updated in place if only
+        # positions, cell and the values of existing arrays and info
+        # entries have changed, so its neighbour list is kept.
+        at = self._persistent_atoms
+        if (at is None or len(at) != len(atoms) or
+            (at.get_atomic_numbers() != atoms.get_atomic_numbers()).any() or
+            (at.get_pbc() != atoms.get_pbc()).any() or
+            not set(atoms.arrays.keys()).issubset(self._persistent_keys[0]) or
+            not set(atoms.info.keys()).issubset(self._persistent_keys[1])):
+            potlog.debug('Potential atoms is not quippy.Atoms instance, copy forced!')
+            at = Atoms(atoms)
+            self._persistent_atoms = at
+            self._persistent_keys = (set(at.arrays.keys()), set(at.info.keys()))
+            return at
+
+        # discard results of the previous calculation
+        array_keys, info_keys = self._persistent_keys
+        for key in at.arrays.keys():
+            if key not in array_keys:
+                del at.arrays[key]
+        for key in at.info.keys():
+            if key not in info_keys:
+                del at.info[key]
+
+        if (at.get_cell() != atoms.get_cell()).any():
+            at.set_lattice(atoms.get_cell().T, scale_positions=False)
+        for key, value in atoms.arrays.iteritems():
+            if key != 'numbers':
+                at.arrays[key][...] = value
+        for key, value in atoms.info.iteritems():
+            at.info[key] = value
+        return at
+
+
+    def connect_info(self):
+        """
+        Return a dictionary describing neighbour list reuse for the
+        :class:`~.Atoms` used in the most recent :meth:`calculate`, with
+        keys ``rebuilds`` (number of full neighbour list rebuilds),
+        ``reuses`` (number of steps where only distances were updated)
+        and ``cutoff_skin``.
+        """
+        try:
+            at = self.quippy_atoms
+            return {'rebuilds': int(at.connect.n_rebuilds),
+                    'reuses': int(at.connect.n_reuses),
+                    'cutoff_skin': float(at.cutoff_skin)}
+        except (AttributeError, ReferenceError):
+            return {'rebuilds': 0, 'reuses': 0, 'cutoff_skin': self.cutoff_skin}
+
+
     def get_default_properties(self):
         "Get the list of properties to be calculated by default"
         return self._default_properties[:]
@@ -524,6 +810,16 @@ with `atoms` to the new :class:`Potential` instance, by calling
         return dict_to_args_str(self._calc_args)
 
 
+# Potential, properties and args_str used by calc_many(), inherited by
+# worker processes when they are forked
+_calc_many_state = None
+
+def _calc_many_config(at):
+    if _calc_many_state is None:
+        raise RuntimeError('Potential.calc_many() worker process has no Potential')
+    pot, properties, args_str = _calc_many_state
+    return pot._calc_config(at, properties, args_str)
+
 from quippy import FortranDerivedTypes
 FortranDerivedTypes['type(potential)'] = Potential
 
@@ -0,0 +1,417 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+"""
+Binary trajectory format with typed columns and a frame offset index.
+
+A ``.qtraj`` file stores a sequence of frames, each of which may have
+a different number of atoms. Every property and parameter is stored
+as a typed, contiguous little-endian array tagged with its
+:class:`~quippy.dictionary.Dictionary` type code (``T_REAL_A2``,
+``T_INTEGER_A``, ...), so frames can be read back without any text
+parsing. Data blocks are aligned to 8 bytes, so :class:`QTrajReader`
+can return them as views into a memory-mapped file.
+
+The layout is::
+
+   header   'QTRAJ001'
+   frame    'FRAM', padding, int64 n_atoms, int32 n_properties, int32 n_params, float64 lattice[3,3]
+            entry * (n_properties + n_params)
+   ...
+   index    int64 offset[n_frames], int64 n_frames, int64 index_offset, 'QTRJIDX1'
+
+and each entry is::
+
+   uint16 name_len, name, int32 type, int32 ndim, int64 shape[ndim], padding, data
+
+Per-atom properties are stored with shape ``(n_atoms, n_cols)``, i.e.
+the transpose of the corresponding :class:`~quippy.atoms.Atoms`
+attribute. The offset index at the end of the file gives O(1) random
+access to any frame. When frames are appended, the index is
+overwritten by the new frames and then rewritten at the new end of the
+file when the writer is closed. If the index is missing or does not
+match the file, e.g. because a writer was never closed, the frame
+offsets are recovered by scanning the frame headers, and any partially
+written frame at the end is ignored.
+"""
+
+import os, struct, mmap, warnings
+import numpy as np
+
+from quippy.io import AtomsReaders, AtomsWriters
+from quippy.farray import farray
+from quippy.dictionary import (T_INTEGER, T_REAL, T_CHAR, T_LOGICAL,
+                               T_INTEGER_A, T_REAL_A, T_CHAR_A,
+                               T_LOGICAL_A, T_INTEGER_A2, T_REAL_A2)
+
+__all__ = ['QTrajReader', 'QTrajWriter']
+
+QTRAJ_MAGIC = 'QTRAJ001'
+QTRAJ_FRAME_MAGIC = 'FRAM'
+QTRAJ_INDEX_MAGIC = 'QTRJIDX1'
+
+_frame_header = struct.Struct('<4s4xqii')
+_index_trailer = struct.Struct('<qq8s')
+
+type_to_dtype = {T_INTEGER:    '<i4',
+                 T_REAL:       '<f8',
+                 T_LOGICAL:    '<i4',
+                 T_CHAR:       'S1',
+                 T_INTEGER_A:  '<i4',
+                 T_REAL_A:     '<f8',
+                 T_LOGICAL_A:  '<i4',
+                 T_CHAR_A:     'S1',
+                 T_INTEGER_A2: '<i4',
+                 T_REAL_A2:    '<f8'}
+
+def _pad8(n):
+    return -n % 8
+
+def _entry(name, ptype, value):
+    # Encode one property or parameter, assuming the entry starts at an 8 byte boundary
+    value = np.ascontiguousarray(value, dtype=type_to_dtype[ptype])
+    header = struct.pack('<H', len(name)) + name + struct.pack('<ii', ptype, value.ndim)
+    header += struct.pack('<%dq' % value.ndim, *value.shape)
+    header += '\0'*_pad8(len(header))
+    data = value.tostring()
+    return header + data + '\0'*_pad8(len(data))
+
+
+class QTrajWriter(object):
+    """
+    Write :class:`~quippy.atoms.Atoms` objects to a ``.qtraj`` binary
+    trajectory file `dest`. If `append` is true and `dest` already
+    exists, new frames are added after the existing ones.
+
+    The frame offset index is written when the file is closed. Frames
+    in a file which was not closed can still be read, but finding them
+    requires a scan through the whole file.
+    """
+
+    def __init__(self, dest, append=False, format=None):
+        self.dest = dest
+        if append and os.path.exists(dest) and os.path.getsize(dest) > 0:
+            self.offsets, index_offset = _read_index(dest)
+            self.file = open(dest, 'r+b')
+            self.file.seek(index_offset)
+            self.file.truncate()
+        else:
+            self.offsets = []
+            self.file = open(dest, 'wb')
+            self.file.write(QTRAJ_MAGIC)
+
+    def write(self, at, properties=None, **kwargs):
+        """
+        Write `at` as a new frame. If `properties` is given, only those
+        properties are written.
+        """
+        entries = []
+        if properties is None:
+            properties = at.properties.keys()
+        for name in properties:
+            ptype, s1, (s2, s3) = at.properties.get_type_and_size(name)
+            value = getattr(at, name.lower())
+            if ptype == T_CHAR_A:
+                value = np.asarray(value).T
+            elif ptype == T_LOGICAL_A:
+                value = np.asarray(value).astype(np.int32)
+            elif ptype in (T_INTEGER_A, T_REAL_A, T_INTEGER_A2, T_REAL_A2):
+                value = np.asarray(value).T
+            else:
+                raise TypeError('bad property type %d' % ptype)
+            entries.append(_entry(name, ptype, value))
+
+        params = at.params.copy()
+        params['nneightol'] = at.nneightol
+        params['cutoff'] = at.cutoff
+        params['pbc'] = at.pbc
+        for name in params.keys():
+            ptype = params.get_type_and_size(name)[0]
+            value = params[name]
+            if ptype not in type_to_dtype or ptype == T_CHAR_A:
+                raise TypeError('bad parameter type %d for %s' % (ptype, name))
+            if ptype == T_CHAR:
+                value = np.array(list(value), dtype='S1')
+            elif ptype in (T_LOGICAL, T_LOGICAL_A):
+                value = np.asarray(value).astype(np.int32)
+            else:
+                value = np.asarray(value)
+            entries.append(_entry(name, ptype, value))
+
+        self.offsets.append(self.file.tell())
+        self.file.write(_frame_header.pack(QTRAJ_FRAME_MAGIC, at.n, len(properties), len(params)))
+        self.file.write(np.ascontiguousarray(np.asarray(at.lattice), dtype='<f8').tostring())
+        self.file.write(''.join(entries))
+
+    def close(self):
+        """
+        Write the frame offset index and close the file
+        """
+        if getattr(self, 'file', None) is None:
+            return
+        index_offset = self.file.tell()
+        self.file.write(np.array(self.offsets, dtype='<i8').tostring())
+        self.file.write(_index_trailer.pack(len(self.offsets), index_offset, QTRAJ_INDEX_MAGIC))
+        self.file.close()
+        self.file = None
+
+    def __del__(self):
+        self.close()
+
+
+def _read_index(filename):
+    # Return (offsets, index_offset) from the index at the end of `filename`,
+    # or by scanning the frames if the index is missing or inconsistent.
+    # index_offset is where the next frame should be written.
+    f = open(filename, 'rb')
+    try:
+        if f.read(len(QTRAJ_MAGIC)) != QTRAJ_MAGIC:
+            raise IOError('%s is not a qtraj file' % filename)
+        size = os.fstat(f.fileno()).st_size
+        offsets = None
+        if size >= len(QTRAJ_MAGIC) + _index_trailer.size:
+            f.seek(-_index_trailer.size, os.SEEK_END)
+            n_frames, index_offset, magic = _index_trailer.unpack(f.read(_index_trailer.size))
+            if (magic == QTRAJ_INDEX_MAGIC and n_frames >= 0 and
+                index_offset + 8*n_frames + _index_trailer.size == size):
+                f.seek(index_offset)
+                offsets = list(np.fromstring(f.read(8*n_frames), dtype='<i8'))
+                if offsets and (offsets[0] != len(QTRAJ_MAGIC) or max(offsets) >= index_offset or
+                                not _is_frame_start(f, offsets[-1])):
+                    offsets = None
+        if offsets is None:
+            warnings.warn('%s has no valid frame index, recovering frames by scanning the file' % filename)
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                offsets, index_offset = _scan_frames(buf)
+            finally:
+                buf.close()
+    finally:
+        f.close()
+    return offsets, index_offset
+
+
+def _is_frame_start(f, offset):
+    f.seek(offset)
+    return f.read(len(QTRAJ_FRAME_MAGIC)) == QTRAJ_FRAME_MAGIC
+
+
+def _scan_frames(buf):
+    # Return (offsets, end) for the complete frames in `buf`, following the
+    # frame headers from the start of the file until something else is found
+    offsets = []
+    offset = len(QTRAJ_MAGIC)
+    while offset + _frame_header.size <= len(buf):
+        try:
+            end = QTrajFrame(buf, offset).end
+        except (IOError, ValueError, KeyError, struct.error):
+            break
+        if end > len(buf):
+            break
+        offsets.append(offset)
+        offset = end
+    return offsets, offset
+
+
+class QTrajFrame(object):
+    # Directory of the entries in one frame of a memory-mapped qtraj file
+
+    def __init__(self, buf, offset):
+        magic, self.n, n_properties, n_params = _frame_header.unpack_from(buf, offset)
+        if magic != QTRAJ_FRAME_MAGIC:
+            raise IOError('Corrupt qtraj frame at offset %d' % offset)
+        offset += _frame_header.size
+        self.lattice = np.frombuffer(buf, dtype='<f8', count=9, offset=offset).reshape(3,3)
+        offset += 72
+
+        self.properties = []
+        self.params = []
+        for i in range(n_properties + n_params):
+            entry_start = offset
+            (name_len,) = struct.unpack_from('<H', buf, offset)
+            offset += 2
+            name = buf[offset:offset+name_len]
+            offset += name_len
+            ptype, ndim = struct.unpack_from('<ii', buf, offset)
+            offset += 8
+            if ptype not in type_to_dtype or ndim < 0 or ndim > 2:
+                raise IOError('Corrupt qtraj entry at offset %d' % entry_start)
+            shape = struct.unpack_from('<%dq' % ndim, buf, offset)
+            offset += 8*ndim
+            if min(shape + (0,)) < 0:
+                raise IOError('Corrupt qtraj entry at offset %d' % entry_start)
+            offset += _pad8(offset - entry_start)
+            dtype = np.dtype(type_to_dtype[ptype])
+            count = int(np.prod(shape))
+            entry = (name, ptype, shape, dtype, count, offset)
+            if i < n_properties:
+                self.properties.append(entry)
+            else:
+                self.params.append(entry)
+            nbytes = count*dtype.itemsize
+            offset += nbytes + _pad8(nbytes)
+        self.end = offset
+
+    def find(self, entries, name):
+        for entry in entries:
+            if entry[0].lower() == name.lower():
+                return entry
+        raise KeyError(name)
+
+
+def _entry_view(buf, entry):
+    # Read-only view of the data for `entry` in `buf`
+    name, ptype, shape, dtype, count, offset = entry
+    return np.frombuffer(buf, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+
+class QTrajReader(object):
+    """
+    Random access reader for ``.qtraj`` binary trajectory files.
+
+    The file is memory mapped, and indexing or iterating returns
+    :class:`~quippy.atoms.Atoms` objects. :meth:`get_array` and
+    :meth:`get_param` return a single property or parameter from many
+    frames without constructing :class:`~quippy.atoms.Atoms` objects.
+
+    `frame`, or `start`, `stop` and `step`, select a subset of the
+    frames in the file; frame indices passed to the reader are then
+    relative to this selection.
+    """
+
+    def __init__(self, source, frame=None, start=0, stop=None, step=1, format=None):
+        self.offsets, index_offset = _read_index(source)
+        self.file = open(source, 'rb')
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._frames = {}
+
+        if frame is not None:
+            if frame < 0: frame = frame + len(self.offsets)
+            start = frame
+            stop = frame+1
+            step = 1
+        self.frames = range(*slice(start, stop, step).indices(len(self.offsets)))
+        if frame is not None and not self.frames:
+            raise IndexError('frame %d out of range 0..%d' % (frame, len(self.offsets)))
+
+    def __len__(self):
+        return len(self.frames)
+
+    def _frame(self, frame):
+        if frame < 0: frame = frame + len(self)
+        if frame < 0 or frame >= len(self):
+            raise IndexError('frame %d out of range 0..%d' % (frame, len(self)))
+        frame = self.frames[frame]
+        if frame not in self._frames:
+            self._frames[frame] = QTrajFrame(self.buf, self.offsets[frame])
+        return self._frames[frame]
+
+    def __getitem__(self, frame):
+        if isinstance(frame, slice):
+            return [self[f] for f in range(*frame.indices(len(self)))]
+
+        from quippy.atoms import Atoms
+
+        f = self._frame(frame)
+        at = Atoms(n=f.n, lattice=farray(f.lattice), properties={}, params={})
+        for entry in f.properties:
+            name, ptype = entry[:2]
+            value = _entry_view(self.buf, entry)
+            if ptype == T_CHAR_A:
+                value = value.view('S%d' % value.shape[1]).reshape(f.n)
+                at.add_property(name, value, overwrite=True)
+            else:
+                at.add_property(name, value.T, property_type=ptype, overwrite=True)
+
+        for entry in f.params:
+            name, ptype = entry[:2]
+            value = _param_value(_entry_view(self.buf, entry), ptype)
+            if name == 'cutoff':
+                at.cutoff = value
+            elif name == 'nneightol':
+                at.nneightol = value
+            elif name == 'pbc':
+                at.pbc = value
+            else:
+                at.params[name] = value
+        return at
+
+    def __iter__(self):
+        for frame in range(len(self)):
+            yield self[frame]
+
+    def get_array(self, name, frames=None):
+        """
+        Return per-atom property `name` from all frames, or from the
+        list of frame indices `frames` (relative to the selection), as
+        an array of shape ``(n_frames, n_atoms, n_cols)`` or
+        ``(n_frames, n_atoms)``.
+        """
+        if frames is None:
+            frames = range(len(self))
+        values = []
+        for frame in frames:
+            f = self._frame(frame)
+            try:
+                values.append(_entry_view(self.buf, f.find(f.properties, name)))
+            except KeyError:
+                raise KeyError('Property %r not found in frame %d' % (name, frame))
+        if len(set([value.shape for value in values])) > 1:
+            raise ValueError('Cannot stack property %r from frames with different numbers of atoms' % name)
+        return np.array(values)
+
+    def get_param(self, name, frames=None):
+        """
+        Return per-frame parameter `name` from all frames, or from the
+        list of frame indices `frames`, as an array with the frame as
+        the first dimension. ``Lattice`` is also accepted.
+        """
+        if frames is None:
+            frames = range(len(self))
+        values = []
+        for frame in frames:
+            f = self._frame(frame)
+            if name.lower() == 'lattice':
+                values.append(f.lattice)
+                continue
+            try:
+                entry = f.find(f.params, name)
+            except KeyError:
+                raise KeyError('Parameter %r not found in frame %d' % (name, frame))
+            values.append(_param_value(_entry_view(self.buf, entry), entry[1]))
+        return np.array(values)
+
+    def close(self):
+        self.buf.close()
+        self.file.close()
+
+def _param_value(value, ptype):
+    # Convert a stored parameter array back to the value stored in Atoms.params
+    if ptype == T_CHAR:
+        return ''.join(value)
+    elif ptype == T_LOGICAL:
+        return bool(value)
+    elif ptype in (T_INTEGER, T_REAL):
+        return value.item()
+    elif ptype == T_LOGICAL_A:
+        return [bool(x) for x in value]
+    else:
+        return farray(value)
+
+AtomsReaders['qtraj'] = QTrajReader
+AtomsWriters['qtraj'] = QTrajWriter
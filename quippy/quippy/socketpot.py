@@ -0,0 +1,268 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+"""
+Server for the persistent binary mode of ``SocketPot``, i.e. a
+:class:`~quippy.potential.Potential` initialised with ``SocketPot
+persistent server_ip=... server_port=...``.
+
+In this mode the client opens a single TCP connection and identifies
+itself with the 8 byte string ``'B%7d' % client_id``. It then sends
+one request per call to ``calc()``, made up of a header of four native
+C ints::
+
+   label, n_atoms, calc_flags, frame_flags
+
+followed by the lattice (9 doubles, Fortran order) if
+:data:`SEND_LATTICE` is set in `frame_flags`, the atomic numbers
+(`n_atoms` ints) if :data:`SEND_Z` is set, and the positions (`3*n_atoms`
+doubles, Fortran order). The lattice and atomic numbers are only sent
+with the first frame and when they change, so after the first call
+each request is just the header and positions.
+
+The reply is a header of two C ints, ``label, status``, followed, if
+`status` is zero, by the energy (1 double), force (`3*n_atoms`), virial
+(9), local energy (`n_atoms`) and local virial (`9*n_atoms`), omitting any
+that were not requested in `calc_flags`. A request with `n_atoms` of -1
+closes the connection. All data are in the native byte order, so
+client and server must run on machines of the same endianness.
+
+:class:`SocketPotServer` evaluates a quippy
+:class:`~quippy.potential.Potential` for each request. It is intended
+as a loopback test and benchmark peer for ``SocketPot``, and as a
+reference for writing servers in other codes::
+
+   proc, port = start_local_server('IP SW')
+   pot = Potential('SocketPot persistent server_ip=127.0.0.1 server_port=%d' % port)
+   pot.calc(at, energy=True, force=True)
+"""
+
+import socket
+import struct
+import logging
+import multiprocessing
+import SocketServer
+
+import numpy as np
+
+from quippy.atoms import Atoms
+from quippy.farray import farray, fzeros
+
+__all__ = ['SocketPotServer', 'start_local_server',
+           'CALC_ENERGY', 'CALC_FORCE', 'CALC_VIRIAL', 'CALC_LOCAL_E', 'CALC_LOCAL_VIRIAL',
+           'SEND_LATTICE', 'SEND_Z']
+
+splog = logging.getLogger('quippy.socketpot')
+
+HELLO_SIZE = 8
+REQUEST = struct.Struct('=4i')
+REPLY = struct.Struct('=2i')
+
+# bits in calc_flags, must match SOCKETPOT_CALC_* in SocketPot.f95
+CALC_ENERGY = 1
+CALC_FORCE = 2
+CALC_VIRIAL = 4
+CALC_LOCAL_E = 8
+CALC_LOCAL_VIRIAL = 16
+
+# bits in frame_flags, must match SOCKETPOT_SEND_* in SocketPot.f95
+SEND_LATTICE = 1
+SEND_Z = 2
+
+
+def recv_exact(sock, size):
+    """
+    Read exactly `size` bytes from `sock` into a new :class:`bytearray`.
+    Raises :exc:`EOFError` if the connection is closed first.
+    """
+    buf = bytearray(size)
+    view = memoryview(buf)
+    pos = 0
+    while pos < size:
+        n = sock.recv_into(view[pos:], size - pos)
+        if n == 0:
+            raise EOFError('connection closed after %d of %d bytes' % (pos, size))
+        pos += n
+    return buf
+
+
+def recv_array(sock, dtype, shape):
+    """
+    Read an array of `dtype` and `shape` in Fortran order from `sock`
+    """
+    dtype = np.dtype(dtype)
+    size = int(np.prod(shape))
+    return np.frombuffer(recv_exact(sock, size*dtype.itemsize), dtype).reshape(shape, order='F')
+
+
+class _ThreadedTCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SocketPotServer(object):
+    """
+    Serve requests from ``SocketPot`` clients in persistent mode by
+    evaluating the :class:`~quippy.potential.Potential` `pot`, with
+    optional extra `args_str` passed to its ``calc()`` method.
+
+    `address` is the ``(host, port)`` to listen on, by default the
+    loopback interface and a free port, which is then available as
+    :attr:`port`. Each connection is handled in its own thread and
+    keeps its own :class:`~quippy.atoms.Atoms` object and output
+    arrays, which are reused until the number of atoms changes.
+
+    Use :meth:`serve_forever` to handle requests in the current
+    thread, or :func:`start_local_server` to run a server in a child
+    process. A server must not share a process with a client, since the
+    client holds the global interpreter lock while it waits for a reply.
+    """
+
+    def __init__(self, pot, address=('127.0.0.1', 0), args_str=None):
+        self.pot = pot
+        self.args_str = args_str
+        self.stats = {'requests': 0, 'full_frames': 0, 'errors': 0}
+
+        server = self
+        class Handler(SocketServer.BaseRequestHandler):
+            def handle(self):
+                server._handle_client(self.request, self.client_address)
+
+        self._server = _ThreadedTCPServer(address, Handler)
+
+    @property
+    def port(self):
+        "Port number the server is listening on"
+        return self._server.server_address[1]
+
+    def serve_forever(self):
+        """
+        Handle client connections until :meth:`shutdown` is called
+        """
+        splog.info('SocketPotServer listening on %s:%d' % self._server.server_address)
+        self._server.serve_forever()
+
+    def shutdown(self):
+        """
+        Stop accepting new connections
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _calc(self, at, calc_flags, buffers):
+        n = len(at)
+        if buffers.get('n') != n:
+            buffers.update({'n': n,
+                            'energy': farray(0.0),
+                            'force': fzeros((3, n)),
+                            'virial': fzeros((3, 3)),
+                            'local_energy': fzeros(n),
+                            'local_virial': fzeros((9, n))})
+
+        kwargs = {}
+        for name, flag in (('energy', CALC_ENERGY),
+                           ('force', CALC_FORCE),
+                           ('virial', CALC_VIRIAL),
+                           ('local_energy', CALC_LOCAL_E),
+                           ('local_virial', CALC_LOCAL_VIRIAL)):
+            if calc_flags & flag:
+                kwargs[name] = buffers[name]
+        self.pot.calc(at, args_str=self.args_str, **kwargs)
+
+        # results go back in the same order as the client reads them
+        return ''.join([np.asarray(buffers[name], dtype='=f8').tostring(order='F') for name in
+                        ('energy', 'force', 'virial', 'local_energy', 'local_virial')
+                        if name in kwargs])
+
+    def _handle_client(self, sock, address):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        hello = str(recv_exact(sock, HELLO_SIZE))
+        if hello[0] != 'B':
+            splog.error('expected binary hello from %s:%d, got %r' % (address[0], address[1], hello))
+            return
+        client_id = int(hello[1:])
+        splog.info('client %d connected from %s:%d' % (client_id, address[0], address[1]))
+
+        at = None
+        lattice = None
+        buffers = {}
+        try:
+            while True:
+                label, n, calc_flags, frame_flags = REQUEST.unpack(str(recv_exact(sock, REQUEST.size)))
+                if n < 0:
+                    break
+
+                z = None
+                if frame_flags & SEND_LATTICE:
+                    lattice = recv_array(sock, '=f8', (3, 3))
+                if frame_flags & SEND_Z:
+                    z = recv_array(sock, '=i4', (n,))
+                    self.stats['full_frames'] += 1
+                pos = recv_array(sock, '=f8', (3, n))
+
+                self.stats['requests'] += 1
+                try:
+                    if at is None or len(at) != n:
+                        if z is None:
+                            raise ValueError('atomic numbers not sent for new configuration with %d atoms' % n)
+                        at = Atoms(n=n, lattice=lattice)
+                    elif frame_flags & SEND_LATTICE:
+                        at.set_lattice(lattice, scale_positions=False)
+                    if z is not None and n > 0:
+                        at.set_atoms(z)
+                    at.pos.view(np.ndarray)[...] = pos
+                    results = self._calc(at, calc_flags, buffers)
+                except Exception, e:
+                    splog.error('client %d request %d failed: %s' % (client_id, label, e))
+                    self.stats['errors'] += 1
+                    sock.sendall(REPLY.pack(label, 1))
+                    continue
+                sock.sendall(REPLY.pack(label, 0) + results)
+
+        except (EOFError, IOError, socket.error), e:
+            splog.error('lost client %d: %s' % (client_id, e))
+        finally:
+            splog.info('client %d disconnected' % client_id)
+
+
+def _run_local_server(server, init_args, param_str):
+    from quippy.potential import Potential
+    server.pot = Potential(init_args, param_str=param_str)
+    server.serve_forever()
+
+
+def start_local_server(init_args, param_str=None, param_filename=None, args_str=None,
+                       host='127.0.0.1'):
+    """
+    Start a :class:`SocketPotServer` in a child process, evaluating a
+    :class:`~quippy.potential.Potential` constructed from `init_args`
+    and `param_str` or `param_filename`.
+
+    Returns a tuple ``(process, port)``. The listening socket is bound
+    before the child is started, so clients may connect straight away.
+    Terminate the server with ``process.terminate()``.
+    """
+    if param_filename is not None:
+        param_str = open(param_filename).read()
+    server = SocketPotServer(None, (host, 0), args_str)
+    p = multiprocessing.Process(target=_run_local_server, args=(server, init_args, param_str))
+    p.daemon = True
+    p.start()
+    port = server.port
+    server._server.server_close()
+    return p, port
@@ -0,0 +1,550 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+"""
+Binary, pipelined server for distributing many small calculations,
+such as the QM clusters of a LOTF simulation, to a pool of clients.
+
+Each client keeps a single TCP connection open to the
+:class:`WorkServer` for the whole run. The server keeps up to `depth`
+jobs in flight on each connection, so a client can start its next
+calculation as soon as it has sent the previous result. Jobs
+submitted with the same `key` (e.g. the index of the atom at the
+centre of a cluster) are sent to the client which last evaluated that
+key, so that it can reuse its wavefunction. When a client runs out of
+work it takes jobs from the shared queue, and then steals them from
+the client with the longest queue.
+
+All messages start with a fixed size little-endian header::
+
+   char code, 3 bytes padding, int32 client_id, int32 job_id, uint64 payload_length
+
+followed by `payload_length` bytes of payload. The message codes are
+
+====  =================  ======================================
+Code  Direction          Payload
+====  =================  ======================================
+H     client to server   none; `job_id` is requested depth or 0
+J     server to client   atoms, see :func:`pack_atoms`
+R     client to server   results, see :func:`pack_results`
+X     client to server   error message
+Q     server to client   none; client should disconnect
+====  =================  ======================================
+
+Results are written straight into the ``energy`` and ``virial``
+parameters and the ``force`` property of the submitted
+:class:`~quippy.atoms.Atoms` object.
+
+:class:`PotentialWorker` and :func:`start_local_workers` provide
+local clients which evaluate a quippy :class:`~quippy.potential.Potential`,
+e.g. to measure throughput on a single machine::
+
+   server = WorkServer(depth=2)
+   server.start()
+   workers = start_local_workers(server.port, 4, 'IP SW')
+   server.calc_all(clusters, keys=range(len(clusters)))
+   server.shutdown()
+"""
+
+import socket
+import struct
+import threading
+import logging
+import time
+import multiprocessing
+import SocketServer
+from collections import deque
+
+import numpy as np
+
+from quippy.atoms import Atoms
+from quippy.farray import farray, fzeros
+
+__all__ = ['WorkServer', 'WorkClient', 'PotentialWorker', 'start_local_workers',
+           'pack_atoms', 'unpack_atoms', 'pack_results', 'unpack_results']
+
+wslog = logging.getLogger('quippy.workserver')
+
+HEADER = struct.Struct('<c3xiiQ')
+
+MSG_HELLO = 'H'
+MSG_JOB = 'J'
+MSG_RESULT = 'R'
+MSG_ERROR = 'X'
+MSG_QUIT = 'Q'
+
+
+def send_msg(sock, code, client_id, job_id, payload=''):
+    """
+    Send a message with header and `payload` on `sock`
+    """
+    sock.sendall(HEADER.pack(code, client_id, job_id, len(payload)) + payload)
+
+
+def recv_exact(sock, size):
+    """
+    Read exactly `size` bytes from `sock` into a new :class:`bytearray`.
+    Raises :exc:`EOFError` if the connection is closed first.
+    """
+    buf = bytearray(size)
+    view = memoryview(buf)
+    pos = 0
+    while pos < size:
+        n = sock.recv_into(view[pos:], size - pos)
+        if n == 0:
+            raise EOFError('connection closed after %d of %d bytes' % (pos, size))
+        pos += n
+    return buf
+
+
+def recv_msg(sock):
+    """
+    Receive a message from `sock`, returning a tuple
+    `(code, client_id, job_id, payload)`.
+    """
+    code, client_id, job_id, size = HEADER.unpack(str(recv_exact(sock, HEADER.size)))
+    if size > 0:
+        payload = recv_exact(sock, size)
+    else:
+        payload = bytearray()
+    return code, client_id, job_id, payload
+
+
+def _fortran_bytes(a, dtype):
+    return np.asarray(a, dtype=dtype).tostring(order='F')
+
+
+def pack_atoms(at):
+    """
+    Return the job payload for `at`: int32 number of atoms, float64
+    lattice[3,3], int32 atomic numbers[n] and float64 Cartesian
+    positions[3,n], with arrays in Fortran order.
+    """
+    return ''.join([struct.pack('<i', len(at)),
+                    _fortran_bytes(at.lattice, '<f8'),
+                    _fortran_bytes(at.z, '<i4'),
+                    _fortran_bytes(at.pos, '<f8')])
+
+
+def unpack_atoms(payload, at=None):
+    """
+    Construct an :class:`~quippy.atoms.Atoms` object from a job
+    payload. If `at` is given and has the right number of atoms it is
+    updated in place and returned instead.
+    """
+    n, = struct.unpack_from('<i', payload, 0)
+    offset = 4
+    lattice = np.frombuffer(payload, '<f8', 9, offset).reshape((3, 3), order='F')
+    offset += 9*8
+    z = np.frombuffer(payload, '<i4', n, offset)
+    offset += n*4
+    pos = np.frombuffer(payload, '<f8', 3*n, offset).reshape((3, n), order='F')
+
+    if at is None or len(at) != n:
+        at = Atoms(n=n, lattice=lattice)
+    else:
+        at.set_lattice(lattice, scale_positions=False)
+    if n > 0:
+        at.set_atoms(z)
+        at.pos.view(np.ndarray)[...] = pos
+    return at
+
+
+def pack_results(energy, force, virial):
+    """
+    Return the results payload: int32 number of atoms, float64
+    energy, float64 force[3,n] and float64 virial[3,3], with arrays in
+    Fortran order.
+    """
+    force = np.asarray(force)
+    return ''.join([struct.pack('<id', force.shape[1], energy),
+                    _fortran_bytes(force, '<f8'),
+                    _fortran_bytes(virial, '<f8')])
+
+
+def unpack_results(payload, at):
+    """
+    Copy results from a results payload into the ``energy`` and
+    ``virial`` parameters and ``force`` property of `at`.
+    """
+    n, energy = struct.unpack_from('<id', payload, 0)
+    if n != len(at):
+        raise ValueError('results for %d atoms do not match Atoms with %d atoms' % (n, len(at)))
+    force = np.frombuffer(payload, '<f8', 3*n, 12).reshape((3, n), order='F')
+    virial = np.frombuffer(payload, '<f8', 9, 12 + 3*n*8).reshape((3, 3), order='F')
+
+    at.params['energy'] = energy
+    at.params['virial'] = np.array(virial)
+    if not at.has_property('force'):
+        at.add_property('force', 0.0, n_cols=3)
+    at.force.view(np.ndarray)[...] = force
+
+
+class _Job(object):
+    __slots__ = ['job_id', 'atoms', 'key', 'payload', 'client_id']
+
+    def __init__(self, job_id, atoms, key, payload):
+        self.job_id = job_id
+        self.atoms = atoms
+        self.key = key
+        self.payload = payload
+        self.client_id = None
+
+
+class _ThreadedTCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class WorkServer(object):
+    """
+    Distribute calculations on :class:`~quippy.atoms.Atoms` objects
+    to clients connected over TCP.
+
+    `address` is the ``(host, port)`` to listen on, by default all
+    interfaces and a free port, which is then available as
+    :attr:`port`. `depth` is the number of jobs kept in flight on each
+    client connection, unless the client asks for a different depth.
+
+    Use :meth:`submit` or :meth:`calc_all` to queue jobs once the
+    server has been started with :meth:`start`. Clients may connect
+    and disconnect at any time; the jobs in flight on a client which
+    disconnects are put back in the queue.
+    """
+
+    def __init__(self, address=('', 0), depth=2):
+        self.depth = depth
+        self._lock = threading.Condition()
+        self._shared = deque()
+        self._queues = {}
+        self._affinity = {}
+        self._next_job_id = 0
+        self._n_unfinished = 0
+        self._closed = False
+        self.errors = []
+        self.stats = {'jobs': 0, 'affinity_hits': 0, 'steals': 0, 'requeued': 0,
+                      'clients': 0}
+
+        server = self
+        class Handler(SocketServer.BaseRequestHandler):
+            def handle(self):
+                server._handle_client(self.request, self.client_address)
+
+        self._server = _ThreadedTCPServer(address, Handler)
+        self._thread = None
+
+    @property
+    def port(self):
+        "Port number the server is listening on"
+        return self._server.server_address[1]
+
+    def start(self):
+        """
+        Start accepting client connections in a background thread
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        wslog.info('WorkServer listening on %s:%d' % self._server.server_address)
+
+    def shutdown(self):
+        """
+        Tell clients to quit once their jobs in flight are complete
+        and stop accepting new connections
+        """
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def submit(self, at, key=None):
+        """
+        Queue a calculation on `at`, returning an integer job ID.
+
+        If `key` is not None, the job is sent to the client which most
+        recently evaluated a job with the same `key`, if it is still
+        connected.
+        """
+        payload = pack_atoms(at)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('WorkServer has been shut down')
+            job = _Job(self._next_job_id, at, key, payload)
+            self._next_job_id += 1
+            self._n_unfinished += 1
+            client_id = self._affinity.get(key)
+            if client_id in self._queues:
+                self._queues[client_id].append(job)
+            else:
+                self._shared.append(job)
+            self._lock.notify_all()
+        return job.job_id
+
+    def wait(self, timeout=None):
+        """
+        Wait until all submitted jobs have completed.
+
+        Returns False if `timeout` seconds elapse first, True
+        otherwise. Raises :exc:`RuntimeError` if any jobs failed.
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+        with self._lock:
+            while self._n_unfinished > 0:
+                if timeout is not None and time.time() > deadline:
+                    return False
+                self._lock.wait(0.1)
+            if self.errors:
+                errors, self.errors = self.errors, []
+                raise RuntimeError('%d job(s) failed, first error for job %d (key %r): %s' %
+                                   ((len(errors),) + errors[0]))
+        return True
+
+    def calc_all(self, atoms_list, keys=None):
+        """
+        Submit a job for each :class:`~quippy.atoms.Atoms` in
+        `atoms_list`, with optional affinity `keys`, and wait for them
+        all to complete. Returns `atoms_list`.
+        """
+        if keys is None:
+            keys = [None]*len(atoms_list)
+        for at, key in zip(atoms_list, keys):
+            self.submit(at, key)
+        self.wait()
+        return atoms_list
+
+    def _take_job(self, client_id):
+        # Return next job for `client_id` or None. Must hold self._lock.
+        queue = self._queues[client_id]
+        if queue:
+            job = queue.popleft()
+            self.stats['affinity_hits'] += 1
+        elif self._shared:
+            job = self._shared.popleft()
+        else:
+            victim = max(self._queues.values(), key=len)
+            if not victim:
+                return None
+            # take from the end, furthest from the jobs the victim will run next
+            job = victim.pop()
+            self.stats['steals'] += 1
+        job.client_id = client_id
+        if job.key is not None:
+            self._affinity[job.key] = client_id
+        return job
+
+    def _next_job(self, client_id, block):
+        with self._lock:
+            while True:
+                job = self._take_job(client_id)
+                if job is not None or not block or self._closed:
+                    return job
+                self._lock.wait(1.0)
+
+    def _job_done(self, job, error=None):
+        with self._lock:
+            self._n_unfinished -= 1
+            self.stats['jobs'] += 1
+            if error is not None:
+                self.errors.append((job.job_id, job.key, error))
+            self._lock.notify_all()
+
+    def _connect(self, client_id):
+        with self._lock:
+            if client_id in self._queues:
+                raise ValueError('client ID %d is already connected' % client_id)
+            self._queues[client_id] = deque()
+            self.stats['clients'] += 1
+
+    def _disconnect(self, client_id, in_flight):
+        # put jobs in flight and queued for this client back on the shared queue
+        with self._lock:
+            queue = self._queues.pop(client_id)
+            self._shared.extendleft(reversed(in_flight + list(queue)))
+            self.stats['requeued'] += len(in_flight)
+            self._lock.notify_all()
+
+    def _handle_client(self, sock, address):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = '%s:%d' % address[:2]
+        connected = False
+        in_flight = {}
+        try:
+            code, client_id, depth, payload = recv_msg(sock)
+            if code != MSG_HELLO:
+                wslog.error('expected hello from %s, got message code %r' % (client, code))
+                return
+            if depth <= 0:
+                depth = self.depth
+            self._connect(client_id)
+            connected = True
+            client = '%d' % client_id
+            wslog.info('client %d connected from %s:%d with depth %d' % (client_id, address[0], address[1], depth))
+
+            while True:
+                while len(in_flight) < depth:
+                    job = self._next_job(client_id, block=not in_flight)
+                    if job is None:
+                        break
+                    send_msg(sock, MSG_JOB, client_id, job.job_id, job.payload)
+                    in_flight[job.job_id] = job
+
+                if not in_flight:
+                    # only happens once server is shutting down
+                    send_msg(sock, MSG_QUIT, client_id, 0)
+                    break
+
+                code, cid, job_id, payload = recv_msg(sock)
+                job = in_flight.pop(job_id, None)
+                if job is None:
+                    raise IOError('unknown job id %r from client %d' % (job_id, client_id))
+                if code == MSG_RESULT:
+                    try:
+                        unpack_results(payload, job.atoms)
+                    except Exception, e:
+                        # the client is still in step with us, so just fail this job
+                        self._job_done(job, error='bad result from client %d: %s' % (client_id, e))
+                    else:
+                        self._job_done(job)
+                elif code == MSG_ERROR:
+                    self._job_done(job, error=str(payload))
+                else:
+                    in_flight[job_id] = job # so that it is requeued
+                    raise IOError('unexpected message code %r from client %d' % (code, client_id))
+
+        except (EOFError, IOError, socket.error), e:
+            wslog.error('lost client %s: %s' % (client, e))
+        except Exception:
+            wslog.exception('error handling client %s' % client)
+        finally:
+            if connected:
+                self._disconnect(client_id, in_flight.values())
+                wslog.info('client %d disconnected' % client_id)
+
+
+class WorkClient(object):
+    """
+    Client which connects to a :class:`WorkServer` at `address` and
+    evaluates the jobs it is sent until told to quit.
+
+    `calculator` is called with an :class:`~quippy.atoms.Atoms`
+    object for each job, and should return a tuple `(energy, force,
+    virial)` with `force` of shape ``(3, n_atoms)``. Consecutive jobs
+    with the same number of atoms reuse the same
+    :class:`~quippy.atoms.Atoms` object. If `calculator` raises an
+    exception, the error is reported to the server and the client
+    carries on with the next job.
+
+    `depth` overrides the server's number of jobs in flight for this
+    client.
+    """
+
+    def __init__(self, address, client_id, calculator, depth=None):
+        self.address = address
+        self.client_id = client_id
+        self.calculator = calculator
+        self.depth = depth
+
+    def run(self):
+        """
+        Process jobs until the server tells us to quit. Returns the
+        number of jobs evaluated.
+        """
+        sock = socket.create_connection(self.address)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        n_jobs = 0
+        at = None
+        try:
+            send_msg(sock, MSG_HELLO, self.client_id, self.depth or 0)
+            while True:
+                code, client_id, job_id, payload = recv_msg(sock)
+                if code == MSG_QUIT:
+                    break
+                if code != MSG_JOB:
+                    raise IOError('unexpected message code %r from server' % code)
+
+                at = unpack_atoms(payload, at)
+                try:
+                    energy, force, virial = self.calculator(at)
+                except Exception, e:
+                    wslog.error('client %d job %d failed: %s' % (self.client_id, job_id, e))
+                    send_msg(sock, MSG_ERROR, self.client_id, job_id, str(e))
+                    continue
+                send_msg(sock, MSG_RESULT, self.client_id, job_id,
+                         pack_results(energy, force, virial))
+                n_jobs += 1
+        finally:
+            sock.close()
+        return n_jobs
+
+
+class PotentialWorker(object):
+    """
+    Calculator for :class:`WorkClient` which evaluates energy, forces
+    and virial with the :class:`~quippy.potential.Potential` `pot`.
+
+    Output arrays are allocated once and reused for consecutive
+    configurations with the same number of atoms.
+    """
+
+    def __init__(self, pot, args_str=None):
+        self.pot = pot
+        self.args_str = args_str
+        self._energy = farray(0.0)
+        self._force = None
+        self._virial = fzeros((3, 3))
+
+    def __call__(self, at):
+        if self._force is None or self._force.shape[1] != len(at):
+            self._force = fzeros((3, len(at)))
+        self.pot.calc(at, energy=self._energy, force=self._force,
+                      virial=self._virial, args_str=self.args_str)
+        return float(self._energy), self._force, self._virial
+
+
+def _run_potential_worker(address, client_id, init_args, param_str, args_str, depth):
+    from quippy.potential import Potential
+    pot = Potential(init_args, param_str=param_str)
+    WorkClient(address, client_id, PotentialWorker(pot, args_str), depth).run()
+
+
+def start_local_workers(port, n_workers, init_args, param_str=None, param_filename=None,
+                        args_str=None, depth=None, host='localhost', first_id=0):
+    """
+    Start `n_workers` :class:`WorkClient` processes on this machine,
+    each evaluating a :class:`~quippy.potential.Potential` constructed
+    from `init_args` and `param_str` or `param_filename`, and connected
+    to the :class:`WorkServer` listening on `host`:`port`.
+
+    Client IDs are numbered from `first_id`. Returns a list of
+    :class:`multiprocessing.Process` objects; each exits when the
+    server is shut down.
+    """
+    if param_filename is not None:
+        param_str = open(param_filename).read()
+    workers = []
+    for i in range(n_workers):
+        p = multiprocessing.Process(target=_run_potential_worker,
+                                    args=((host, port), first_id + i, init_args,
+                                          param_str, args_str, depth))
+        p.daemon = True
+        p.start()
+        workers.append(p)
+    return workers
@@ -0,0 +1,214 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+"""
+Pure Python column extraction from Extended XYZ files.
+
+These routines read a single property or parameter from many frames
+of an Extended XYZ file without constructing :class:`~quippy.atoms.Atoms`
+objects. Frames are located using the same ``.xyz.idx`` frame index
+that is maintained by :func:`xyz_find_frames` in :file:`libAtoms/xyz.c`,
+and only the requested columns of each atom line are converted, using
+the column offsets given by the ``Properties=`` key in the comment
+line. They are used by :meth:`~quippy.io.AtomsReader.get_array` and
+:meth:`~quippy.io.AtomsReader.get_param`.
+"""
+
+import os
+import numpy as np
+
+from quippy.dictmixin import PuPyDictionary
+
+__all__ = ['xyz_frame_offsets', 'xyz_parse_properties',
+           'xyz_get_array', 'xyz_get_param']
+
+xyz_type_to_dtype = {'R': float,
+                     'I': int,
+                     'S': str,
+                     'L': bool}
+
+def xyz_read_index(indexname):
+    """
+    Read frame offsets and atom counts from the ``.xyz.idx`` file
+    `indexname`. Returns a tuple ``(offsets, n_atoms)`` of length
+    ``n_frames+1`` lists, the final entries referring to the end of the
+    last frame, as written by :func:`xyz_write_index` in :file:`xyz.c`.
+    """
+    index = open(indexname, 'r')
+    try:
+        n_frames = int(index.readline().split()[0])
+        offsets = []
+        n_atoms = []
+        for i in range(n_frames+1):
+            fields = index.readline().split()
+            if len(fields) != 2:
+                raise IOError('Premature end of index file %s' % indexname)
+            offsets.append(int(fields[0]))
+            n_atoms.append(int(fields[1]))
+    finally:
+        index.close()
+    return offsets, n_atoms
+
+def xyz_scan_frames(filename):
+    """
+    Scan through the Extended XYZ file `filename` and return a tuple
+    ``(offsets, n_atoms)`` of lists giving the byte offset and number of
+    atoms of each complete frame.
+    """
+    offsets = []
+    n_atoms = []
+    f = open(filename, 'r')
+    try:
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line.strip():
+                break
+            n = int(line.split()[0])
+            lines = [f.readline() for i in range(n+1)]
+            if not lines[-1]:
+                break # incomplete last frame
+            offsets.append(offset)
+            n_atoms.append(n)
+    finally:
+        f.close()
+    return offsets, n_atoms
+
+def xyz_frame_offsets(filename):
+    """
+    Return a tuple ``(offsets, n_atoms)`` giving the byte offset and
+    number of atoms of each frame in the Extended XYZ file `filename`.
+
+    The ``.xyz.idx`` index file is used if it exists and is not older
+    than `filename`, otherwise the file is scanned from the start.
+    """
+    indexname = filename + '.idx'
+    if (os.path.exists(indexname) and
+        os.stat(indexname).st_mtime >= os.stat(filename).st_mtime):
+        offsets, n_atoms = xyz_read_index(indexname)
+        return offsets[:-1], n_atoms[:-1]
+    else:
+        return xyz_scan_frames(filename)
+
+def _xyz_lookup(params, name):
+    # Extended XYZ keys are case insensitive
+    for key in params:
+        if key.lower() == name.lower():
+            return params[key]
+    raise KeyError(name)
+
+def xyz_parse_properties(properties):
+    """
+    Parse an Extended XYZ ``Properties`` string, e.g.
+    ``species:S:1:pos:R:3``, and return a dictionary mapping lower case
+    property names to ``(type, ncols, offset)`` tuples, where `offset`
+    is the index of the first column of that property in each atom line.
+    """
+    fields = properties.split(':')
+    if len(fields) % 3 != 0:
+        raise ValueError('Malformed Properties string %r' % properties)
+    columns = {}
+    offset = 0
+    for i in range(0, len(fields), 3):
+        name, ptype, ncols = fields[i], fields[i+1].upper(), int(fields[i+2])
+        if ptype not in xyz_type_to_dtype:
+            raise ValueError('Unknown property type %r in Properties string %r' % (ptype, properties))
+        columns[name.lower()] = (ptype, ncols, offset)
+        offset += ncols
+    return columns
+
+def _xyz_convert(tokens, ptype):
+    if ptype == 'L':
+        return np.array(tokens) == 'T'
+    return np.array(tokens, dtype=xyz_type_to_dtype[ptype])
+
+def xyz_get_array(filename, name, frames=None):
+    """
+    Return per-atom property `name` from the frames of the Extended XYZ
+    file `filename` selected by the list of frame indices `frames` (default
+    all frames), as an array of shape ``(n_frames, n_atoms, ncols)``, or
+    ``(n_frames, n_atoms)`` for properties with a single column.
+
+    Raises :exc:`ValueError` if the selected frames do not all have the
+    same number of atoms, or :exc:`KeyError` if `name` is missing from
+    any of them.
+    """
+    offsets, n_atoms = xyz_frame_offsets(filename)
+    if frames is None:
+        frames = range(len(offsets))
+    if len(set([n_atoms[frame] for frame in frames])) > 1:
+        raise ValueError('Cannot stack property %r from frames with different numbers of atoms' % name)
+
+    result = None
+    f = open(filename, 'r')
+    try:
+        for i, frame in enumerate(frames):
+            f.seek(offsets[frame])
+            n = int(f.readline().split()[0])
+            params = PuPyDictionary(f.readline())
+            try:
+                columns = xyz_parse_properties(_xyz_lookup(params, 'Properties'))
+            except KeyError:
+                columns = xyz_parse_properties('species:S:1:pos:R:3')
+            if name.lower() not in columns:
+                raise KeyError('Property %r not found in frame %d of %s' % (name, frame, filename))
+            ptype, ncols, offset = columns[name.lower()]
+
+            tokens = [f.readline().split()[offset:offset+ncols] for j in range(n)]
+            value = _xyz_convert(tokens, ptype)
+            if ncols == 1:
+                value = value[:, 0]
+
+            if result is None:
+                result = np.zeros((len(frames),) + value.shape, dtype=value.dtype)
+            result[i] = value
+    finally:
+        f.close()
+
+    if result is None:
+        result = np.zeros((0,))
+    return result
+
+def xyz_get_param(filename, name, frames=None):
+    """
+    Return per-frame parameter `name` from the comment lines of the
+    frames of the Extended XYZ file `filename` selected by the list of
+    frame indices `frames` (default all frames), as an array with the
+    frame as the first dimension. ``Lattice`` is also accepted.
+
+    Raises :exc:`KeyError` if `name` is missing from any frame.
+    """
+    offsets, n_atoms = xyz_frame_offsets(filename)
+    if frames is None:
+        frames = range(len(offsets))
+
+    values = []
+    f = open(filename, 'r')
+    try:
+        for frame in frames:
+            f.seek(offsets[frame])
+            f.readline()
+            params = PuPyDictionary(f.readline())
+            try:
+                values.append(_xyz_lookup(params, name))
+            except KeyError:
+                raise KeyError('Parameter %r not found in frame %d of %s' % (name, frame, filename))
+    finally:
+        f.close()
+
+    return np.array([np.asarray(value) for value in values])
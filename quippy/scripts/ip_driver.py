@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+# Dummy FilePot driver which evaluates a QUIP IP model, for testing
+# and for measuring the per-step overhead of FilePot with and without
+# persistent=T. Use it with e.g.
+#
+#   FilePot command={ip_driver.py -i "IP SW"}
+#   FilePot command={ip_driver.py -i "IP SW"} persistent=T tmp_dir=/dev/shm
+
+from quippy import *
+from quippy.filepotdriver import main
+import sys, optparse
+
+p = optparse.OptionParser(usage='%prog [options] (<xyzfile> <outfile> [KEY=VALUE]... | --persistent <socket_path>)')
+p.add_option('-i', '--init-args', action='store', help='Potential init_args (default "IP SW")', default='IP SW')
+p.add_option('-p', '--param-file', action='store', help='XML parameter file (default none)')
+p.add_option('--persistent', action='store', metavar='SOCKET_PATH', help='Serve calculations on Unix socket SOCKET_PATH')
+
+opt, args = p.parse_args()
+
+param_str = None
+if opt.param_file is not None:
+    param_str = open(opt.param_file).read()
+pot = Potential(opt.init_args, param_str=param_str)
+
+def calculate(at, args_str):
+    pot.calc(at, args_str='energy force virial')
+    return at
+
+if opt.persistent is not None:
+    main(calculate, [sys.argv[0], '--persistent', opt.persistent])
+else:
+    main(calculate, [sys.argv[0]] + args)
@@ -161,10 +161,13 @@ def F90WrapperBuilder(modname, wrap_sources, targets, cpp, sizeof_fortran_t,
         fortran_spec['quip_makefile'] = makefile
         cPickle.dump(fortran_spec, open(os.path.join(build_dir, '../../%s.spec' % modname), 'w'))
 
-        import pprint
+        # Store the spec as a binary pickle string constant, which is
+        # loaded from spec.pyc much faster than a large dict literal
+        # is parsed and executed on import
         spec_py_name = '%s/spec.py' % build_dir
         spec_py = open(spec_py_name, 'w')
-        spec_py.write('spec = %s\n' % pprint.pformat(fortran_spec))
+        spec_py.write('import cPickle\n')
+        spec_py.write('spec = cPickle.loads(%r)\n' % cPickle.dumps(fortran_spec, cPickle.HIGHEST_PROTOCOL))
         spec_py.close()
         res.append(spec_py_name)
 
@@ -38,7 +38,9 @@ public :: orb_type_of_orb_set_of_Z
 public :: n_elecs_of_Z
 public :: get_HS_blocks
 public :: get_dHS_masks
+public :: get_dHS_local_masks
 public :: get_dHS_blocks
 public :: get_local_rep_E
 public :: get_local_rep_E_force
+public :: add_local_rep_E_force
 public :: get_local_rep_E_virial
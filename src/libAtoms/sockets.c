@@ -8,6 +8,14 @@
 #include <unistd.h>
 #include <errno.h>
 #include <arpa/inet.h> 
+#include <netinet/tcp.h>
+#include <sys/un.h>
+
+/* A peer that has gone away must show up as an error from send(), not
+   as a SIGPIPE that kills the process */
+#ifndef MSG_NOSIGNAL
+#define MSG_NOSIGNAL 0
+#endif
 
 #define MSG_LEN_SIZE 8
 #define MSG_END_MARKER "done."
@@ -171,7 +179,7 @@ int quip_send_data(char *ip, int port, int client_id, char *request_code, char *
     /* send the data string itself */
     totalsent = 0;
     while (totalsent < data_len) {
-      sent = send(sockfd, data+totalsent, data_len - totalsent, 0);
+      sent = send(sockfd, data+totalsent, data_len - totalsent, MSG_NOSIGNAL);
       if (sent == 0) {
 	printf("socket connection broken while sending data\n");
 	return 1;
@@ -195,3 +203,134 @@ int quip_send_data(char *ip, int port, int client_id, char *request_code, char *
     close(sockfd);
     return 0;
 }
+
+/* Persistent connections: open a socket once, identify ourselves with
+   the same 8-byte hello used above, and then exchange raw binary
+   messages with quip_socket_send_all() and quip_socket_recv_all() until
+   quip_socket_close() is called. Returns the socket file descriptor, or
+   -1 on failure. */
+
+int quip_socket_send_all(int sockfd, char *data, int data_len);
+int quip_socket_recv_all(int sockfd, char *data, int data_len);
+
+int quip_socket_connect(char *ip, int port, int client_id, char *request_code)
+{
+    int sockfd = 0, status, flag = 1;
+    char id_str[MSG_LEN_SIZE+1];
+    struct sockaddr_in serv_addr;
+
+    if((sockfd = socket(AF_INET, SOCK_STREAM, 0)) < 0)
+    {
+        printf("Could not create socket \n");
+        return -1;
+    }
+
+    memset(&serv_addr, 0, sizeof(serv_addr));
+
+    serv_addr.sin_family = AF_INET;
+    serv_addr.sin_port = htons(port);
+
+    if(inet_pton(AF_INET, ip, &serv_addr.sin_addr)<=0)
+    {
+        printf("\n inet_pton error occured\n");
+        close(sockfd);
+        return -1;
+    }
+
+    if((status = connect(sockfd, (struct sockaddr *)&serv_addr, sizeof(serv_addr))) < 0)
+    {
+       printf("Connect Failed status=%d, errno=%d \n", status, errno);
+       close(sockfd);
+       return -1;
+    }
+
+    /* messages are small and strictly request/reply, so disable Nagle's algorithm */
+    setsockopt(sockfd, IPPROTO_TCP, TCP_NODELAY, (char *) &flag, sizeof(int));
+#ifdef SO_NOSIGPIPE
+    /* no MSG_NOSIGNAL on BSD and macOS */
+    setsockopt(sockfd, SOL_SOCKET, SO_NOSIGPIPE, (char *) &flag, sizeof(int));
+#endif
+
+    sprintf(id_str, "%c%7d", *request_code, client_id);
+    if (quip_socket_send_all(sockfd, id_str, MSG_LEN_SIZE) != 0) {
+      printf("socket connection broken while sending client ID\n");
+      close(sockfd);
+      return -1;
+    }
+
+    return sockfd;
+}
+
+/* As quip_socket_connect(), but for a Unix domain socket at 'path' on
+   the local machine, without any hello message. Used to talk to
+   long-lived driver processes started by FilePot. */
+
+int quip_unix_socket_connect(char *path)
+{
+    int sockfd = 0;
+    struct sockaddr_un serv_addr;
+
+    if (strlen(path) >= sizeof(serv_addr.sun_path)) {
+      printf("Unix socket path too long: %s\n", path);
+      return -1;
+    }
+
+    if((sockfd = socket(AF_UNIX, SOCK_STREAM, 0)) < 0)
+    {
+        printf("Could not create socket \n");
+        return -1;
+    }
+
+    memset(&serv_addr, 0, sizeof(serv_addr));
+    serv_addr.sun_family = AF_UNIX;
+    strcpy(serv_addr.sun_path, path);
+
+    if(connect(sockfd, (struct sockaddr *)&serv_addr, sizeof(serv_addr)) < 0)
+    {
+       close(sockfd);
+       return -1;
+    }
+#ifdef SO_NOSIGPIPE
+    {
+      int flag = 1;
+      setsockopt(sockfd, SOL_SOCKET, SO_NOSIGPIPE, (char *) &flag, sizeof(int));
+    }
+#endif
+
+    return sockfd;
+}
+
+int quip_socket_send_all(int sockfd, char *data, int data_len)
+{
+    int sent, totalsent = 0;
+
+    while (totalsent < data_len) {
+      sent = send(sockfd, data+totalsent, data_len - totalsent, MSG_NOSIGNAL);
+      if (sent <= 0) {
+	if (sent < 0 && errno == EINTR) continue;
+	return 1;
+      }
+      totalsent += sent;
+    }
+    return 0;
+}
+
+int quip_socket_recv_all(int sockfd, char *data, int data_len)
+{
+    int received, totalreceived = 0;
+
+    while (totalreceived < data_len) {
+      received = recv(sockfd, data+totalreceived, data_len - totalreceived, 0);
+      if (received <= 0) {
+	if (received < 0 && errno == EINTR) continue;
+	return 1;
+      }
+      totalreceived += received;
+    }
+    return 0;
+}
+
+int quip_socket_close(int sockfd)
+{
+    return close(sockfd);
+}
@@ -0,0 +1,63 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+
+# Compare the time taken to carve all atom-centred clusters of a diamond
+# supercell one at a time, in a single batch, and again after a small
+# displacement when the clusters from the previous step can be reused.
+# Not picked up by run_all.py; run directly with
+# "python benchmark_clusters.py".
+
+from quippy import *
+from quippy.lotf import AtomCenteredClusters, _iter_atom_centered_clusters_serial
+import unittest, time
+from quippytest import *
+
+N_CELLS = [2, 3, 4] # 8*n**3 = 64 ... 512 atoms
+CLUSTER_ARGS = {'buffer_hops': 3, 'randomise_buffer': False}
+N_PROCS = 1
+
+class BenchmarkClusters(QuippyTestCase):
+
+   def test_carving(self):
+      print '%-8s %12s %12s %12s' % ('n_atoms', 'serial/s', 'batched/s', 'reused/s')
+      for n in N_CELLS:
+         at = supercell(diamond(5.44, 14), n, n, n)
+         at.rattle(0.05)
+         at.set_cutoff(5.0)
+
+         t0 = time.time()
+         serial = list(_iter_atom_centered_clusters_serial(at, **CLUSTER_ARGS))
+         t_serial = time.time() - t0
+
+         clusters = AtomCenteredClusters(nprocs=N_PROCS, **CLUSTER_ARGS)
+         t0 = time.time()
+         clusters.update(at)
+         t_batched = time.time() - t0
+
+         at.rattle(0.01)
+         t0 = time.time()
+         clusters.update(at)
+         t_reused = time.time() - t0
+         clusters.close()
+
+         print '%-8d %12.3f %12.3f %12.3f' % (len(at), t_serial, t_batched, t_reused)
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,67 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+
+# Compare the time taken by the Fortran and Python implementations of
+# the atom resolved stress field for strained diamond supercells, and
+# the largest difference between the stresses they give. Not picked up
+# by run_all.py; run directly with "python benchmark_elastic_fields.py".
+
+from quippy import *
+from quippy.elasticity import AtomResolvedStressField, strain_matrix
+import unittest, time
+from quippytest import *
+
+N_CELLS = [5, 10, 20] # 8*n**3 = 1000 ... 64000 atoms
+A = 5.43
+RATTLE = 0.01
+
+# Stillinger-Weber elastic constants of silicon, in GPa
+C11, C12, C44 = 151.4, 76.6, 56.3
+
+class BenchmarkElasticFields(QuippyTestCase):
+
+   def setUp(self):
+      cij = fzeros((6,6))
+      cij[1:3,1:3] = C12
+      for i in frange(3):
+         cij[i,i] = C11
+         cij[i+3,i+3] = C44
+      self.fortran = AtomResolvedStressField(a=A, cij=cij, method='fortran')
+      self.python = AtomResolvedStressField(a=A, cij=cij, method='python')
+
+   def test_fortran_vs_python(self):
+      print '%-8s %12s %12s %12s' % ('n_atoms', 'fortran/s', 'python/s', 'max diff')
+      for n in N_CELLS:
+         at = supercell(diamond(A, 14), n, n, n)
+         at = transform(at, strain_matrix([1e-3, -2e-3, 0.0, 1e-3, 0.0, 0.0]))
+         at.rattle(RATTLE)
+
+         t0 = time.time()
+         sigma_fortran = self.fortran.get_stresses(at.copy())
+         t_fortran = time.time() - t0
+
+         t0 = time.time()
+         sigma_python = self.python.get_stresses(at.copy())
+         t_python = time.time() - t0
+
+         print '%-8d %12.3f %12.3f %12.3g' % (len(at), t_fortran, t_python, abs(sigma_fortran - sigma_python).max())
+
+
+if __name__ == '__main__':
+   unittest.main()
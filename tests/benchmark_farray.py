@@ -0,0 +1,83 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+# Measure the cost of one-based element and slice access on
+# FortranArray compared with zero-based access on the underlying
+# ndarray. Not picked up by run_all.py; run directly with "python
+# benchmark_farray.py".
+
+from quippy.farray import *
+import unittest, time
+import numpy as np
+from quippytest import *
+
+N_CALLS = 100000
+
+class BenchmarkFortranArray(QuippyTestCase):
+
+   def setUp(self):
+      self.f = farray(np.arange(100.0))
+      self.f2 = fzeros((3, 100))
+      self.n = self.f.view(np.ndarray)
+      self.n2 = self.f2.view(np.ndarray)
+      self.v = np.ones(3)
+
+   def rate(self, label, func, ref_func):
+      rates = []
+      for f in (func, ref_func):
+         t0 = time.time()
+         for i in xrange(N_CALLS):
+            f()
+         rates.append(N_CALLS/(time.time() - t0))
+      print '%-30s %12.0f calls/s %8.1fx slower than ndarray' % (label, rates[0], rates[1]/rates[0])
+      return rates[0]
+
+   def test_get_int(self):
+      self.rate('f[i]', lambda: self.f[5], lambda: self.n[4])
+
+   def test_set_int(self):
+      def set_f(): self.f[5] = 1.0
+      def set_n(): self.n[4] = 1.0
+      self.rate('f[i] = x', set_f, set_n)
+
+   def test_get_int_int(self):
+      self.rate('f2[j, i]', lambda: self.f2[2, 5], lambda: self.n2[1, 4])
+
+   def test_set_int_int(self):
+      def set_f(): self.f2[2, 5] = 1.0
+      def set_n(): self.n2[1, 4] = 1.0
+      self.rate('f2[j, i] = x', set_f, set_n)
+
+   def test_get_column(self):
+      self.rate('f2[:, i]', lambda: self.f2[:, 5], lambda: self.n2[:, 4])
+
+   def test_get_last_axis(self):
+      self.rate('f2[i]', lambda: self.f2[5], lambda: self.n2[..., 4])
+
+   def test_set_column(self):
+      def set_f(): self.f2[:, 5] = self.v
+      def set_n(): self.n2[:, 4] = self.v
+      self.rate('f2[:, i] = v', set_f, set_n)
+
+   def test_get_fancy(self):
+      idx = farray([1, 3, 5])
+      self.rate('f[int_array]', lambda: self.f[idx], lambda: self.n[idx.view(np.ndarray)-1])
+
+
+if __name__ == '__main__':
+   unittest.main()
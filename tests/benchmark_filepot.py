@@ -0,0 +1,78 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+
+# Measure the per-step overhead of FilePot, using the dummy IP driver
+# ip_driver.py, when the driver is run for every call and when it is
+# kept running with persistent=T, optionally staging files in a tmpfs
+# directory (TMPFS_DIR, default /dev/shm). Not picked up by run_all.py;
+# run directly with "python benchmark_filepot.py".
+
+from quippy import *
+import unittest, sys, os, time, shutil, tempfile
+from quippytest import *
+
+N_CELLS = 2 # 8*2**3 = 64 atoms
+N_CALLS = 20
+TMPFS_DIR = os.environ.get('TMPFS_DIR', '/dev/shm')
+
+ip_driver = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         '..', 'quippy', 'scripts', 'ip_driver.py')
+
+if hasattr(quippy, 'Potential'):
+
+   class BenchmarkFilePot(QuippyTestCase):
+
+      def setUp(self):
+         self.at = supercell(diamond(5.44, 14), N_CELLS, N_CELLS, N_CELLS)
+         self.at.rattle(0.01)
+         self.energy = farray(0.0)
+         self.force = fzeros((3, len(self.at)))
+         self.work_dir = tempfile.mkdtemp()
+         self.tmp_dir = tempfile.mkdtemp(dir=TMPFS_DIR)
+
+      def tearDown(self):
+         shutil.rmtree(self.work_dir)
+         shutil.rmtree(self.tmp_dir)
+
+      def per_call(self, init_args):
+         pot = Potential(init_args)
+         # first call starts up the persistent driver
+         pot.calc(self.at, energy=self.energy, force=self.force, args_str='FilePot_log=F')
+         t0 = time.time()
+         for i in xrange(N_CALLS):
+            pot.calc(self.at, energy=self.energy, force=self.force, args_str='FilePot_log=F')
+         t = (time.time() - t0)/N_CALLS*1.0e3
+         del pot
+         return t
+
+      def test_modes(self):
+         driver = '%s %s' % (sys.executable, ip_driver)
+         modes = [('direct', 'IP SW'),
+                  ('filepot', 'FilePot command={%s} tmp_dir=%s' % (driver, self.work_dir)),
+                  ('tmpfs', 'FilePot command={%s} tmp_dir=%s' % (driver, self.tmp_dir)),
+                  ('persistent', 'FilePot command={%s} persistent=T tmp_dir=%s' % (driver, self.tmp_dir))]
+
+         print '%d atoms' % len(self.at)
+         print '%-12s %12s' % ('mode', 'time/ms')
+         for name, init_args in modes:
+            print '%-12s %12.2f' % (name, self.per_call(init_args))
+
+
+if __name__ == '__main__':
+   unittest.main()
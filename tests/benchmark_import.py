@@ -0,0 +1,70 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+
+# Measure the wall time and peak memory use of "import quippy" in
+# fresh Python processes, as paid by every short-lived script. Not
+# picked up by run_all.py; run directly with "python benchmark_import.py".
+
+import unittest, sys, subprocess, time
+from quippytest import *
+
+N_RUNS = 5
+
+# reports peak resident set size of the child in kB (Linux)
+MAXRSS = 'import resource; print resource.getrusage(resource.RUSAGE_SELF).ru_maxrss'
+
+class BenchmarkImport(QuippyTestCase):
+
+   def run_python(self, code):
+      t0 = time.time()
+      output = subprocess.check_output([sys.executable, '-c', code])
+      return time.time() - t0, int(output.split()[-1])
+
+   def cost(self, statement):
+      code = statement + '; ' + MAXRSS
+
+      # time the Python interpreter alone, to subtract from import times
+      t_python, rss_python = self.run_python(MAXRSS)
+
+      # first import may compile .pyc files, so is reported separately
+      t_first, rss_first = self.run_python(code)
+
+      times = []
+      rss = []
+      for i in range(N_RUNS):
+         t, r = self.run_python(code)
+         times.append(t)
+         rss.append(r)
+
+      print 'python -c "%s"' % statement
+      print '%-20s %10s %10s' % ('', 'time/s', 'maxrss/MB')
+      print '%-20s %10.3f %10.1f' % ('interpreter', t_python, rss_python/1024.0)
+      print '%-20s %10.3f %10.1f' % ('first import', t_first - t_python, rss_first/1024.0)
+      print '%-20s %10.3f %10.1f' % ('min import', min(times) - t_python, min(rss)/1024.0)
+      print '%-20s %10.3f %10.1f' % ('mean import', sum(times)/len(times) - t_python, sum(rss)/1024.0/len(rss))
+
+   def test_import(self):
+      self.cost('import quippy')
+
+   def test_import_star(self):
+      self.cost('from quippy import *')
+
+
+if __name__ == '__main__':
+   unittest.main()
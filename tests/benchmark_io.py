@@ -0,0 +1,95 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+
+# Compare write, sequential read, random access read and single
+# property extraction times for the trajectory file formats. Not
+# picked up by run_all.py; run directly with "python benchmark_io.py".
+
+from quippy import *
+import unittest, time, os, random
+from quippytest import *
+
+N_FRAMES = 100
+N_CELLS = 5 # 8*5**3 = 1000 atoms
+N_RANDOM = 20
+FORMATS = ['xyz', 'nc', 'qtraj']
+
+class BenchmarkIO(QuippyTestCase):
+
+   def setUp(self):
+      at0 = supercell(diamond(5.44, 14), N_CELLS, N_CELLS, N_CELLS)
+      at0.add_property('force', 0.0, n_cols=3)
+      self.frames = []
+      for i in range(N_FRAMES):
+         at = at0.copy()
+         at.pos[...] += 0.01*i
+         at.force[...] = 0.1*i
+         at.params['energy'] = float(i)
+         self.frames.append(at)
+      self.filenames = []
+
+   def tearDown(self):
+      for filename in self.filenames:
+         for f in (filename, filename+'.idx'):
+            if os.path.exists(f): os.remove(f)
+
+   def timed(self, func):
+      t0 = time.time()
+      func()
+      return time.time() - t0
+
+   def cost(self, format):
+      filename = 'benchmark.%s' % format
+      self.filenames.append(filename)
+      self.tearDown()
+
+      def write():
+         AtomsList(self.frames).write(filename)
+
+      def read():
+         for at in AtomsReader(filename, cache_mem_limit=0):
+            pass
+
+      def random_read():
+         ar = AtomsReader(filename, cache_mem_limit=0)
+         for i in range(N_RANDOM):
+            ar[random.randrange(len(ar))]
+
+      def get_array():
+         AtomsReader(filename, cache_mem_limit=0).get_array('pos')
+
+      def get_param():
+         AtomsReader(filename, cache_mem_limit=0).get_param('energy')
+
+      t_write = self.timed(write)
+      size = os.path.getsize(filename)/1024.0**2
+      print '%-8s %10.2f %10.3f %10.3f %10.3f %10.3f %10.3f' % (format, size, t_write, self.timed(read),
+                                                               self.timed(random_read), self.timed(get_array),
+                                                               self.timed(get_param))
+
+   def test_formats(self):
+      print '%d frames of %d atoms' % (N_FRAMES, self.frames[0].n)
+      print '%-8s %10s %10s %10s %10s %10s %10s' % ('format', 'size/MB', 'write/s', 'read/s',
+                                                    'random/s', 'array/s', 'param/s')
+      for format in FORMATS:
+         self.cost(format)
+
+
+if __name__ == '__main__':
+   unittest.main()
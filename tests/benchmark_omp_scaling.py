@@ -0,0 +1,73 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+# Strong scaling of the colour-partitioned OpenMP force loops in the
+# pairwise and three-body IPModels (see AtomColouring.f95): a fixed
+# Stillinger-Weber Si supercell is evaluated with 1, 2, 4, ... threads
+# up to the number available at startup (set OMP_NUM_THREADS to change
+# this). Not picked up by run_all.py; run directly with
+# "python benchmark_omp_scaling.py".
+
+from quippy import *
+import unittest, time, os
+from quippytest import *
+
+N_CELLS = 12 # 8*12**3 = 13824 atoms
+N_CALLS = 3
+
+PARAM_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          '..', 'share', 'Parameters', 'ip.parms.SW.xml')
+
+if hasattr(quippy, 'system_omp_set_num_threads'):
+
+   class BenchmarkOmpScaling(QuippyTestCase):
+
+      def setUp(self):
+         self.max_threads = system_omp_get_num_threads()
+         self.pot = Potential('IP SW', param_filename=PARAM_FILE)
+         self.at = supercell(diamond(5.44, 14), N_CELLS, N_CELLS, N_CELLS)
+         system_reseed_rng(2065775975)
+         randomise(self.at.pos, 0.1)
+         self.at.set_cutoff(self.pot.cutoff())
+         self.at.calc_connect()
+
+      def tearDown(self):
+         system_omp_set_num_threads(self.max_threads)
+
+      def time_calc(self, n_threads):
+         system_omp_set_num_threads(n_threads)
+         self.pot.calc(self.at, args_str="energy force virial")
+         t0 = time.time()
+         for i in range(N_CALLS):
+            self.pot.calc(self.at, args_str="energy force virial")
+         return (time.time() - t0)/N_CALLS
+
+      def test_strong_scaling(self):
+         n_threads = 1
+         t1 = None
+         while n_threads <= self.max_threads:
+            t = self.time_calc(n_threads)
+            if t1 is None:
+               t1 = t
+            print '%3d threads %d atoms %10.4f s/call  speedup %6.2fx  efficiency %5.1f%%' % \
+                  (n_threads, self.at.n, t, t1/t, 100.0*t1/t/n_threads)
+            n_threads *= 2
+
+
+if __name__ == '__main__':
+   unittest.main()
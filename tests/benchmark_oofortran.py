@@ -0,0 +1,94 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+# Measure the number of calls per second through the oo_fortran
+# wrappers for some small, frequently called routines. Not picked up
+# by run_all.py; run directly with "python benchmark_oofortran.py".
+
+from quippy import *
+import unittest, time
+from quippytest import *
+
+N_CALLS = 20000
+N_PROPERTIES = 60
+
+class BenchmarkOOFortran(QuippyTestCase):
+
+   def setUp(self):
+      self.at = supercell(diamond(5.44, 14), 2, 2, 2)
+      self.at.set_cutoff(3.0)
+      self.at.calc_connect()
+      self.d = Dictionary()
+      self.d['a'] = 1.0
+
+      # property-heavy objects, looking up the last key is the worst
+      # case for a linear scan over the keys
+      self.big_at = self.at.copy()
+      for i in range(N_PROPERTIES):
+         self.big_at.add_property('prop%d' % i, 0.0)
+      self.big_d = Dictionary()
+      for i in range(N_PROPERTIES):
+         self.big_d['key%d' % i] = float(i)
+
+   def rate(self, label, func):
+      t0 = time.time()
+      for i in xrange(N_CALLS):
+         func()
+      rate = N_CALLS/(time.time() - t0)
+      print '%-40s %12.0f calls/s' % (label, rate)
+      return rate
+
+   def test_n_neighbours(self):
+      self.rate('Atoms.n_neighbours(i)', lambda: self.at.n_neighbours(1))
+
+   def test_neighbour(self):
+      self.rate('Atoms.neighbour(i, n)', lambda: self.at.neighbour(1, 1))
+
+   def test_neighbour_kwargs(self):
+      self.rate('Atoms.neighbour(i, n, max_dist=...)', lambda: self.at.neighbour(1, 1, max_dist=3.0))
+
+   def test_connection_n_neighbours(self):
+      connect = self.at.connect
+      self.rate('Connection.n_neighbours_total()', lambda: connect.n_neighbours_total())
+
+   def test_has_property(self):
+      self.rate('Atoms.has_property(name)', lambda: self.at.has_property('pos'))
+
+   def test_dictionary_get_value(self):
+      self.rate('Dictionary.get_value(key)', lambda: self.d.get_value('a'))
+
+   def test_has_property_many(self):
+      self.rate('Atoms.has_property(name), %d props' % N_PROPERTIES,
+                lambda: self.big_at.has_property('PROP%d' % (N_PROPERTIES-1)))
+
+   def test_get_array_many(self):
+      name = 'prop%d' % (N_PROPERTIES-1)
+      self.rate('Dictionary.get_array(name), %d props' % N_PROPERTIES,
+                lambda: self.big_at.properties.get_array(name))
+
+   def test_dictionary_get_value_many(self):
+      key = 'KEY%d' % (N_PROPERTIES-1)
+      self.rate('Dictionary.get_value(key), %d keys' % N_PROPERTIES,
+                lambda: self.big_d.get_value(key))
+
+   def test_distance_min_image(self):
+      self.rate('Atoms.distance_min_image(i, j)', lambda: self.at.distance_min_image(1, 2))
+
+
+if __name__ == '__main__':
+   unittest.main()
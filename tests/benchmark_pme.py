@@ -0,0 +1,74 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+# Scaling of the smooth particle-mesh Ewald sum (IP Coulomb method=pme)
+# from 1k to 1M charges in alpha-quartz supercells, with the classic
+# Ewald sum (method=ewald) timed alongside for the smaller cells. The
+# largest cell needs several GB of memory; set PME_MAX_ATOMS to stop
+# earlier. Not picked up by run_all.py; run directly with
+# "python benchmark_pme.py".
+
+from quippy import *
+import unittest, time, os
+from quippytest import *
+
+N_CELLS = [5, 10, 22, 48] # 9*n**3 = 1125 ... 995328 atoms
+EWALD_MAX_ATOMS = 10000
+PME_MAX_ATOMS = int(os.environ.get('PME_MAX_ATOMS', 1000000))
+
+XML = """
+<Coulomb_params n_types="2" cutoff="10.0" ewald_error="1e-6" label="default">
+  <per_type_data type="1" atomic_num="8" charge="-1.2" />
+  <per_type_data type="2" atomic_num="14" charge="2.4" />
+</Coulomb_params>
+"""
+
+if hasattr(quippy, 'Potential'):
+
+   class BenchmarkPME(QuippyTestCase):
+
+      def setUp(self):
+         self.pot_pme = Potential('IP Coulomb method=pme', param_str=XML)
+         self.pot_ewald = Potential('IP Coulomb method=ewald', param_str=XML)
+         self.quartz = alpha_quartz(a=4.9160, c=5.4054, u=0.4697, x=0.4135, y=0.2669, z=0.1191)
+
+      def time_calc(self, pot, at):
+         t0 = time.time()
+         pot.calc(at, args_str="energy force virial")
+         return time.time() - t0
+
+      def test_scaling(self):
+         system_reseed_rng(2065775975)
+         for n in N_CELLS:
+            if 9*n**3 > PME_MAX_ATOMS:
+               break
+            at = supercell(self.quartz, n, n, n)
+            randomise(at.pos, 0.1)
+            at.set_cutoff(10.0)
+            at.calc_connect()
+
+            t_pme = self.time_calc(self.pot_pme, at)
+            line = '%8d charges  pme %10.3f s %8.2f us/charge' % (at.n, t_pme, t_pme/at.n*1e6)
+            if at.n <= EWALD_MAX_ATOMS:
+               t_ewald = self.time_calc(self.pot_ewald, at)
+               line += '  ewald %10.3f s  speedup %8.1fx' % (t_ewald, t_ewald/t_pme)
+            print line
+
+
+if __name__ == '__main__':
+   unittest.main()
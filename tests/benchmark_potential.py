@@ -0,0 +1,72 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+
+# Measure the per-call overhead of the ASE calculator interface of
+# Potential, with and without zero_copy, relative to calling
+# Potential.calc() directly with preallocated arrays. Not picked up by
+# run_all.py; run directly with "python benchmark_potential.py".
+
+from quippy import *
+from quippy.potential import all_changes
+import unittest, time
+from quippytest import *
+
+N_CELLS = [1, 2, 3, 4] # 8*n**3 = 8 ... 512 atoms
+N_CALLS = 1000
+PROPERTIES = ['energy', 'forces']
+
+if hasattr(quippy, 'Potential'):
+
+   class BenchmarkPotential(QuippyTestCase):
+
+      def per_call(self, func):
+         t0 = time.time()
+         for i in xrange(N_CALLS):
+            func()
+         return (time.time() - t0)/N_CALLS*1.0e6
+
+      def test_zero_copy(self):
+         print '%-8s %12s %12s %12s %12s' % ('n_atoms', 'calc/us', 'copy/us', 'zero_copy/us', 'saved/us')
+         for n in N_CELLS:
+            at = supercell(diamond(5.44, 14), n, n, n)
+            at.rattle(0.01)
+
+            pot = Potential('IP SW', calculation_always_required=True)
+            pot_zero_copy = Potential('IP SW', calculation_always_required=True, zero_copy=True)
+            at.set_cutoff(pot.cutoff())
+            at.calc_connect()
+
+            energy = farray(0.0)
+            force = fzeros((3, len(at)))
+            def direct():
+               pot.calc(at, energy=energy, force=force)
+
+            def calculator(pot):
+               def calculate():
+                  pot.calculate(at, PROPERTIES, all_changes)
+               return calculate
+
+            t_direct = self.per_call(direct)
+            t_copy = self.per_call(calculator(pot))
+            t_zero_copy = self.per_call(calculator(pot_zero_copy))
+            print '%-8d %12.1f %12.1f %12.1f %12.1f' % (len(at), t_direct, t_copy, t_zero_copy, t_copy - t_zero_copy)
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,77 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+
+# Measure the per-call cost of SocketPot in persistent binary mode,
+# talking to a SocketPotServer on the loopback interface, compared to
+# evaluating the same Potential directly in this process. The
+# difference is the communication overhead per force call. Not picked
+# up by run_all.py; run directly with "python benchmark_socketpot.py".
+
+from quippy import *
+from quippy.socketpot import start_local_server
+import unittest, time
+from quippytest import *
+
+N_CELLS = [1, 2, 4, 8] # 8*n**3 = 8 ... 4096 atoms
+N_CALLS = 200
+
+if hasattr(quippy, 'Potential'):
+
+   class BenchmarkSocketPot(QuippyTestCase):
+
+      def setUp(self):
+         self.proc, port = start_local_server('IP SW')
+         self.pot = Potential('IP SW')
+         self.socketpot = Potential('SocketPot persistent server_ip=127.0.0.1 server_port=%d' % port)
+
+      def tearDown(self):
+         del self.socketpot
+         self.proc.terminate()
+         self.proc.join()
+
+      def per_call(self, func):
+         t0 = time.time()
+         for i in xrange(N_CALLS):
+            func()
+         return (time.time() - t0)/N_CALLS*1.0e6
+
+      def test_overhead(self):
+         print '%-8s %12s %12s %12s' % ('n_atoms', 'direct/us', 'socket/us', 'overhead/us')
+         for n in N_CELLS:
+            at = supercell(diamond(5.44, 14), n, n, n)
+            at.rattle(0.01)
+
+            energy = farray(0.0)
+            force = fzeros((3, len(at)))
+            virial = fzeros((3, 3))
+
+            def direct():
+               self.pot.calc(at, energy=energy, force=force, virial=virial)
+
+            def socket():
+               self.socketpot.calc(at, energy=energy, force=force, virial=virial)
+
+            socket() # first call sends the full frame
+            t_direct = self.per_call(direct)
+            t_socket = self.per_call(socket)
+            print '%-8d %12.1f %12.1f %12.1f' % (len(at), t_direct, t_socket, t_socket - t_direct)
+
+
+if __name__ == '__main__':
+   unittest.main()
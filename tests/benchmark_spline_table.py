@@ -0,0 +1,63 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+# Compare the per-pair cost of the EAM_ErcolAd potential evaluated
+# through the binary search in spline_value/spline_deriv with the same
+# potential resampled onto uniform grid tables (tabulate=T). Not picked
+# up by run_all.py; run directly with "python benchmark_spline_table.py".
+
+from quippy import *
+import unittest, time, os
+from quippytest import *
+
+N_CELLS = 30 # 4*30**3 = 108000 atoms
+N_CALLS = 3
+
+PARAM_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          '..', 'share', 'Parameters', 'ip.parms.EAM_ErcolAd.xml')
+
+class BenchmarkSplineTable(QuippyTestCase):
+
+   def setUp(self):
+      self.xml = open(PARAM_FILE).read()
+      self.at = supercell(fcc(4.05, 13), N_CELLS, N_CELLS, N_CELLS)
+      system_reseed_rng(2065775975)
+      randomise(self.at.pos, 0.1)
+      pot = Potential('IP EAM_ErcolAd', param_str=self.xml)
+      self.at.set_cutoff(pot.cutoff())
+      self.at.calc_connect()
+      self.n_pairs = self.at.connect.n_neighbours_total()
+
+   def cost(self, label, init_args):
+      pot = Potential(init_args, param_str=self.xml)
+      pot.calc(self.at, args_str="energy force virial")
+      t0 = time.time()
+      for i in range(N_CALLS):
+         pot.calc(self.at, args_str="energy force virial")
+      cost = (time.time() - t0)/N_CALLS/self.n_pairs
+      print '%-40s %d atoms %10.1f ns/pair' % (label, self.at.n, cost*1e9)
+      return cost
+
+   def test_spline_vs_table(self):
+      spline = self.cost('Spline (binary search)', 'IP EAM_ErcolAd')
+      table = self.cost('SplineTable (tabulate=T)', 'IP EAM_ErcolAd tabulate=T')
+      print '%-40s %10.2fx' % ('speedup', spline/table)
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,70 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# Scaling of linear-scaling tight binding (TB solver=FOE, Chebyshev
+# Fermi-operator expansion on sparse matrices) with the Bowler Si
+# model, from 1k to 22k atoms, with dense diagonalisation
+# (solver=DIAG) timed alongside for the smallest cell. Set
+# FOE_MAX_ATOMS to stop earlier. Not picked up by run_all.py; run
+# directly with "python benchmark_tb_foe.py".
+
+from quippy import *
+import unittest, time, os
+from quippytest import *
+
+N_CELLS = [5, 7, 10, 14] # 8*n**3 = 1000 ... 21952 atoms
+DIAG_MAX_ATOMS = 1000
+FOE_MAX_ATOMS = int(os.environ.get('FOE_MAX_ATOMS', 22000))
+FERMI_T = 0.2
+
+PARAM_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          '..', 'share', 'Parameters', 'tightbind.parms.Bowler.xml')
+
+if hasattr(quippy, 'Potential'):
+
+   class BenchmarkTB_FOE(QuippyTestCase):
+
+      def setUp(self):
+         self.pot = Potential('TB Bowler', param_filename=PARAM_FILE)
+
+      def time_calc(self, at, solver):
+         t0 = time.time()
+         self.pot.calc(at, args_str="energy force solver=%s fermi_T=%f" % (solver, FERMI_T))
+         return time.time() - t0
+
+      def test_scaling(self):
+         system_reseed_rng(2065775975)
+         for n in N_CELLS:
+            if 8*n**3 > FOE_MAX_ATOMS:
+               break
+            at = supercell(diamond(5.43, 14), n, n, n)
+            randomise(at.pos, 0.1)
+            at.set_cutoff(self.pot.cutoff())
+            at.calc_connect()
+
+            t_foe = self.time_calc(at, 'FOE')
+            e_foe = at.energy
+            line = '%8d atoms  foe %10.3f s %8.2f ms/atom  n_cheb %d' % (at.n, t_foe, t_foe/at.n*1e3,
+                                                                         at.params['foe_n_cheb'])
+            if at.n <= DIAG_MAX_ATOMS:
+               t_diag = self.time_calc(at, 'DIAG')
+               line += '  diag %10.3f s  dE/atom %.4f eV' % (t_diag, abs(e_foe - at.energy)/at.n)
+            print line
+
+
+if __name__ == '__main__':
+   unittest.main()
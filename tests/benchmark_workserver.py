@@ -0,0 +1,93 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+
+# Measure the throughput of WorkServer with local PotentialWorker
+# clients for a set of atom-centred clusters, compared to evaluating
+# the clusters serially in this process. Not picked up by run_all.py;
+# run directly with "python benchmark_workserver.py".
+
+from quippy import *
+from quippy.lotf import iter_atom_centered_clusters
+from quippy.workserver import (WorkServer, start_local_workers, pack_atoms,
+                               unpack_atoms, pack_results, unpack_results)
+import unittest, time
+from quippytest import *
+
+N_CELLS = 3 # 8*3**3 = 216 clusters
+BUFFER_HOPS = 3
+N_WORKERS = [1, 2, 4]
+DEPTH = 2
+N_REPEAT = 3
+
+if hasattr(quippy, 'Potential'):
+
+   class BenchmarkWorkServer(QuippyTestCase):
+
+      def setUp(self):
+         self.pot = Potential('IP SW')
+         at = supercell(diamond(5.44, 14), N_CELLS, N_CELLS, N_CELLS)
+         at.rattle(0.05)
+         at.set_cutoff(self.pot.cutoff())
+         at.calc_connect()
+         self.clusters = list(iter_atom_centered_clusters(at, buffer_hops=BUFFER_HOPS, randomise_buffer=False))
+         self.keys = range(len(self.clusters))
+
+      def test_pack(self):
+         t0 = time.time()
+         for c in self.clusters:
+            unpack_results(bytearray(pack_results(0.0, c.pos, fzeros((3,3)))), c)
+            unpack_atoms(bytearray(pack_atoms(c)))
+         t_pack = (time.time() - t0)/len(self.clusters)*1e6
+         print 'pack+unpack job and results %.1f us/cluster' % t_pack
+
+      def test_throughput(self):
+         n_clusters = len(self.clusters)
+         print '%d clusters of mean size %.1f atoms' % (n_clusters,
+                                                        float(sum([c.n for c in self.clusters]))/n_clusters)
+
+         t0 = time.time()
+         for r in range(N_REPEAT):
+            for c in self.clusters:
+               self.pot.calc(c, args_str='energy force virial')
+         t_serial = time.time() - t0
+         print '%-10s %10s %14s' % ('workers', 'time/s', 'clusters/s')
+         print '%-10s %10.3f %14.1f' % ('serial', t_serial, N_REPEAT*n_clusters/t_serial)
+
+         for n_workers in N_WORKERS:
+            server = WorkServer(address=('localhost', 0), depth=DEPTH)
+            server.start()
+            workers = start_local_workers(server.port, n_workers, 'IP SW')
+            try:
+               # first pass establishes connections and cluster affinity
+               server.calc_all(self.clusters, self.keys)
+
+               t0 = time.time()
+               for r in range(N_REPEAT):
+                  server.calc_all(self.clusters, self.keys)
+               t = time.time() - t0
+            finally:
+               server.shutdown()
+               for w in workers:
+                  w.join()
+
+            print '%-10d %10.3f %14.1f' % (n_workers, t, N_REPEAT*n_clusters/t)
+
+
+if __name__ == '__main__':
+   unittest.main()
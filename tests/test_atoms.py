@@ -833,6 +833,38 @@ class TestAtoms_Neighbour(QuippyTestCase):
    def test_high_level_shift_12(self):
       self.assertArrayAlmostEqual(self.at.neighbours[1][4].shift, [0, 0, 0])
 
+   def test_neighbour_csr(self):
+      i_index, j, shift, distance, diff = self.at.connect.neighbour_csr()
+      self.assertEqual(list(i_index), range(0, 4*self.at.n+1, 4))
+      for k, i in enumerate(self.at.indices):
+         neighbours = self.at.neighbours[i]
+         s = slice(i_index[k], i_index[k+1])
+         self.assertEqual(list(j[s]), [n.j for n in neighbours])
+         self.assertArrayAlmostEqual(distance[s], [n.distance for n in neighbours])
+         self.assertArrayAlmostEqual(diff[s], [n.diff for n in neighbours])
+         self.assertArrayAlmostEqual(shift[s], [n.shift for n in neighbours])
+
+   def test_neighbour_csr_cutoff(self):
+      i_index, j, shift, distance, diff = self.at.connect.neighbour_csr(cutoff=1.0)
+      self.assertEqual(list(i_index), [0]*(self.at.n+1))
+      self.assertEqual(len(j), 0)
+
+   def test_neighbour_csr_species(self):
+      self.at.set_atoms([14, 6]*4)
+      self.at.calc_connect()
+      i_index, j, shift, distance, diff = self.at.connect.neighbour_csr(Z1=14, Z2=6)
+      self.assertEqual(list(np.diff(i_index)), [4, 0]*4)
+      i_index, j, shift, distance, diff = self.at.connect.neighbour_csr(Z1=14, Z2=14)
+      self.assertEqual(len(j), 0)
+
+   def test_pairs(self):
+      pairs = list(self.at.connect.pairs())
+      self.assertEqual(len(pairs), 2*self.at.n)
+      self.assert_(all([i < j for (i, j) in pairs]))
+
+   def test_distances(self):
+      self.assertArrayAlmostEqual(list(self.at.connect.distances()), [self.bond_length]*2*self.at.n)
+
    def test_neighbours_cutoff_skin(self):
       ar = AtomsReader("""6
 Lattice="8.6535 0.0 0.0   0.0 8.6535 0.0   0.0 0.0 8.6535" Properties=Z:I:1:pos:R:3
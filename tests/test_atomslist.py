@@ -17,10 +17,13 @@ set# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
 # HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
 
 from quippy import *
-import unittest, itertools, sys, quippy
+import unittest, itertools, sys, operator, quippy
 from quippytest import *
 import os
 
+def frame_volume(at):
+   return at.get_volume()
+
 class TestAtomsList(QuippyTestCase):
 
    def setUp(self):
@@ -178,5 +181,105 @@ class TestAtomsList(QuippyTestCase):
       self.assert_(p.parent() is None)
       self.assertRaises(RuntimeError, p.__getitem__, 1)
       
+   def testatomsreader_cache_info(self):
+      self.listal.write('test.xyz')
+      ar = AtomsReader('test.xyz')
+      ar[0]; ar[1]; ar[0]
+      info = ar.cache_info()
+      self.assertEqual(info['hits'], 1)
+      self.assertEqual(info['misses'], 2)
+      self.assertEqual(info['mem_usage'], ar[0].mem_estimate() + ar[1].mem_estimate())
+
+   def testatomsreader_map(self):
+      self.listal.write('test.xyz')
+      ar = AtomsReader('test.xyz')
+      self.assertEqual(ar.map(frame_volume, nprocs=2, chunksize=2),
+                       [at.get_volume() for at in self.listal])
+
+   def testatomsreader_map_slice(self):
+      self.listal.write('test.xyz')
+      ar = AtomsReader('test.xyz', start=1, step=2)
+      self.assertEqual(ar.map(frame_volume, nprocs=2, chunksize=1),
+                       [at.get_volume() for at in self.listal[1::2]])
+
+   def testatomsreader_map_serial(self):
+      self.assertEqual(self.genal.map(frame_volume, nprocs=2),
+                       [at.get_volume() for at in self.listal])
+
+   def testatomsreader_reduce(self):
+      self.listal.write('test.xyz')
+      ar = AtomsReader('test.xyz')
+      self.assertAlmostEqual(ar.reduce(frame_volume, operator.add, nprocs=2, chunksize=2),
+                             sum([at.get_volume() for at in self.listal]))
+
+
+class TestFrameCache(QuippyTestCase):
+
+   def setUp(self):
+      self.frames = [diamond(5.44+0.01*x, 14) for x in range(5)]
+      self.nbytes = self.frames[0].mem_estimate()
+
+   def tearDown(self):
+      if os.path.exists('test.xyz'):
+         os.unlink('test.xyz')
+
+   def testfetchmiss(self):
+      cache = FrameCache()
+      self.assert_(cache.fetch(0) is None)
+      self.assertEqual(cache.misses, 1)
+
+   def testfetchhit(self):
+      cache = FrameCache()
+      cache.store(0, self.frames[0])
+      self.assert_(cache.fetch(0) is self.frames[0])
+      self.assertEqual(cache.hits, 1)
+
+   def testdefaultlimit(self):
+      cache = FrameCache()
+      cache.store(0, self.frames[0])
+      self.assertEqual(cache.mem_limit, 10*self.nbytes)
+
+   def testevictlru(self):
+      cache = FrameCache(3*self.nbytes)
+      for i in range(3):
+         cache.store(i, self.frames[i])
+      cache.fetch(0)
+      cache.store(3, self.frames[3])
+      self.assert_(1 not in cache)
+      self.assert_(0 in cache)
+      self.assertEqual(len(cache), 3)
+      self.assertEqual(cache.evictions, 1)
+      self.assertEqual(cache.mem_usage, 3*self.nbytes)
+
+   def testzerolimit(self):
+      cache = FrameCache(0)
+      for i in range(5):
+         cache.store(i, self.frames[i])
+      self.assertEqual(len(cache), 1)
+      self.assert_(4 in cache)
+
+   def testunlimited(self):
+      cache = FrameCache(None)
+      for i in range(5):
+         cache.store(i, self.frames[i])
+      self.assertEqual(len(cache), 5)
+      self.assertEqual(cache.mem_usage, 5*self.nbytes)
+
+   def testrestore(self):
+      cache = FrameCache(None)
+      cache.store(0, self.frames[0])
+      cache.store(0, self.frames[1])
+      self.assertEqual(len(cache), 1)
+      self.assertEqual(cache.mem_usage, self.nbytes)
+
+   def testsequenceshared(self):
+      AtomsList(self.frames).write('test.xyz')
+      ar = AtomsReader(['test.xyz', 'test.xyz'])
+      ar[0]; ar[5]
+      cache = ar.reader.cache
+      self.assert_(all(reader._cache is cache for reader in ar.reader.readers))
+      self.assertEqual(len(cache), 2)
+
+
 if __name__ == '__main__':
    unittest.main()
@@ -573,6 +573,16 @@ class TestReadGeom(QuippyTestCase):
       a, = AtomsList(self.geom_lines, format='geom')
       self.assertEqual(self.at, a)
 
+   def testrandomaccess(self):
+      r = AtomsReader(self.geom_lines, format='geom')
+      self.assertEqual(len(r), 1)
+      self.assertEqual(r[0], self.at)
+
+   def testblocks(self):
+      a, = castep.CastepGeomReader(self.geom_lines, blocks=[])
+      self.assert_(not a.has_property('force'))
+      self.assertArrayAlmostEqual(a.pos, self.at.pos)
+
 class TestReadMD(QuippyTestCase):
    def setUp(self):
       self.md_lines = """ BEGIN header
@@ -1743,6 +1753,76 @@ NB est. 0K energy (E-0.5TS)      =  -2999.310130074     eV
       self.assertAlmostEqual(a.energy, self.al[0].energy)
       self.assertArrayAlmostEqual(a.force, self.al[0].force)
 
+   def testlen(self):
+      r = castep.CastepOutputReader(self.lines, abort=False)
+      self.assertEqual(len(r), 3)
+
+   def testrandomaccess(self):
+      r = castep.CastepOutputReader(self.lines, abort=False)
+      self.assertAlmostEqual(r[2].energy, self.al[2].energy)
+      self.assertArrayAlmostEqual(r[2].pos, self.al[2].pos)
+      self.assertArrayAlmostEqual(r[-1].force, self.al[2].force)
+      self.assertAlmostEqual(r[0].energy, self.al[0].energy)
+
+   def testblocks(self):
+      r = castep.CastepOutputReader(self.lines, abort=False, blocks=['stress'])
+      a = r[1]
+      self.assert_(not a.has_property('force'))
+      self.assertAlmostEqual(a.energy, self.al[1].energy)
+      self.assertArrayAlmostEqual(a.pos, self.al[1].pos)
+
+   def testunindentedheaders(self):
+      lines = [x.lstrip() if '****** Forces ******' in x or '****** Stress Tensor ******' in x else x
+               for x in self.lines]
+      r = castep.CastepOutputReader(lines, abort=False)
+      self.assertArrayAlmostEqual(r[2].force, self.al[2].force)
+      self.assertArrayAlmostEqual(r[2].virial, self.al[2].virial)
+
+   def testbadforces(self):
+      lines = self.lines[:]
+      i = [i for i, x in enumerate(lines) if '****** Forces ******' in x][0]
+      lines[i+6] = ' * bad force line *\n'
+      r = castep.CastepOutputReader(lines, abort=False)
+      self.assertAlmostEqual(r[0].energy, self.al[0].energy)
+      self.assertArrayAlmostEqual(r[1].force, self.al[1].force)
+
+   def testindex(self):
+      open('test.castep', 'w').writelines(self.lines)
+      try:
+         r = castep.CastepOutputReader('test.castep', abort=False)
+         r.close()
+         self.assert_(os.path.exists('test.castep.idx'))
+         offsets, flags = castep._read_frame_index('test.castep.idx')
+         self.assertEqual(offsets, r.offsets)
+
+         ar = AtomsReader('test.castep', format='castep', abort=False)
+         self.assertEqual(len(ar), 3)
+         self.assertAlmostEqual(ar[1].energy, self.al[1].energy)
+         ar.close()
+      finally:
+         for filename in ('test.castep', 'test.castep.idx'):
+            if os.path.exists(filename):
+               os.remove(filename)
+
+   def testindexappend(self):
+      half = len(self.lines)/2
+      open('test.castep', 'w').writelines(self.lines[:half])
+      try:
+         r = castep.CastepOutputReader('test.castep', abort=False)
+         self.assert_(len(r) < 3)
+         r.close()
+
+         open('test.castep', 'a').writelines(self.lines[half:])
+         r = castep.CastepOutputReader('test.castep', abort=False)
+         self.assertEqual(len(r), 3)
+         self.assertEqual(r.offsets, castep.CastepOutputReader(self.lines, abort=False).offsets)
+         self.assertAlmostEqual(r[2].energy, self.al[2].energy)
+         r.close()
+      finally:
+         for filename in ('test.castep', 'test.castep.idx'):
+            if os.path.exists(filename):
+               os.remove(filename)
+
 
 if __name__ == '__main__':
    unittest.main()
@@ -172,6 +172,68 @@ class TestBFSGrow(QuippyTestCase):
       self.assertEqual(res1, res2)
 
 
+class TestBFSAtomCentred(QuippyTestCase):
+
+   def setUp(self):
+      self.at = supercell(diamond(5.44, 14), 3, 3, 3)
+      self.at.set_cutoff(5.0)
+      self.at.calc_connect()
+      self.centres = [1, 5, 17, 100]
+
+   def test_matches_bfs_grow(self):
+      hops = self.at.bfs_atom_centred(self.centres, 3)
+      for k, centre in enumerate(self.centres):
+         rows = hops.int[:,(hops.int[1,:] == k+1).nonzero()[0]]
+         ref = self.at.bfs_grow_single(atom=centre, n=3)
+         self.assertEqual(sorted([tuple(r) for r in rows[2:5,:].T]),
+                          sorted([tuple(r) for r in ref.int.T]))
+
+   def test_hops(self):
+      hops = self.at.bfs_atom_centred(self.centres, 2)
+      for k, centre in enumerate(self.centres):
+         rows = hops.int[:,(hops.int[1,:] == k+1).nonzero()[0]]
+         self.assertEqual(list(rows[2:6,1]), [centre, 0, 0, 0, 0])
+         self.assertEqual(list(rows[6,:]), sorted(rows[6,:]))
+         self.assertEqual(list(rows[6,:]).count(1), 4)
+
+   def test_min_images_only(self):
+      hops = self.at.bfs_atom_centred(self.centres, 3, min_images_only=True)
+      for k, centre in enumerate(self.centres):
+         rows = hops.int[:,(hops.int[1,:] == k+1).nonzero()[0]]
+         self.assertEqual(len(set(rows[2,:])), rows.shape[1])
+
+
+class TestUpdateClusterPositions(QuippyTestCase):
+
+   def setUp(self):
+      system_reseed_rng(2065775975)
+      self.at = supercell(diamond(5.44, 14), 3, 3, 3)
+      self.at.rattle(0.05)
+      self.at.set_cutoff(5.0)
+      self.at.calc_connect()
+      self.args_str = 'buffer_hops=2 randomise_buffer=F'
+
+      self.at.add_property('hybrid_mark', HYBRID_NO_MARK)
+      self.at.hybrid_mark[1] = HYBRID_ACTIVE_MARK
+      create_hybrid_weights(self.at, self.args_str)
+      self.cluster = create_cluster_simple(self.at, self.args_str)
+
+   def test_unchanged(self):
+      pos = self.cluster.pos.copy()
+      update_cluster_positions(self.at, self.args_str, self.cluster)
+      self.assertArrayAlmostEqual(self.cluster.pos, pos)
+
+   def test_moved(self):
+      self.at.rattle(0.02)
+      self.at.calc_connect()
+      update_cluster_positions(self.at, self.args_str, self.cluster)
+      ref = create_cluster_simple(self.at, self.args_str)
+      self.assertArrayAlmostEqual(self.cluster.z, ref.z)
+      self.assertArrayAlmostEqual(self.cluster.index, ref.index)
+      self.assertArrayAlmostEqual(self.cluster.lattice, ref.lattice)
+      self.assertArrayAlmostEqual(self.cluster.pos, ref.pos)
+
+
 class TestCluster_TerminateFalse(QuippyTestCase):
    
    def setUp(self):
@@ -0,0 +1,128 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+
+from quippy import *
+from quippy.crack import (irwin_modeI_stress_components, irwin_modeI_crack_tip_stress_field,
+                          IRWIN_PARAMS, CrackTipStressFitter, fit_crack_trajectory)
+import unittest
+import numpy as np
+from quippytest import *
+
+try:
+   import scipy
+except ImportError:
+   scipy = None
+
+def irwin_atoms(n, K, x0, y0, sxx0, syy0, sxy0, seed=0):
+   rs = np.random.RandomState(seed)
+   pos = np.c_[rs.uniform(-40.0, 40.0, n), rs.uniform(-40.0, 40.0, n), rs.uniform(0.0, 5.0, n)]
+   at = Atoms(n=n, lattice=np.diag([100.0, 100.0, 10.0]))
+   at.set_atomic_numbers([14]*n)
+   at.set_positions(pos)
+   sigma = np.zeros((n, 3, 3))
+   s = irwin_modeI_stress_components(pos[:,0], pos[:,1], K, x0, y0, sxx0, syy0, sxy0)
+   sigma[:,0,0], sigma[:,1,1], sigma[:,0,1], sigma[:,1,0] = s[:,0], s[:,1], s[:,2], s[:,2]
+   return at, sigma
+
+
+class TestIrwinStressComponents(QuippyTestCase):
+
+   def setUp(self):
+      rs = np.random.RandomState(1)
+      self.x = rs.uniform(-30.0, 30.0, 100)
+      self.y = rs.uniform(-30.0, 30.0, 100)
+      self.p = np.array([1.3, 2.0, -1.0, 0.1, 0.2, 0.05])
+
+   def test_matches_irwin_field(self):
+      K, x0, y0, sxx0, syy0, sxy0 = self.p
+      r = np.sqrt((self.x - x0)**2 + (self.y - y0)**2)
+      t = np.arctan2(self.y - y0, self.x - x0)
+      ref = irwin_modeI_crack_tip_stress_field(K, r, t)
+      s = irwin_modeI_stress_components(self.x, self.y, *self.p)
+      self.assertArrayAlmostEqual(s[:,0], ref[:,0,0] + sxx0)
+      self.assertArrayAlmostEqual(s[:,1], ref[:,1,1] + syy0)
+      self.assertArrayAlmostEqual(s[:,2], ref[:,0,1] + sxy0)
+
+   def test_jacobian(self):
+      s, jac = irwin_modeI_stress_components(self.x, self.y, *self.p, jacobian=True)
+      h = 1e-6
+      for k in range(len(IRWIN_PARAMS)):
+         dp = np.zeros(len(IRWIN_PARAMS))
+         dp[k] = h
+         fd = (irwin_modeI_stress_components(self.x, self.y, *(self.p + dp)) -
+               irwin_modeI_stress_components(self.x, self.y, *(self.p - dp)))/(2*h)
+         self.assertArrayAlmostEqual(jac[...,k], fd, tol=1e-6)
+
+
+if scipy is not None:
+
+   class TestCrackTipStressFitter(QuippyTestCase):
+
+      def setUp(self):
+         self.true = dict(zip(IRWIN_PARAMS, [1.3, 2.0, -1.0, 0.1, 0.2, 0.05]))
+         self.guess = dict(zip(IRWIN_PARAMS, [1.0, 3.0, 0.0, 0.0, 0.0, 0.0]))
+
+      def test_fit(self):
+         at, sigma = irwin_atoms(2000, **self.true)
+         fitter = CrackTipStressFitter(r_range=(5.0, 30.0))
+         params = fitter.fit(at, sigma=sigma, initial_params=self.guess)
+         for key in IRWIN_PARAMS:
+            self.assertAlmostEqual(params[key], self.true[key], places=5)
+
+      def test_fix_params(self):
+         at, sigma = irwin_atoms(2000, **self.true)
+         fitter = CrackTipStressFitter(r_range=(5.0, 30.0), fix_params={'y0': -1.0})
+         params = fitter.fit(at, sigma=sigma, initial_params=self.guess)
+         self.assertEqual(params['y0'], -1.0)
+         self.assertAlmostEqual(params['x0'], self.true['x0'], places=5)
+
+      def test_annulus_reuse(self):
+         at, sigma = irwin_atoms(2000, **self.true)
+         fitter = CrackTipStressFitter(r_range=(5.0, 30.0), skin=2.0)
+         fitter.fit(at, sigma=sigma, initial_params=self.guess)
+         fitter.fit(at, sigma=sigma)
+         self.assertEqual(fitter.stats['fits'], 2)
+         self.assertEqual(fitter.stats['selections'], 1)
+         r = np.sqrt((at.positions[:,0] - self.true['x0'])**2 + (at.positions[:,1] - self.true['y0'])**2)
+         self.assertEqual(sorted(fitter.select(at, self.true['x0'], self.true['y0'])),
+                          list(np.nonzero((r > 5.0) & (r < 30.0))[0]))
+
+      def test_trajectory(self):
+         frames = []
+         for i, x0 in enumerate([2.0, 2.5, 3.0, 3.5]):
+            params = dict(self.true)
+            params['x0'] = x0
+            at, sigma = irwin_atoms(1000, seed=i, **params)
+            at.add_property('stress_voigt', 0.0, n_cols=6)
+            for k, (ii, jj) in enumerate([(0,0), (1,1), (2,2), (1,2), (0,2), (0,1)]):
+               at.stress_voigt[k+1,:] = sigma[:,ii,jj]
+            frames.append(at)
+
+         K, crack_pos, sigma0 = fit_crack_trajectory(frames, r_range=(5.0, 30.0),
+                                                     stress_property='stress_voigt',
+                                                     initial_params=self.guess)
+         self.assertArrayAlmostEqual(K, [self.true['K']]*4)
+         self.assertArrayAlmostEqual(crack_pos[:,0], [2.0, 2.5, 3.0, 3.5])
+         self.assertArrayAlmostEqual(crack_pos[:,1], [self.true['y0']]*4)
+         self.assertArrayAlmostEqual(crack_pos[:,2], [5.0]*4)
+         self.assertArrayAlmostEqual(sigma0, [[self.true['sxx0'], self.true['syy0'], self.true['sxy0']]]*4)
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -209,6 +209,41 @@ c=44""")
       self.assert_(d['b'] == 'two')
       self.assert_(d['c'] is None)
 
+   def test_many_keys(self):
+      d = Dictionary()
+      for i in range(60):
+         d['Key%d' % i] = i
+      self.assertEqual(d.keys(), ['Key%d' % i for i in range(60)])
+      for i in range(60):
+         self.assertEqual(d.get_value('KEY%d' % i), i)
+      d['key5'] = -5
+      self.assertEqual(len(d), 60)
+      self.assertEqual(d['Key5'], -5)
+
+   def test_remove_many(self):
+      d = Dictionary()
+      for i in range(60):
+         d['Key%d' % i] = i
+      for i in range(0, 60, 3):
+         del d['key%d' % i]
+      remaining = [i for i in range(60) if i % 3 != 0]
+      self.assertEqual(d.keys(), ['Key%d' % i for i in remaining])
+      for i in remaining:
+         self.assertEqual(d.get_value('key%d' % i), i)
+      self.assert_('key0' not in d)
+      d['Key0'] = 100
+      self.assertEqual(d.get_value('key0'), 100)
+
+   def test_swap(self):
+      d = Dictionary()
+      for i in range(20):
+         d['Key%d' % i] = i
+      d.swap('key1', 'KEY19')
+      self.assertEqual(d.keys()[1], 'Key19')
+      self.assertEqual(d.keys()[19], 'Key1')
+      for i in range(20):
+         self.assertEqual(d.get_value('key%d' % i), i)
+
    @skip
    def test_dict_in_dict(self):
       d = Dictionary()
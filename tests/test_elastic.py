@@ -172,5 +172,61 @@ class TestElasticFieldsCubic(QuippyTestCase):
      self.check_strain([1,0,0,0,0,1], self.C_relaxed, True)
 
 
+class TestElasticFieldsPython(QuippyTestCase):
+
+  def setUp(self):
+     self.a = 5.43094977
+     self.C = fzeros((6,6))
+     self.C[1:3,1:3] = 76.57244456
+     for i in frange(3):
+        self.C[i,i] = 151.4276439
+        self.C[i+3,i+3] = 109.85498798
+
+     at = supercell(diamond(self.a, 14), 3, 3, 3)
+     self.at = transform(at, strain_matrix([1e-3, 0.0, -2e-3, 1e-3, 0.0, 5e-4]))
+     numpy.random.seed(1)
+     self.at.rattle(0.01)
+
+     self.ref = self.at.copy()
+     self.ref.set_cutoff(3.0)
+     self.ref.calc_connect()
+     quippy._elasticity.elastic_fields(self.ref, a=self.a, cij=self.C)
+
+  def test_strain(self):
+     at = self.at.copy()
+     elastic_fields(at, a=self.a, cij=self.C)
+     ref = self.ref
+     self.assertArrayAlmostEqual(at.strain, farray([ref.s_xx_sub1, ref.s_yy_sub1, ref.s_zz_sub1,
+                                                    ref.s_yz, ref.s_xz, ref.s_xy]))
+
+  def test_stress(self):
+     at = self.at.copy()
+     elastic_fields(at, a=self.a, cij=self.C)
+     ref = self.ref
+     self.assertArrayAlmostEqual(at.stress, farray([ref.sig_xx, ref.sig_yy, ref.sig_zz,
+                                                    ref.sig_yz, ref.sig_xz, ref.sig_xy]))
+     self.assertArrayAlmostEqual(at.stress_eval, farray([ref.sigeval3, ref.sigeval2, ref.sigeval1]))
+
+  def test_strain_energy_density(self):
+     at = self.at.copy()
+     elastic_fields(at, a=self.a, cij=self.C)
+     self.assertArrayAlmostEqual(at.strain_energy_density, 0.5*(at.strain*at.stress).sum(axis=1))
+
+  def test_mask(self):
+     at = self.at.copy()
+     mask = fzeros(at.n, dtype=bool)
+     mask[1:at.n/2] = True
+     elastic_fields(at, a=self.a, cij=self.C, mask=mask)
+     self.assertArrayAlmostEqual(at.stress[:,1:at.n/2], farray([self.ref.sig_xx, self.ref.sig_yy, self.ref.sig_zz,
+                                                               self.ref.sig_yz, self.ref.sig_xz, self.ref.sig_xy])[:,1:at.n/2])
+     self.assert_((at.stress[:,at.n/2+1:] == 0.0).all())
+
+  def test_atom_resolved_stress_field(self):
+     python = AtomResolvedStressField(a=self.a, cij=self.C, method='python')
+     fortran = AtomResolvedStressField(a=self.a, cij=self.C, method='fortran')
+     self.assertArrayAlmostEqual(python.get_stresses(self.at.copy()),
+                                 fortran.get_stresses(self.at.copy()))
+
+
 if __name__ == '__main__':
    unittest.main()
@@ -118,6 +118,21 @@ class TestFortranArray(QuippyTestCase):
       self.assertEqual(self.f[2], 0)
       self.assertEqual(self.f[3], 0)
 
+   def testsetslice2(self):
+      a = farray((1,2,3,4,5))
+      a[1:3] = (-1,-2,-3)
+      self.assertEqual(list(a), [-1,-2,-3,4,5])
+
+   def testsetslice3(self):
+      a = farray((1,2,3,4,5))
+      a.__setitem__(slice(2,4), 0)
+      self.assertEqual(list(a), [1,0,0,0,5])
+
+   def testsetextendedslice(self):
+      a = farray((1,2,3,4,5))
+      a[1:5:2] = (-1,-3,-5)
+      self.assertEqual(list(a), [-1,2,-3,4,-5])
+
    def testlist(self):
       self.assertEqual(list(self.f), [1,2,3])
 
@@ -419,7 +434,68 @@ class TestFortranArray(QuippyTestCase):
       f = fzeros((3,10), dtype=int)
       f[numpy.int32(2)] += [1,2,3]
       self.assert_(list(f[1]) ==  [0,0,0] and list(f[2]) ==  [1,2,3])
-      
-      
+
+
+class TestFortranIndex(QuippyTestCase):
+
+   def setUp(self):
+      self.n3 = numpy.arange(24).reshape((2,3,4), order='F')
+      self.f3 = FortranArray(self.n3.copy(order='F'))
+
+   def testmatchesmapindices(self):
+      from quippy.farray import fortran_index, _fortran_index
+      cases = [1, -1, numpy.int32(2), slice(None), slice(2,None), slice(1,3,2), slice(None,-1),
+               (1,2), (slice(None),1), (1,slice(None)), (2,), (numpy.int64(1),slice(2,3),-1)]
+      for ndim in (1, 2, 3):
+         a = fzeros((4,)*ndim)
+         for indx in cases:
+            self.assertEqual(repr(fortran_index(indx, ndim)), repr(a.mapindices(indx)))
+            self.assertEqual(repr(_fortran_index(indx, ndim)), repr(a.mapindices(indx)))
+
+   def testfancynotmapped(self):
+      from quippy.farray import fortran_index, _fortran_index
+      for indx in [[1,2], (1,[2]), farray([1]), (Ellipsis,1), (None,1), 1L, slice(1L,None)]:
+         self.assert_(fortran_index(indx, 2) is None)
+         self.assert_(_fortran_index(indx, 2) is None)
+
+   def testzero(self):
+      from quippy.farray import fortran_index, _fortran_index
+      for indx in [0, (1,0), slice(0,2), (slice(0,None),)]:
+         self.assertRaises(IndexError, fortran_index, indx, 2)
+         self.assertRaises(IndexError, _fortran_index, indx, 2)
+         self.assertRaises(IndexError, self.f3.__getitem__, indx)
+         self.assertRaises(IndexError, self.f3.__setitem__, indx, 0)
+
+   def test3dgetitem(self):
+      self.assertEqual(self.f3[2,3,4], self.n3[1,2,3])
+      self.assertEqual(self.f3[-1,1,2], self.n3[-1,0,1])
+      self.assert_((self.f3[1] == self.n3[...,0]).all())
+      self.assert_((self.f3[:,2] == self.n3[...,:,1]).all())
+      self.assert_((self.f3[1,:,2:] == self.n3[0,:,1:]).all())
+      self.assert_(isinstance(self.f3[:,1,1], FortranArray))
+
+   def test3dsetitem(self):
+      self.f3[2,3,4] = -1
+      self.n3[1,2,3] = -1
+      self.f3[:,1,2] = -2
+      self.n3[:,0,1] = -2
+      self.f3[1] = -3
+      self.n3[...,0] = -3
+      self.f3[2,1:2,::2] = -4
+      self.n3[1,0:2,::2] = -4
+      self.assert_((self.f3 == self.n3).all())
+
+   def testparent(self):
+      class Parent(object):
+         pass
+      p = Parent()
+      f = FortranArray(numpy.zeros(3), parent=p)
+      self.assertEqual(f[1], 0.0)
+      del p
+      self.assertRaises(RuntimeError, f.__getitem__, 1)
+      self.assertRaises(RuntimeError, f.__setitem__, 1, 1.0)
+      self.assertRaises(RuntimeError, f.__getitem__, [1])
+
+
 if __name__ == '__main__':
    unittest.main()
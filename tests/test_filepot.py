@@ -0,0 +1,124 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+from quippy import *
+from quippy.filepotdriver import *
+import unittest, threading, socket, os, sys, shutil, tempfile, time, gc
+import numpy as np
+from quippytest import *
+
+ip_driver = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         '..', 'quippy', 'scripts', 'ip_driver.py')
+
+class TestFilePotDriver_Protocol(QuippyTestCase):
+
+   def setUp(self):
+      self.pot = Potential('IP SW')
+      self.at = supercell(diamond(5.44, 14), 2, 1, 1)
+      self.at.rattle(0.05)
+      self.dir = tempfile.mkdtemp()
+      self.path = os.path.join(self.dir, 'filepot.sock')
+      self.args_strs = []
+      self.thread = threading.Thread(target=serve, args=(self.calculate, self.path))
+      self.thread.daemon = True
+      self.thread.start()
+      while not os.path.exists(self.path):
+         self.thread.join(0.01)
+      self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+      self.sock.connect(self.path)
+
+   def tearDown(self):
+      self.sock.close()
+      self.thread.join()
+      shutil.rmtree(self.dir)
+
+   def calculate(self, at, args_str):
+      self.args_strs.append(args_str)
+      self.pot.calc(at, args_str='energy force')
+      return at
+
+   def testcalc(self):
+      for i in range(3):
+         self.at.rattle(0.01)
+         send_frame(self.sock, 'label=%d' % i)
+         send_frame(self.sock, self.at.write('string'))
+         at = Atoms(recv_frame(self.sock), format='string')
+         ref = self.at.copy()
+         self.pot.calc(ref, args_str='energy force')
+         self.assertAlmostEqual(at.energy, ref.energy)
+         self.assertArrayAlmostEqual(at.force, ref.force)
+      self.assertEqual(self.args_strs, ['label=0', 'label=1', 'label=2'])
+
+   def testclose(self):
+      self.sock.close()
+      self.thread.join()
+      self.assert_(not os.path.exists(self.path))
+
+
+class TestFilePot(QuippyTestCase):
+
+   def setUp(self):
+      self.pot = Potential('IP SW')
+      self.at = supercell(diamond(5.44, 14), 2, 2, 2)
+      self.at.rattle(0.05)
+      self.dir = tempfile.mkdtemp()
+      self.command = '%s %s' % (sys.executable, ip_driver)
+
+   def tearDown(self):
+      shutil.rmtree(self.dir)
+
+   def check(self, filepot, n_steps=3):
+      for i in range(n_steps):
+         self.at.rattle(0.01)
+         ref = self.at.copy()
+         self.pot.calc(ref, args_str='energy force virial')
+
+         energy = farray(0.0)
+         force = fzeros((3, len(self.at)))
+         virial = fzeros((3, 3))
+         filepot.calc(self.at, energy=energy, force=force, virial=virial, args_str='FilePot_log=F')
+         self.assertAlmostEqual(energy, ref.energy)
+         self.assertArrayAlmostEqual(force, ref.force)
+         self.assertArrayAlmostEqual(virial, ref.virial)
+
+   def testtmpdir(self):
+      filepot = Potential('FilePot command={%s} tmp_dir=%s' % (self.command, self.dir))
+      self.check(filepot)
+      self.assert_(os.path.exists(os.path.join(self.dir, 'filepot.xyz')))
+      self.assert_(os.path.exists(os.path.join(self.dir, 'filepot.out')))
+
+   def testpersistent(self):
+      filepot = Potential('FilePot command={%s} persistent=T tmp_dir=%s' % (self.command, self.dir))
+      self.check(filepot)
+      sockfile = os.path.join(self.dir, 'filepot.sock')
+      self.assert_(os.path.exists(sockfile))
+      self.assert_(not os.path.exists(os.path.join(self.dir, 'filepot.xyz')))
+
+      # finalising the FilePot closes the connection, so the driver it
+      # started exits and removes its socket
+      del filepot
+      gc.collect()
+      for i in range(100):
+         if not os.path.exists(sockfile):
+            break
+         time.sleep(0.1)
+      self.assert_(not os.path.exists(sockfile))
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -212,6 +212,81 @@ if hasattr(quippy, 'Potential') and hasattr(quippy, 'Potential') and quippy.have
                                                              [ 0.00020142,  0.0019848 ]])
 
 
+if hasattr(quippy, 'Potential'):
+
+    from quippy.lotf import AtomCenteredClusters, iter_atom_centered_clusters, _iter_atom_centered_clusters_serial
+
+    class TestAtomCenteredClusters(QuippyTestCase):
+        def setUp(self):
+            system_reseed_rng(1984068303)
+            self.at = supercell(diamond(5.44, 14), 3, 3, 3)
+            self.at.rattle(0.05)
+            self.at.set_cutoff(5.0)
+            self.at.add_property('hybrid_mark', HYBRID_NO_MARK)
+            self.at.hybrid_mark[[1, 2, 30, 77]] = HYBRID_ACTIVE_MARK
+            self.cluster_args = {'buffer_hops': 2, 'randomise_buffer': False}
+
+        def reference(self):
+            return list(_iter_atom_centered_clusters_serial(self.at, **self.cluster_args))
+
+        def assertClustersEqual(self, clusters, ref):
+            self.assertEqual(len(clusters), len(ref))
+            for c, r in zip(clusters, ref):
+                self.assertArrayAlmostEqual(c.index, r.index)
+                self.assertArrayAlmostEqual(c.z, r.z)
+                self.assertArrayAlmostEqual(c.lattice, r.lattice)
+                self.assertArrayAlmostEqual(c.pos, r.pos)
+
+        def test_iter(self):
+            self.assertClustersEqual(list(iter_atom_centered_clusters(self.at, **self.cluster_args)),
+                                     self.reference())
+
+        def test_marks_restored(self):
+            hybrid_mark = self.at.hybrid_mark.copy()
+            list(iter_atom_centered_clusters(self.at, **self.cluster_args))
+            self.assertArrayAlmostEqual(self.at.hybrid_mark, hybrid_mark)
+
+        def test_indices(self):
+            clusters = AtomCenteredClusters(**self.cluster_args).update(self.at, indices=[5, 6])
+            self.assertEqual([c.index[1] for c in clusters], [5, 6])
+
+        def test_reuse(self):
+            acc = AtomCenteredClusters(**self.cluster_args)
+            acc.update(self.at)
+            self.at.rattle(0.01)
+            clusters = acc.update(self.at)
+            self.assertEqual(acc.stats, {'carved': 4, 'reused': 4})
+            self.assertClustersEqual(clusters, self.reference())
+
+        def test_recarve_on_topology_change(self):
+            acc = AtomCenteredClusters(**self.cluster_args)
+            acc.update(self.at)
+            self.at.pos[:,1] += 1.0
+            acc.update(self.at)
+            self.assert_(acc.stats['carved'] > 4)
+
+        def test_nprocs(self):
+            clusters = AtomCenteredClusters(nprocs=2, **self.cluster_args).update(self.at)
+            self.assertClustersEqual(clusters, self.reference())
+
+        def test_nprocs_persistent_pool(self):
+            acc = AtomCenteredClusters(nprocs=2, reuse=False, **self.cluster_args)
+            try:
+                acc.update(self.at)
+                pool = acc._pool
+                self.assert_(pool is not None)
+                self.at.rattle(0.01)
+                clusters = acc.update(self.at)
+                self.assert_(acc._pool is pool)
+                self.assertClustersEqual(clusters, self.reference())
+            finally:
+                acc.close()
+            self.assert_(acc._pool is None)
+
+        def test_unsupported(self):
+            self.assertRaises(ValueError, AtomCenteredClusters, hysteretic_buffer=True)
+
+
 
 if __name__ == '__main__':
    unittest.main()
@@ -86,6 +86,24 @@ class TestOOFortran(QuippyTestCase):
       self.dia.calc_connect(self.dia.connect) # optional argument by position
       self.dia.calc_connect(own_neighbour=1)
 
+   def testcallplan(self):
+      from quippy.oo_fortran import CallPlan
+      plan = self.dia._call_plans['n_neighbours']
+      self.assert_(isinstance(plan, CallPlan))
+      self.dia.set_cutoff(3.0)
+      self.dia.calc_connect()
+      self.assertEqual(self.dia.n_neighbours(1), 4)
+      self.assert_(self.dia._call_plans['n_neighbours'] is plan)
+
+   def testlazydoc(self):
+      from quippy.oo_fortran import LazyDocFunction
+      self.assert_(isinstance(Atoms.n_neighbours, LazyDocFunction))
+      self.assert_('Routine is wrapper around Fortran routine' in self.dia.n_neighbours.__doc__)
+      self.assert_('Fortran interface' in self.dia.add_atoms.__doc__)
+
+   def testcallplanbadtype(self):
+      self.assertRaises(TypeError, self.dia.n_neighbours, 1, alt_connect=self.dia)
+
 
 if __name__ == '__main__':
    unittest.main()
@@ -21,6 +21,11 @@ import unittest, quippy
 import numpy as np
 from quippytest import *
 
+if 'ase' in available_modules:
+   import ase
+else:
+   import quippy.miniase as ase
+
 if hasattr(quippy, 'Potential'):
 
    class TestPotential_SW(QuippyTestCase):
@@ -254,6 +259,105 @@ if hasattr(quippy, 'Potential'):
          self.assertArrayAlmostEqual(self.v, self.v_ref)
          self.assertArrayAlmostEqual(self.at.virial, self.v_ref)
 
+      def testcutoff_skin(self):
+         self.pot.cutoff_skin = 1.0
+         at = self.at.copy()
+         at.set_calculator(self.pot)
+         at.get_forces()
+         info0 = self.pot.connect_info()
+         self.assertEqual(info0['cutoff_skin'], 1.0)
+
+         at.set_positions(at.get_positions() + 0.01)
+         f = at.get_forces()
+         info1 = self.pot.connect_info()
+         self.assertEqual(info1['rebuilds'], info0['rebuilds'])
+         self.assertEqual(info1['reuses'], info0['reuses'] + 1)
+
+         at_ref = at.copy()
+         at_ref.set_cutoff(self.pot.cutoff())
+         self.pot.calc(at_ref, args_str="force")
+         self.assertArrayAlmostEqual(f, np.array(at_ref.force).T)
+
+      def testcutoff_skin_rebuild(self):
+         self.pot.cutoff_skin = 1.0
+         at = self.at.copy()
+         at.set_calculator(self.pot)
+         at.get_forces()
+         info0 = self.pot.connect_info()
+         at.set_positions(at.get_positions() + 0.6)
+         at.get_forces()
+         info1 = self.pot.connect_info()
+         self.assertEqual(info1['rebuilds'], info0['rebuilds'] + 1)
+
+      def testpersistent_atoms(self):
+         # a plain ASE Atoms is copied once, then the copy is updated in place
+         # so its neighbour list is reused within the skin and rebuilt beyond it
+         self.pot.cutoff_skin = 1.0
+         at = ase.Atoms(self.at)
+         at.set_calculator(self.pot)
+         at.get_forces()
+         persistent_at = self.pot._persistent_atoms
+         info0 = self.pot.connect_info()
+
+         rng = np.random.RandomState(1)
+         n_rebuilds = n_reuses = 0
+         for shift, rebuild in [(0.0, False), (0.0, False), (0.6, True), (0.0, False)]:
+            pos = at.get_positions() + rng.uniform(-0.02, 0.02, size=(len(at), 3))
+            pos[:, 0] += shift
+            at.set_positions(pos)
+            f = at.get_forces()
+            self.assert_(self.pot._persistent_atoms is persistent_at)
+            if rebuild:
+               n_rebuilds += 1
+            else:
+               n_reuses += 1
+            info = self.pot.connect_info()
+            self.assertEqual(info['rebuilds'], info0['rebuilds'] + n_rebuilds)
+            self.assertEqual(info['reuses'], info0['reuses'] + n_reuses)
+
+            at_ref = Atoms(at)
+            at_ref.set_cutoff(self.pot.cutoff())
+            self.pot.calc(at_ref, args_str="force")
+            self.assertArrayAlmostEqual(f, np.array(at_ref.force).T)
+
+      def testzero_copy(self):
+         self.pot.zero_copy = True
+         at = self.at.copy()
+         at.set_calculator(self.pot)
+         f = at.get_forces()
+         self.assertArrayAlmostEqual(f, np.array(self.f_ref).T)
+         self.assert_(np.may_share_memory(f, self.pot._buffers['force']))
+         self.assert_(not at.has_property('force'))
+         self.assertAlmostEqual(at.get_potential_energy(), self.e_ref)
+         self.assertArrayAlmostEqual(at.get_potential_energies(), self.le_ref)
+
+      def testcalc_many(self):
+         configs = [self.at.copy() for i in range(3)]
+         res = self.pot.calc_many(configs, properties=['energy', 'force', 'local_energy'])
+         self.assertEqual(list(res['n_atoms']), [8, 8, 8])
+         self.assertArrayAlmostEqual(res['energy'], [self.e_ref]*3)
+         self.assertEqual(res['force'].shape, (24, 3))
+         for f in np.split(res['force'], np.cumsum(res['n_atoms'])[:-1]):
+            self.assertArrayAlmostEqual(f, np.array(self.f_ref).T)
+         self.assertArrayAlmostEqual(res['local_energy'][8:16], self.le_ref)
+
+      def testcalc_many_variable_n(self):
+         configs = [self.at.copy(), supercell(self.at, 2, 1, 1), self.at.copy()]
+         res = self.pot.calc_many(configs, properties=['energy', 'virial'])
+         self.assertEqual(list(res['n_atoms']), [8, 16, 8])
+         self.assertArrayAlmostEqual(res['energy'], [self.e_ref, 2*self.e_ref, self.e_ref])
+         self.assertEqual(res['virial'].shape, (3, 3, 3))
+         self.assertArrayAlmostEqual(res['virial'][1], 2*res['virial'][0])
+
+      def testcalc_many_parallel(self):
+         configs = [self.at.copy() for i in range(4)]
+         res = self.pot.calc_many(configs, nprocs=2)
+         self.assertArrayAlmostEqual(res['energy'], [self.e_ref]*4)
+         self.assertArrayAlmostEqual(res['force'][-8:], np.array(self.f_ref).T)
+
+      def testcalc_many_bad_property(self):
+         self.assertRaises(ValueError, self.pot.calc_many, [self.at], properties=['forces'])
+
    NRL_TB_tight_binding_xml = """<eval_test_params>
 
    <self_consistency tolerance="1e-8">
@@ -4842,6 +4946,71 @@ if hasattr(quippy, 'Potential'):
                                                 [2.33071967,   -0.46343812,   -0.82128532], 
                                                 [ -1.44992225,    1.05479624,    0.78616438]]).T)
 
+      class TestPotential_NRL_TB_LOBPCG(QuippyTestCase):
+
+         def setUp(self):
+            # gamma point only, no self-consistency, so that the matrices are real
+            xml = NRL_TB_tight_binding_xml
+            xml = xml[:xml.index('<self_consistency')] + xml[xml.index('</KPoints>')+len('</KPoints>'):]
+            self.diag_pot = Potential('TB NRL-TB', param_str=xml)
+            self.lobpcg_pot = Potential('TB NRL-TB', param_str=xml)
+
+            np.random.seed(1)
+            self.at = supercell(diamond(5.43, 14), 2, 2, 2)
+            self.at.pos[...] += np.random.uniform(-0.1, 0.1, size=self.at.pos.shape)
+            self.at.set_cutoff(self.diag_pot.cutoff())
+            self.at.calc_connect()
+
+            verbosity_push(PRINT_SILENT)
+
+         def tearDown(self):
+            verbosity_pop()
+
+         def test_warm_start(self):
+            # first call has no previous eigenvectors, so diagonalises densely
+            self.lobpcg_pot.calc(self.at, args_str="energy force solver=LOBPCG")
+            self.assert_(self.at.params['lobpcg_fallback'])
+
+            self.at.pos[...] += np.random.uniform(-0.01, 0.01, size=self.at.pos.shape)
+            self.at.calc_connect()
+
+            self.diag_pot.calc(self.at, args_str="energy force solver=DIAG")
+            diag_energy, diag_force = self.at.energy, self.at.force.copy()
+
+            self.lobpcg_pot.calc(self.at, args_str="energy force solver=LOBPCG")
+            self.assert_(not self.at.params['lobpcg_fallback'])
+            self.assertAlmostEqual(self.at.energy, diag_energy)
+            self.assertArrayAlmostEqual(self.at.force, diag_force)
+
+      class TestPotential_NRL_TB_FOE(QuippyTestCase):
+
+         def setUp(self):
+            xml = NRL_TB_tight_binding_xml
+            xml = xml[:xml.index('<self_consistency')] + xml[xml.index('</KPoints>')+len('</KPoints>'):]
+            self.pot = Potential('TB NRL-TB', param_str=xml)
+
+            np.random.seed(1)
+            self.at = diamond(5.43, 14)
+            self.at.pos[...] += np.random.uniform(-0.1, 0.1, size=self.at.pos.shape)
+            self.at.set_cutoff(self.pot.cutoff())
+            self.at.calc_connect()
+
+            verbosity_push(PRINT_SILENT)
+
+         def tearDown(self):
+            verbosity_pop()
+
+         def test_foe_vs_diag(self):
+            # density matrix cutoff covers the whole cell, so the only error is from the expansion
+            self.pot.calc(self.at, args_str="energy force virial solver=DIAG fermi_T=0.2")
+            diag_energy, diag_force, diag_virial = self.at.energy, self.at.force.copy(), self.at.virial.copy()
+
+            self.pot.calc(self.at, args_str="energy force virial solver=FOE fermi_T=0.2 foe_dm_cutoff=20.0 foe_tol=1e-9")
+            self.assert_(self.at.params['foe_n_cheb'] > 0)
+            self.assertAlmostEqual(self.at.energy, diag_energy)
+            self.assertArrayAlmostEqual(self.at.force, diag_force)
+            self.assertArrayAlmostEqual(self.at.virial, diag_virial)
+
    got_tight_binding = True
    try:
       p = Potential('TB DFTB', param_str=DFTB_tight_binding_xml)
@@ -4895,6 +5064,151 @@ if hasattr(quippy, 'Potential'):
 					        [  0.52245078, 2.66454443, -0.95689694]]).T)
 
 
+   class TestPotential_EAM_ErcolAd_Tabulated(QuippyTestCase):
+
+      def setUp(self):
+         xml="""
+         <EAM_ErcolAd_params n_types="1" n_spline_V="18" n_spline_rho="15" n_spline_F="13" label="MSMSE_12">
+         <!-- From Liu, Ercolessi, and Adams, Modelling Simul. Mater. Sci. Eng. 12 (2004) 665-670 -->
+           <per_type_data atomic_num="13" type="1">
+             <spline_rho>
+               <point r="2.0210" y="0.0824" b="0.0707" c="-0.1471" d="0.0554"/>
+               <point r="2.2730" y="0.0918" b="0.0071" c="-0.1053" d="0.0460"/>
+               <point r="2.5055" y="0.0883" b="-0.0344" c="-0.0732" d="0.0932"/>
+               <point r="2.7380" y="0.0775" b="-0.0533" c="-0.0081" d="-0.0044"/>
+               <point r="2.9705" y="0.0647" b="-0.0578" c="-0.0112" d="0.0432"/>
+               <point r="3.2030" y="0.0512" b="-0.0560" c="0.0189" d="0.0040"/>
+               <point r="3.4355" y="0.0392" b="-0.0465" c="0.0217" d="-0.0392"/>
+               <point r="3.6680" y="0.0291" b="-0.0428" c="-0.0056" d="-0.0198"/>
+               <point r="3.9005" y="0.0186" b="-0.0486" c="-0.0194" d="0.1593"/>
+               <point r="4.1330" y="0.0082" b="-0.0318" c="0.0917" d="-0.1089"/>
+               <point r="4.3655" y="0.0044" b="-0.0069" c="0.0157" d="-0.0242"/>
+               <point r="4.5980" y="0.0034" b="-0.0035" c="-0.0012" d="0.0150"/>
+               <point r="4.8305" y="0.0027" b="-0.0016" c="0.0093" d="-0.0218"/>
+               <point r="5.0630" y="0.0025" b="-0.0008" c="-0.0059" d="0.0042"/>
+               <point r="6.0630" y="0" b="0" c="0" d="0"/>
+             </spline_rho>
+             <spline_F>
+               <point r="0.0000" y="0.0000" b="-18.4387" c="86.5178" d="-141.1819"/>
+               <point r="0.1000" y="-1.1199" b="-5.3706" c="44.1632" d="-192.2166"/>
+               <point r="0.2000" y="-1.4075" b="-2.3045" c="-13.5018" d="62.9570"/>
+               <point r="0.3000" y="-1.7100" b="-3.1161" c="5.3853" d="-19.2831"/>
+               <point r="0.4000" y="-1.9871" b="-2.6175" c="-0.3996" d="21.0288"/>
+               <point r="0.5000" y="-2.2318" b="-2.0666" c="5.9090" d="-24.3978"/>
+               <point r="0.6000" y="-2.4038" b="-1.6167" c="-1.4103" d="25.6930"/>
+               <point r="0.7000" y="-2.5538" b="-1.1280" c="6.2976" d="-18.7304"/>
+               <point r="0.8000" y="-2.6224" b="-0.4304" c="0.6785" d="1.6087"/>
+               <point r="0.9000" y="-2.6570" b="-0.2464" c="1.1611" d="0.4704"/>
+               <point r="1.0000" y="-2.6696" b="-0.0001" c="1.3022" d="-2.3503"/>
+               <point r="1.1000" y="-2.6589" b="0.1898" c="0.5971" d="-1.7862"/>
+               <point r="1.2000" y="-2.6358" b="0.2557" c="0.0612" d="-1.7862"/>
+             </spline_F>
+           </per_type_data>
+           <per_pair_data atomic_num_i="13" atomic_num_j="13" r_min="2.0210" r_cut="6.0630">
+             <spline_V>
+               <point r="2.0210" y="2.0051" b="-7.2241" c="9.3666" d="-4.3827"/>
+               <point r="2.2730" y="0.7093" b="-3.3383" c="6.0533" d="-4.8865"/>
+               <point r="2.4953" y="0.2127" b="-1.3713" c="2.7940" d="-2.3363"/>
+               <point r="2.7177" y="0.0202" b="-0.4753" c="1.2357" d="-1.2893"/>
+               <point r="2.9400" y="-0.0386" b="-0.1171" c="0.3757" d="-0.2907"/>
+               <point r="3.1623" y="-0.0492" b="0.0069" c="0.1818" d="-0.3393"/>
+               <point r="3.3847" y="-0.0424" b="0.0374" c="-0.0445" d="-0.0367"/>
+               <point r="3.6070" y="-0.0367" b="0.0122" c="-0.0690" d="-0.2290"/>
+               <point r="3.8293" y="-0.0399" b="-0.0524" c="-0.2217" d="0.4667"/>
+               <point r="4.0517" y="-0.0574" b="-0.0818" c="0.0895" d="0.2227"/>
+               <point r="4.2740" y="-0.0687" b="-0.0090" c="0.2381" d="-0.3170"/>
+               <point r="4.4963" y="-0.0624" b="0.0499" c="0.0266" d="0.0796"/>
+               <point r="4.7187" y="-0.0492" b="0.0735" c="0.0797" d="-0.2031"/>
+               <point r="4.9410" y="-0.0311" b="0.0788" c="-0.0557" d="0.0980"/>
+               <point r="5.1633" y="-0.0153" b="0.0686" c="0.0097" d="-0.2634"/>
+               <point r="5.3857" y="-0.0024" b="0.0339" c="-0.1660" d="0.2612"/>
+               <point r="5.6080" y="-0.0002" b="-0.0012" c="0.0083" d="-0.0102"/>
+               <point r="6.0630" y="0" b="0" c="0" d="0"/>
+             </spline_V>
+           </per_pair_data>
+         </EAM_ErcolAd_params>
+         """
+
+         system_reseed_rng(2065775975)
+         self.pot = Potential('IP EAM_ErcolAd', param_str=xml)
+         self.pot_tab = Potential('IP EAM_ErcolAd tabulate=T', param_str=xml)
+
+         self.at = supercell(fcc(4.05, 13), 2, 2, 2)
+         randomise(self.at.pos, 0.2)
+         self.at.set_cutoff(self.pot.cutoff())
+         self.at.calc_connect()
+
+      def test_energy(self):
+         self.pot.calc(self.at, args_str="energy")
+         e = self.at.energy
+         self.pot_tab.calc(self.at, args_str="energy")
+         self.assertAlmostEqual(self.at.energy, e)
+
+      def test_force(self):
+         self.pot.calc(self.at, args_str="force")
+         f = self.at.force.copy()
+         self.pot_tab.calc(self.at, args_str="force")
+         self.assertArrayAlmostEqual(self.at.force, f, tol=1e-5)
+
+      def test_virial(self):
+         self.pot.calc(self.at, args_str="virial")
+         v = self.at.virial.copy()
+         self.pot_tab.calc(self.at, args_str="virial")
+         self.assertArrayAlmostEqual(self.at.virial, v, tol=1e-5)
+
+
+   class TestPotential_Coulomb_PME(QuippyTestCase):
+
+      def setUp(self):
+         xml="""
+         <Coulomb_params n_types="2" cutoff="8.0" ewald_error="1e-6" label="default">
+           <per_type_data type="1" atomic_num="8" charge="-1.2" />
+           <per_type_data type="2" atomic_num="14" charge="2.4" />
+         </Coulomb_params>
+         """
+
+         system_reseed_rng(2065775975)
+         self.pot_ewald = Potential('IP Coulomb method=ewald', param_str=xml)
+         self.pot_pme = Potential('IP Coulomb method=pme', param_str=xml)
+
+         self.at = supercell(alpha_quartz(a=4.9160, c=5.4054, u=0.4697, x=0.4135, y=0.2669, z=0.1191), 2, 2, 2)
+         randomise(self.at.pos, 0.2)
+         self.at.set_cutoff(8.0)
+         self.at.calc_connect()
+
+      def test_energy(self):
+         self.pot_ewald.calc(self.at, args_str="energy")
+         e = self.at.energy
+         self.pot_pme.calc(self.at, args_str="energy")
+         self.assertAlmostEqual(self.at.energy, e, places=4)
+
+      def test_force(self):
+         self.pot_ewald.calc(self.at, args_str="force")
+         f = self.at.force.copy()
+         self.pot_pme.calc(self.at, args_str="force")
+         self.assertArrayAlmostEqual(self.at.force, f, tol=1e-5)
+
+      def test_virial(self):
+         self.pot_ewald.calc(self.at, args_str="virial")
+         v = self.at.virial.copy()
+         self.pot_pme.calc(self.at, args_str="virial")
+         self.assertArrayAlmostEqual(self.at.virial, v, tol=1e-3)
+
+      def test_force_fd(self):
+         self.pot_pme.calc(self.at, args_str="force")
+         f = self.at.force.copy()
+         dx = 1e-5
+         self.at.pos[2,3] += dx
+         self.at.calc_connect()
+         self.pot_pme.calc(self.at, args_str="energy")
+         ep = self.at.energy
+         self.at.pos[2,3] -= 2*dx
+         self.at.calc_connect()
+         self.pot_pme.calc(self.at, args_str="energy")
+         em = self.at.energy
+         self.assertAlmostEqual(-(ep - em)/(2*dx), f[2,3], places=5)
+
+
    class TestPotential_Callback(QuippyTestCase):
 
       @staticmethod
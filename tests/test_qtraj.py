@@ -0,0 +1,156 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+from quippy import *
+from quippy.qtraj import *
+import unittest, os, warnings
+import numpy as np
+from quippytest import *
+
+class TestQTraj(QuippyTestCase):
+
+   def setUp(self):
+      self.at = supercell(diamond(5.44,14), 2,2,2)
+      self.at.add_property('log', False)
+      self.at.log[1] = True
+      self.at.add_property('force', 0.0, n_cols=3)
+      self.at.force[:] = self.at.pos*0.1
+      self.at.params['real'] = 1.0
+      self.at.params['int'] = 2
+      self.at.params['str'] = 'string'
+      self.at.params['log'] = True
+      self.at.params['real_a'] = [1.0,2.0,3.0]
+      self.at.params['int_a'] = [1,2,3]
+      self.at.params['real_a2'] = fidentity(3)
+      self.al = AtomsList([ supercell(diamond(5.44+0.01*x,14),2,2,2) for x in range(5) ])
+
+   def tearDown(self):
+      if os.path.exists('test.qtraj'): os.remove('test.qtraj')
+
+   def testsingle(self):
+      self.at.write('test.qtraj')
+      at = Atoms('test.qtraj')
+      self.assertEqual(self.at, at)
+
+   def testlist(self):
+      self.al.write('test.qtraj')
+      al = AtomsList('test.qtraj')
+      self.assertEqual(list(self.al), list(al))
+
+   def testrandomaccess(self):
+      self.al.write('test.qtraj')
+      ar = AtomsReader('test.qtraj')
+      self.assert_(ar.random_access)
+      self.assertEqual(len(ar), len(self.al))
+      self.assertEqual(ar[3], self.al[3])
+      self.assertEqual(ar[-1], self.al[-1])
+
+   def testframe(self):
+      self.al.write('test.qtraj')
+      self.assertEqual(Atoms('test.qtraj@3'), self.al[3])
+      self.assertEqual(Atoms('test.qtraj@-1'), self.al[-1])
+      self.assertEqual(Atoms('test.qtraj', frame=2), self.al[2])
+
+   def testselection(self):
+      self.al.write('test.qtraj')
+      r = QTrajReader('test.qtraj', start=1, step=2)
+      self.assertEqual(len(r), 2)
+      self.assertEqual(list(r), [self.al[1], self.al[3]])
+      self.assertEqual(r[-1], self.al[3])
+      self.assertArrayAlmostEqual(r.get_array('pos')[1], np.array(self.al[3].pos).T)
+      r.close()
+
+   def testproperties(self):
+      self.at.write('test.qtraj', properties=['species', 'pos'])
+      at = Atoms('test.qtraj')
+      self.assertEqual(sorted(at.properties.keys()), ['pos', 'species'])
+      self.assertArrayAlmostEqual(at.pos, self.at.pos)
+
+   def testappend(self):
+      w = QTrajWriter('test.qtraj')
+      for at in self.al[:3]:
+         w.write(at)
+      w.close()
+      w = QTrajWriter('test.qtraj', append=True)
+      for at in self.al[3:]:
+         w.write(at)
+      w.close()
+      self.assertEqual(list(AtomsList('test.qtraj')), list(self.al))
+
+   def testvariablenatoms(self):
+      al = AtomsList([diamond(5.44, 14), supercell(diamond(5.44, 14), 2, 1, 1)])
+      al.write('test.qtraj')
+      al2 = AtomsList('test.qtraj')
+      self.assertEqual([at.n for at in al2], [8, 16])
+      self.assertEqual(list(al), list(al2))
+
+   def testnoindex(self):
+      # frames from a writer which has not been closed are found by scanning
+      w = QTrajWriter('test.qtraj')
+      for at in self.al[:3]:
+         w.write(at)
+      w.file.flush()
+      with warnings.catch_warnings(record=True) as warns:
+         warnings.simplefilter('always')
+         r = QTrajReader('test.qtraj')
+      self.assertEqual(len(warns), 1)
+      self.assertEqual(list(r), list(self.al[:3]))
+      r.close()
+      w.close()
+
+   def testinterruptedappend(self):
+      w = QTrajWriter('test.qtraj')
+      for at in self.al[:3]:
+         w.write(at)
+      w.close()
+      w = QTrajWriter('test.qtraj', append=True)
+      for at in self.al[3:]:
+         w.write(at)
+      w.file.write('FRAM') # start of a partially written frame
+      w.file.flush()
+      with warnings.catch_warnings(record=True):
+         warnings.simplefilter('always')
+         r = QTrajReader('test.qtraj')
+         self.assertEqual(list(r), list(self.al))
+         r.close()
+         # appending again drops the partial frame
+         w2 = QTrajWriter('test.qtraj', append=True)
+         w2.write(self.al[0])
+         w2.close()
+      w.file.close()
+      w.file = None
+      self.assertEqual(list(AtomsList('test.qtraj')), list(self.al) + [self.al[0]])
+
+   def testget_array(self):
+      self.al.write('test.qtraj')
+      ar = AtomsReader('test.qtraj')
+      pos = ar.get_array('pos')
+      self.assertEqual(pos.shape, (5, self.al[0].n, 3))
+      for i, at in enumerate(self.al):
+         self.assertArrayAlmostEqual(pos[i], np.array(at.pos).T)
+
+   def testget_param(self):
+      self.at.write('test.qtraj')
+      r = QTrajReader('test.qtraj')
+      self.assertArrayAlmostEqual(r.get_param('real'), [1.0])
+      self.assertArrayAlmostEqual(r.get_param('Lattice')[0], np.array(self.at.lattice))
+      r.close()
+
+
+if __name__ == '__main__':
+   unittest.main()
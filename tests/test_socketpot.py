@@ -0,0 +1,154 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+from quippy import *
+from quippy.socketpot import *
+from quippy.socketpot import REQUEST, REPLY, recv_exact, recv_array
+import unittest, threading, socket
+import numpy as np
+from quippytest import *
+
+def fortran_bytes(a, dtype):
+   return np.asarray(a, dtype=dtype).tostring(order='F')
+
+class TestSocketPot_Protocol(QuippyTestCase):
+
+   def setUp(self):
+      self.pot = Potential('IP SW')
+      self.at = supercell(diamond(5.44, 14), 2, 1, 1)
+      self.at.rattle(0.05)
+      self.server = SocketPotServer(self.pot)
+      self.thread = threading.Thread(target=self.server.serve_forever)
+      self.thread.daemon = True
+      self.thread.start()
+      self.sock = socket.create_connection(('127.0.0.1', self.server.port))
+      self.sock.sendall('B%7d' % 0)
+
+   def tearDown(self):
+      self.sock.sendall(REQUEST.pack(0, -1, 0, 0))
+      self.sock.close()
+      self.server.shutdown()
+
+   def request(self, label, at, calc_flags, frame_flags):
+      msg = [REQUEST.pack(label, len(at), calc_flags, frame_flags)]
+      if frame_flags & SEND_LATTICE:
+         msg.append(fortran_bytes(at.lattice, '=f8'))
+      if frame_flags & SEND_Z:
+         msg.append(fortran_bytes(at.z, '=i4'))
+      msg.append(fortran_bytes(at.pos, '=f8'))
+      self.sock.sendall(''.join(msg))
+      return REPLY.unpack(str(recv_exact(self.sock, REPLY.size)))
+
+   def check_frame(self, label, at, frame_flags):
+      ref = at.copy()
+      self.pot.calc(ref, args_str='energy force virial')
+      reply = self.request(label, at, CALC_ENERGY | CALC_FORCE | CALC_VIRIAL, frame_flags)
+      self.assertEqual(reply, (label, 0))
+      energy = recv_array(self.sock, '=f8', (1,))[0]
+      force = recv_array(self.sock, '=f8', (3, len(at)))
+      virial = recv_array(self.sock, '=f8', (3, 3))
+      self.assertAlmostEqual(energy, ref.energy)
+      self.assertArrayAlmostEqual(force, ref.force)
+      self.assertArrayAlmostEqual(virial, ref.virial)
+
+   def testfullframe(self):
+      self.check_frame(0, self.at, SEND_LATTICE | SEND_Z)
+
+   def testpositionsonly(self):
+      self.check_frame(0, self.at, SEND_LATTICE | SEND_Z)
+      at = self.at.copy()
+      at.rattle(0.01)
+      self.check_frame(1, at, 0)
+      self.assertEqual(self.server.stats['full_frames'], 1)
+
+   def testlattice(self):
+      self.check_frame(0, self.at, SEND_LATTICE | SEND_Z)
+      at = self.at.copy()
+      at.set_lattice(at.lattice*1.01, scale_positions=True)
+      self.check_frame(1, at, SEND_LATTICE)
+
+   def testsubsetofresults(self):
+      ref = self.at.copy()
+      self.pot.calc(ref, args_str='energy')
+      reply = self.request(5, self.at, CALC_ENERGY, SEND_LATTICE | SEND_Z)
+      self.assertEqual(reply, (5, 0))
+      self.assertAlmostEqual(recv_array(self.sock, '=f8', (1,))[0], ref.energy)
+
+   def testmissingz(self):
+      reply = self.request(0, self.at, CALC_ENERGY, SEND_LATTICE)
+      self.assertEqual(reply, (0, 1))
+      self.assertEqual(self.server.stats['errors'], 1)
+      # connection remains usable after an error
+      self.check_frame(1, self.at, SEND_LATTICE | SEND_Z)
+
+
+class TestSocketPot(QuippyTestCase):
+
+   def setUp(self):
+      self.pot = Potential('IP SW')
+      self.proc, port = start_local_server('IP SW')
+      self.socketpot = Potential('SocketPot persistent server_ip=127.0.0.1 server_port=%d' % port)
+      self.at = supercell(diamond(5.44, 14), 2, 2, 2)
+      self.at.rattle(0.05)
+
+   def tearDown(self):
+      del self.socketpot
+      self.proc.terminate()
+      self.proc.join()
+
+   def check(self, at):
+      ref = at.copy()
+      self.pot.calc(ref, args_str='energy force virial')
+
+      energy = farray(0.0)
+      force = fzeros((3, len(at)))
+      virial = fzeros((3, 3))
+      self.socketpot.calc(at, energy=energy, force=force, virial=virial)
+      self.assertAlmostEqual(energy, ref.energy)
+      self.assertArrayAlmostEqual(force, ref.force)
+      self.assertArrayAlmostEqual(virial, ref.virial)
+
+   def testsequence(self):
+      for i in range(5):
+         self.at.rattle(0.01)
+         self.check(self.at)
+
+   def testlattice(self):
+      self.check(self.at)
+      self.at.set_lattice(self.at.lattice*1.01, scale_positions=True)
+      self.check(self.at)
+
+   def testnatoms(self):
+      self.check(self.at)
+      at = supercell(diamond(5.44, 14), 1, 1, 2)
+      at.rattle(0.05)
+      self.check(at)
+      self.check(self.at)
+
+   def testlocal(self):
+      ref = self.at.copy()
+      self.pot.calc(ref, args_str='local_energy local_virial')
+      local_energy = fzeros(len(self.at))
+      local_virial = fzeros((9, len(self.at)))
+      self.socketpot.calc(self.at, local_energy=local_energy, local_virial=local_virial)
+      self.assertArrayAlmostEqual(local_energy, ref.local_energy)
+      self.assertArrayAlmostEqual(local_virial, ref.local_virial)
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,176 @@
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+# HQ X
+# HQ X   quippy: Python interface to QUIP atomistic simulation library
+# HQ X
+# HQ X   Copyright James Kermode 2010
+# HQ X
+# HQ X   These portions of the source code are released under the GNU General
+# HQ X   Public License, version 2, http://www.gnu.org/copyleft/gpl.html
+# HQ X
+# HQ X   If you would like to license the source code under different terms,
+# HQ X   please contact James Kermode, james.kermode@gmail.com
+# HQ X
+# HQ X   When using this software, please cite the following reference:
+# HQ X
+# HQ X   http://www.jrkermode.co.uk/quippy
+# HQ X
+# HQ XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX
+
+from quippy import *
+from quippy.workserver import *
+from quippy.workserver import send_msg, recv_msg, MSG_HELLO, MSG_JOB, MSG_RESULT
+import unittest, threading, socket
+import numpy as np
+from quippytest import *
+
+class TestWorkServer_Protocol(QuippyTestCase):
+
+   def setUp(self):
+      self.at = supercell(diamond(5.44, 14), 2, 1, 1)
+      self.at.set_atoms([14, 6]*8)
+      self.at.rattle(0.1)
+
+   def testatoms(self):
+      at = unpack_atoms(bytearray(pack_atoms(self.at)))
+      self.assertEqual(list(at.z), list(self.at.z))
+      self.assertArrayAlmostEqual(at.lattice, self.at.lattice)
+      self.assertArrayAlmostEqual(at.pos, self.at.pos)
+
+   def testatomsinplace(self):
+      at = self.at.copy()
+      at.pos[...] = 0.0
+      at2 = unpack_atoms(bytearray(pack_atoms(self.at)), at)
+      self.assert_(at2 is at)
+      self.assertArrayAlmostEqual(at.pos, self.at.pos)
+
+   def testresults(self):
+      force = fzeros((3, len(self.at)))
+      force[...] = self.at.pos*0.1
+      virial = fidentity(3)*2.0
+      at = self.at.copy()
+      unpack_results(bytearray(pack_results(-1.5, force, virial)), at)
+      self.assertAlmostEqual(at.energy, -1.5)
+      self.assertArrayAlmostEqual(at.force, force)
+      self.assertArrayAlmostEqual(at.virial, virial)
+
+   def testresultsmismatch(self):
+      self.assertRaises(ValueError, unpack_results,
+                        bytearray(pack_results(0.0, fzeros((3, 2)), fzeros((3, 3)))), self.at)
+
+
+class TestWorkServer(QuippyTestCase):
+
+   def setUp(self):
+      self.pot = Potential('IP SW')
+      at = supercell(diamond(5.44, 14), 2, 2, 2)
+      at.rattle(0.05)
+      self.configs = []
+      for i in range(6):
+         c = at.copy()
+         c.rattle(0.01)
+         self.configs.append(c)
+      self.server = WorkServer(address=('localhost', 0), depth=2)
+      self.server.start()
+
+   def tearDown(self):
+      self.server.shutdown()
+
+   def check_results(self, configs):
+      for c in configs:
+         ref = c.copy()
+         self.pot.calc(ref, args_str='energy force virial')
+         self.assertAlmostEqual(c.energy, ref.energy)
+         self.assertArrayAlmostEqual(c.force, ref.force)
+         self.assertArrayAlmostEqual(c.virial, ref.virial)
+
+   def testthreadclients(self):
+      clients = [WorkClient(('localhost', self.server.port), i, PotentialWorker(Potential('IP SW')))
+                 for i in range(2)]
+      threads = [threading.Thread(target=client.run) for client in clients]
+      for t in threads:
+         t.daemon = True
+         t.start()
+      self.server.calc_all(self.configs, keys=range(len(self.configs)))
+      self.check_results(self.configs)
+      self.assertEqual(self.server.stats['jobs'], len(self.configs))
+
+   def testlocalworkers(self):
+      workers = start_local_workers(self.server.port, 2, 'IP SW')
+      self.server.calc_all(self.configs)
+      self.check_results(self.configs)
+      self.server.shutdown()
+      for w in workers:
+         w.join(10.0)
+         self.assertEqual(w.exitcode, 0)
+
+   def testaffinity(self):
+      client = WorkClient(('localhost', self.server.port), 0, PotentialWorker(self.pot))
+      t = threading.Thread(target=client.run)
+      t.daemon = True
+      t.start()
+      self.server.calc_all(self.configs[:3], keys=[0, 1, 2])
+      self.server.calc_all(self.configs[3:], keys=[0, 1, 2])
+      self.assertEqual(self.server.stats['affinity_hits'], 3)
+
+   def testerror(self):
+      def fail(at):
+         raise ValueError('failed')
+      client = WorkClient(('localhost', self.server.port), 0, fail)
+      t = threading.Thread(target=client.run)
+      t.daemon = True
+      t.start()
+      self.server.submit(self.configs[0])
+      self.assertRaises(RuntimeError, self.server.wait)
+
+   def testunknownjobid(self):
+      # a misbehaving client which answers with the wrong job id is dropped, and
+      # its job is requeued for the well-behaved client started afterwards
+      sock = socket.create_connection(('localhost', self.server.port))
+      send_msg(sock, MSG_HELLO, 99, 1)
+      self.server.submit(self.configs[0])
+      code, client_id, job_id, payload = recv_msg(sock)
+      self.assertEqual(code, MSG_JOB)
+      send_msg(sock, MSG_RESULT, 99, job_id + 1000, '')
+      self.assertRaises(EOFError, recv_msg, sock)
+      sock.close()
+
+      client = WorkClient(('localhost', self.server.port), 0, PotentialWorker(self.pot))
+      t = threading.Thread(target=client.run)
+      t.daemon = True
+      t.start()
+      self.server.wait()
+      self.check_results(self.configs[:1])
+      self.assertEqual(self.server.stats['requeued'], 1)
+
+   def testbadresult(self):
+      # a result which cannot be unpacked fails its job rather than losing it
+      sock = socket.create_connection(('localhost', self.server.port))
+      send_msg(sock, MSG_HELLO, 99, 1)
+      self.server.submit(self.configs[0])
+      code, client_id, job_id, payload = recv_msg(sock)
+      send_msg(sock, MSG_RESULT, 99, job_id, pack_results(0.0, fzeros((3, 2)), fzeros((3, 3))))
+      with self.assertRaises(RuntimeError) as cm:
+         self.server.wait()
+      self.assert_('bad result' in str(cm.exception))
+      sock.close()
+
+   def testduplicateclient(self):
+      sock1 = socket.create_connection(('localhost', self.server.port))
+      send_msg(sock1, MSG_HELLO, 99, 1)
+      self.server.submit(self.configs[0])
+      code, client_id, job_id, payload = recv_msg(sock1)
+      self.assertEqual(code, MSG_JOB)
+      # second client with the same ID is turned away...
+      sock2 = socket.create_connection(('localhost', self.server.port))
+      send_msg(sock2, MSG_HELLO, 99, 1)
+      self.assertRaises(EOFError, recv_msg, sock2)
+      sock2.close()
+      # ...without disturbing the first
+      n = len(self.configs[0])
+      send_msg(sock1, MSG_RESULT, 99, job_id, pack_results(0.0, fzeros((3, n)), fzeros((3, 3))))
+      self.assert_(self.server.wait(10.0))
+      sock1.close()
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -183,6 +183,43 @@ class TestCInOutput(QuippyTestCase):
          al = AtomsList('test.nc')
          self.assertEqual(list(self.al), list(al))
 
+   def testxyz_get_array(self):
+      self.al.write('test.xyz')
+      ar = AtomsReader('test.xyz')
+      pos = ar.get_array('pos')
+      self.assertEqual(pos.shape, (5, self.al[0].n, 3))
+      for i, at in enumerate(self.al):
+         self.assertArrayAlmostEqual(pos[i].T, at.pos, tol=1e-6)
+
+   def testxyz_get_array_frames(self):
+      self.al.write('test.xyz')
+      ar = AtomsReader('test.xyz', start=1)
+      z = ar.get_array('Z', frames=[0, 2])
+      self.assertEqual(z.shape, (2, self.al[0].n))
+      self.assert_((z == 14).all())
+
+   def testxyz_get_param(self):
+      for i, at in enumerate(self.al):
+         at.params['energy'] = float(i)
+      self.al.write('test.xyz')
+      ar = AtomsReader('test.xyz')
+      self.assertArrayAlmostEqual(ar.get_param('energy'), [0.0, 1.0, 2.0, 3.0, 4.0])
+      lattice = ar.get_param('Lattice', frames=slice(-1, None))
+      self.assertArrayAlmostEqual(lattice[0], self.al[-1].lattice, tol=1e-6)
+
+   if 'netcdf' in available_modules:
+      def testnc_get_array(self):
+         self.al.write('test.nc')
+         ar = AtomsReader('test.nc')
+         pos = ar.get_array('pos', frames=slice(1, 3))
+         self.assertEqual(pos.shape, (2, self.al[0].n, 3))
+         self.assertArrayAlmostEqual(pos[1].T, self.al[2].pos)
+
+      def testnc_get_param(self):
+         self.al.write('test.nc')
+         ar = AtomsReader('test.nc')
+         self.assertArrayAlmostEqual(ar.get_param('real_a2')[0], self.al[0].params['real_a2'])
+
    def testxyzlowlevel(self):
       cio = CInOutput("test.xyz", OUTPUT, append=False)
       for a in self.al:
@@ -549,6 +586,50 @@ class TestPythonNetCDF(QuippyTestCase):
          self.assertEqual(list(self.al), list(al))
          nc.close()
 
+      def testframeview(self):
+         ar = NetCDFFrameReader('test3.nc')
+         self.assertEqual(len(ar), len(self.al))
+         frame = ar[2]
+         self.assertEqual(frame.n, self.al[2].n)
+         self.assertArrayAlmostEqual(frame.pos, self.al[2].pos)
+         self.assertArrayAlmostEqual(frame.lattice, self.al[2].lattice)
+         self.assert_(not frame.pos.flags.writeable)
+         ar.close()
+
+      def testframeview_get_atoms(self):
+         ar = NetCDFFrameReader('test3.nc')
+         self.assertEqual(ar[-1].get_atoms(), self.al[-1])
+         ar.close()
+
+      def testframeview_get_array(self):
+         ar = NetCDFFrameReader('test3.nc')
+         pos = ar.get_array('pos')
+         self.assertEqual(pos.shape, (len(self.al), self.at.n, 3))
+         for i, at in enumerate(self.al):
+            self.assertArrayAlmostEqual(pos[i].T, at.pos)
+         ar.close()
+
+      def testframeview_selection(self):
+         ar = NetCDFFrameReader('test3.nc', start=1, step=2)
+         self.assertEqual(len(ar), 2)
+         self.assertEqual([frame.frame for frame in ar], [1, 3])
+         self.assertArrayAlmostEqual(ar[-1].pos, self.al[3].pos)
+         pos = ar.get_array('pos')
+         self.assertEqual(pos.shape, (2, self.at.n, 3))
+         self.assertArrayAlmostEqual(pos[0].T, self.al[1].pos)
+         self.assertArrayAlmostEqual(pos[1].T, self.al[3].pos)
+         ar.close()
+
+      def testframeview_atomsreader(self):
+         ar = AtomsReader('test3.nc', format='ncview', start=2)
+         self.assertEqual(len(ar), 3)
+         self.assertEqual(ar[0].get_atoms(), self.al[2])
+         ar.close()
+         ar = AtomsReader('test3.nc', format='ncview', frame=4)
+         self.assertEqual(len(ar), 1)
+         self.assertEqual(ar[0].get_atoms(), self.al[4])
+         ar.close()
+
    if 'netCDF4' in quippy.available_modules:
 
       def testnetcdf4_read(self):